@@ -20,6 +20,7 @@ def main():
 
     # Delete the entire model:catalog hash
     deleted = catalog.r.delete(catalog.catalog_key)
+    catalog.drop_indexes()
     print(f"Deleted catalog: {deleted} (1 means success, 0 means already empty)")
 
 if __name__ == "__main__":
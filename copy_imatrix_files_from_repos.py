@@ -1,69 +1,150 @@
+"""
+Mirror the imatrix files of every -GGUF repo under our user into TARGET_DIR.
+
+Repo trees are listed concurrently, compared with the local index
+(imatrix-files/index.json) by size and LFS sha256, and only missing or changed
+files are downloaded on a worker pool. The index (model -> path, sha256, source)
+is what make_files.download_imatrix uses to find an imatrix without probing.
+"""
+import argparse
 import os
-import shutil
-from huggingface_hub import HfApi, login
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from huggingface_hub import HfApi, login, hf_hub_download
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "model-converter"))
+from imatrix_tools import (imatrix_model_name, load_imatrix_index, save_imatrix_index,
+                           register_imatrix, lookup_imatrix)
+
 # Load environment variables
 load_dotenv()
 HF_TOKEN = os.getenv("HF_API_TOKEN")
 
 # Configuration
-TARGET_DIR = "/home/mahadeva/code/models/imatrix-files"
+TARGET_DIR = os.getenv("IMATRIX_DIR", "/home/mahadeva/code/models/imatrix-files")
 # Load username from file
 with open(os.path.join(os.path.dirname(__file__), "model-converter/username"), "r") as f:
     REPO_OWNER = f.read().strip()
-FILE_EXTENSION = ".imatrix"
+LIST_WORKERS = 16
+DOWNLOAD_WORKERS = 4
 
 def ensure_target_dir():
     """Create target directory if it doesn't exist"""
     os.makedirs(TARGET_DIR, exist_ok=True)
     print(f"Target directory: {TARGET_DIR}")
 
-def get_all_repos():
-    """Fetch all repositories for the specified owner using correct API method"""
-    api = HfApi()
+def get_all_repos(api):
+    """Fetch all -GGUF repositories for the owner"""
     models = api.list_models(author=REPO_OWNER)
-    return [model.modelId for model in models if "-GGUF" in model.modelId]
+    return [model.id for model in models if "-GGUF" in model.id]
 
-def download_imatrix_files(repo_id):
-    """Download imatrix files from a repository"""
-    api = HfApi()
-    try:
-        files = api.list_repo_files(repo_id)
-        imatrix_files = [f for f in files if f.endswith(FILE_EXTENSION)]
-        
-        if not imatrix_files:
-            print(f"No imatrix files found in {repo_id}")
-            return
-        
-        print(f"\nFound {len(imatrix_files)} imatrix file(s) in {repo_id}:")
-        
-        for file in imatrix_files:
-            # Extract model name (assuming format: modelname-GGUF/modelname.imatrix)
-            model_name = file.split('/')[-1].replace(FILE_EXTENSION, "")
-            target_path = os.path.join(TARGET_DIR, f"{model_name}{FILE_EXTENSION}")
-            
-            if os.path.exists(target_path):
-                print(f"✓ Already exists: {model_name}{FILE_EXTENSION}")
+def list_remote_imatrices(api, repo_id):
+    """
+    List the imatrix files in one repo.
+
+    Returns:
+        list: dicts with repo_id, filename, model_name, size, sha256 (LFS hash, may be None)
+    """
+    found = []
+    for entry in api.list_repo_tree(repo_id, recursive=True, token=HF_TOKEN):
+        model_name = imatrix_model_name(entry.path)
+        if model_name is None or not hasattr(entry, "size"):
+            continue
+        lfs = getattr(entry, "lfs", None)
+        found.append({
+            "repo_id": repo_id,
+            "filename": entry.path,
+            "model_name": model_name,
+            "size": entry.size,
+            "sha256": getattr(lfs, "sha256", None) if lfs else None,
+        })
+    return found
+
+def list_all_remote(api, repos):
+    """List every repo tree concurrently. Repos that fail are reported and skipped."""
+    remote = []
+    with ThreadPoolExecutor(max_workers=LIST_WORKERS) as pool:
+        futures = {pool.submit(list_remote_imatrices, api, repo): repo for repo in repos}
+        for future in as_completed(futures):
+            try:
+                remote.extend(future.result())
+            except Exception as e:
+                print(f"Error listing {futures[future]}: {str(e)}")
+    return remote
+
+def plan_downloads(remote, index):
+    """
+    Diff remote files against the local index.
+
+    A file is up to date when the index points at an existing local file with
+    the same size and (when the Hub reports one) the same sha256. When several
+    repos publish an imatrix for the same model the first one listed wins.
+    """
+    todo, seen = [], set()
+    for item in sorted(remote, key=lambda r: (r["model_name"], r["repo_id"])):
+        if item["model_name"] in seen:
+            continue
+        seen.add(item["model_name"])
+        entry = index.get(item["model_name"])
+        if entry and lookup_imatrix(TARGET_DIR, item["model_name"], index=index):
+            if entry["size"] == item["size"] and (not item["sha256"] or entry["sha256"] == item["sha256"]):
                 continue
-            
-            print(f"↓ Downloading: {file}")
+        todo.append(item)
+    return todo
+
+def download_one(item):
+    path = hf_hub_download(
+        repo_id=item["repo_id"],
+        filename=item["filename"],
+        local_dir=TARGET_DIR,
+        token=HF_TOKEN
+    )
+    return item, path
+
+def sync(dry_run=False):
+    api = HfApi()
+    ensure_target_dir()
+
+    print(f"\nFetching repositories for {REPO_OWNER}...")
+    repos = get_all_repos(api)
+    if not repos:
+        print("No GGUF repositories found")
+        return
+    print(f"Found {len(repos)} GGUF repositories, listing files...")
+
+    remote = list_all_remote(api, repos)
+    index = load_imatrix_index(TARGET_DIR)
+    todo = plan_downloads(remote, index)
+    print(f"Found {len(remote)} imatrix file(s), {len(todo)} missing or changed locally")
+    for item in todo:
+        print(f" ↓ {item['repo_id']}/{item['filename']} ({item['size']} bytes)")
+    if dry_run or not todo:
+        return
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+        futures = [pool.submit(download_one, item) for item in todo]
+        for future in as_completed(futures):
             try:
-                downloaded_file = api.hf_hub_download(
-                    repo_id=repo_id,
-                    filename=file,
-                    local_dir=TARGET_DIR,
-                    local_dir_use_symlinks=False,
-                    token=HF_TOKEN
-                )
-                print(f"✓ Saved to: {downloaded_file}")
+                item, path = future.result()
             except Exception as e:
-                print(f"✗ Failed to download {file}: {str(e)}")
-                
-    except Exception as e:
-        print(f"Error processing {repo_id}: {str(e)}")
+                failed += 1
+                print(f"✗ Failed to download: {str(e)}")
+                continue
+            register_imatrix(TARGET_DIR, item["model_name"], path,
+                             source=f"{item['repo_id']}/{item['filename']}",
+                             sha256=item["sha256"], index=index)
+            print(f"✓ Saved to: {path}")
+    save_imatrix_index(TARGET_DIR, index)
+    print(f"\nDownloaded {len(todo) - failed} file(s), {failed} failed")
 
 def main():
+    parser = argparse.ArgumentParser(description="Mirror imatrix files from our GGUF repos")
+    parser.add_argument("--dry-run", action="store_true", help="Only show what would be downloaded")
+    args = parser.parse_args()
+
     # Authenticate
     try:
         login(token=HF_TOKEN)
@@ -71,24 +152,8 @@ def main():
     except Exception as e:
         print(f"Authentication failed: {str(e)}")
         return
-    
-    ensure_target_dir()
-    
-    print(f"\nFetching repositories for {REPO_OWNER}...")
-    repos = get_all_repos()
-    
-    if not repos:
-        print("No GGUF repositories found")
-        return
-    
-    print(f"Found {len(repos)} GGUF repositories:")
-    for repo in repos:
-        print(f" - {repo}")
-    
-    print("\nStarting download process...")
-    for repo in repos:
-        download_imatrix_files(repo)
-    
+
+    sync(dry_run=args.dry_run)
     print("\nAll imatrix files processed!")
 
 if __name__ == "__main__":
@@ -1,6 +1,7 @@
 import os
 import sys
 from huggingface_hub import HfApi
+from repo_maintenance import RepoMaintenance
 
 # Check if at least two arguments are provided (repo ID and at least one file)
 if len(sys.argv) < 3:
@@ -17,13 +18,24 @@ files_to_delete = sys.argv[2:]
 api_token = os.getenv("HF_API_TOKEN")
 
 # Initialize API
-api = HfApi()
+maintenance = RepoMaintenance(api=HfApi(), token=api_token)
 
-# Loop through files passed as arguments and delete them
+# Only files that exist go into the commit, so one bad path cannot fail the rest
+wanted = set(files_to_delete)
+plan, errors = maintenance.plan([repo_id], lambda entry: entry.path in wanted)
+if repo_id in errors:
+    print(f"Error listing {repo_id}: {errors[repo_id]}")
+    sys.exit(1)
+present = plan.get(repo_id, [])
 for file_to_delete in files_to_delete:
+    if file_to_delete not in present:
+        print(f"Error deleting {file_to_delete}: not found in {repo_id}")
+
+# Delete the remaining files in a single commit
+if present:
     try:
-        api.delete_file(path_in_repo=file_to_delete, repo_id=repo_id, token=api_token)
-        print(f"Successfully deleted {file_to_delete} from {repo_id}.")
+        maintenance.delete_in_repo(repo_id, present, commit_message=f"Delete {len(present)} file(s)")
+        for file_to_delete in present:
+            print(f"Successfully deleted {file_to_delete} from {repo_id}.")
     except Exception as e:
-        print(f"Error deleting {file_to_delete}: {e}")
-
+        print(f"Error deleting {present}: {e}")
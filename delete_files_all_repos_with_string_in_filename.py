@@ -1,7 +1,8 @@
 import os
 import argparse
-from huggingface_hub import HfApi, login
+from huggingface_hub import login
 from dotenv import load_dotenv
+from repo_maintenance import RepoMaintenance, name_contains, print_plan, read_default_user
 
 def main():
     parser = argparse.ArgumentParser(description="Delete files from all Hugging Face repos for a user that match any of the given substrings.")
@@ -28,61 +29,24 @@ def main():
         return
 
     # Get username if not provided
-    if args.user:
-        username = args.user
-    else:
-        username_file = os.path.join(os.path.dirname(__file__), "model-converter/username")
-        with open(username_file, "r") as f:
-            username = f.read().strip()
+    username = args.user or read_default_user()
 
     login(token=HF_TOKEN)
-    api = HfApi()
+    maintenance = RepoMaintenance(token=HF_TOKEN)
 
     print(f"Fetching repos for user: {username}")
-    repos = list(api.list_models(author=username))
+    repos = maintenance.list_repos(username)
     print(f"Found {len(repos)} repos.")
 
-    substrings = [s.lower() for s in args.substring]
-    exclude_substrings = [s.lower() for s in args.exclude_substring]
-    total_deleted = 0
+    # Trees are listed concurrently; every match in a repo goes into one commit
+    plan, errors = maintenance.plan(repos, name_contains(args.substring, args.exclude_substring))
+    total = print_plan(plan, errors)
 
-    for repo in repos:
-        repo_id = repo.modelId
-        try:
-            files = api.list_repo_files(repo_id)
-            to_delete = []
-            for f in files:
-                fname = f.lower()
-                # Match if file contains any of the target substrings
-                if any(sub in fname for sub in substrings):
-                    # Skip if it contains any excluded substring
-                    if any(excl in fname for excl in exclude_substrings):
-                        continue
-                    to_delete.append(f)
-            if not to_delete:
-                continue
-            print(f"\nRepo: {repo_id}")
-            for file in to_delete:
-                print(f"  Found: {file}")
-            if not args.dry_run:
-                for file in to_delete:
-                    try:
-                        api.delete_file(
-                            path_in_repo=file,
-                            repo_id=repo_id,
-                            token=HF_TOKEN,
-                            commit_message=f"Delete file(s) containing {args.substring}"
-                        )
-                        print(f"  Deleted: {file}")
-                        total_deleted += 1
-                    except Exception as e:
-                        print(f"  Failed to delete {file}: {e}")
-            else:
-                print("  (dry run, not deleting)")
-        except Exception as e:
-            print(f"Error processing {repo_id}: {e}")
-
-    print(f"\nDone. {'Would have deleted' if args.dry_run else 'Deleted'} {total_deleted} files.")
+    if args.dry_run:
+        print(f"\nDone. Would have deleted {total} files.")
+        return
+    total_deleted, _ = maintenance.delete(plan, commit_message=f"Delete file(s) containing {args.substring}")
+    print(f"\nDone. Deleted {total_deleted} files.")
 
 if __name__ == "__main__":
     main()
@@ -1,9 +1,9 @@
-from huggingface_hub import HfApi, HfFileSystem, login
+from huggingface_hub import HfApi, login
 from dotenv import load_dotenv
 import os
 import logging
-from datetime import datetime, timezone, timedelta
 import argparse
+from repo_maintenance import RepoMaintenance, older_than, last_modified, print_plan
 
 # Set up logging
 logging.basicConfig(
@@ -29,76 +29,36 @@ except Exception as e:
     logger.error(f"Authentication failed: {e}")
     exit()
 
-# Initialize API and File System
-api = HfApi()
-fs = HfFileSystem()
+# Shared maintenance engine: concurrent expanded listings, one delete commit per repo
+maintenance = RepoMaintenance(api=HfApi(), token=api_token)
 
 def parse_arguments():
     parser = argparse.ArgumentParser(description='Delete old IQ1 files from Hugging Face repositories.')
     parser.add_argument('--dry-run', action='store_true', help='Run in dry mode without making any changes')
     parser.add_argument('--days', type=int, default=7, help='Number of days to consider a file as old (default: 7)')
     parser.add_argument('--debug', action='store_true', help='Enable debug output')
-    parser.add_argument('--skip-files-without-date', action='store_true', help='Skip files that have no last modified date available')
+    parser.add_argument('--yes', action='store_true', help='Delete without asking for confirmation')
     return parser.parse_args()
 
-def is_file_older_than_days(file_path, days=7):
-    """Check if a file is older than the specified number of days."""
-    try:
-        last_modified = fs.modified(file_path)
-        if last_modified.tzinfo is None:
-            last_modified = last_modified.replace(tzinfo=timezone.utc)
-        return (datetime.now(timezone.utc) - last_modified) > timedelta(days=days)
-    except Exception as e:
-        logger.error(f"Error retrieving modified date for {file_path}: {e}")
-        return False
+def is_iq1_file(entry):
+    path = entry.path.lower()
+    return "iq1_s" in path or "iq1_m" in path
 
-def process_iq_files(repo_id, dry_run=True, days=7, require_confirmation=True, debug=False, skip_files_without_date=False):
-    try:
-        logger.info(f"\nProcessing repository: {repo_id}")
-        repo_files = list(api.list_repo_tree(repo_id=repo_id, recursive=True))
-        logger.debug(f"Found {len(repo_files)} files in repository")
-        
-        files_to_process = []
-        for file in repo_files:
-            file_path = f"{repo_id}/{file.path}"
-            if "iq1_s" in file.path.lower() or "iq1_m" in file.path.lower():
-                if is_file_older_than_days(file_path, days):
-                    files_to_process.append(file.path)
-        
-        if not files_to_process:
-            logger.info(f"No matching files found in {repo_id}")
-            return False, 0
+def old_iq1_predicate(days=7):
+    """
+    IQ1 files last committed more than `days` ago (dates come from the expanded
+    listing). Files without a date are always kept.
+    """
+    is_old = older_than(days)
 
-        if require_confirmation:
-            print(f"\nFound {len(files_to_process)} files to {'delete' if not dry_run else 'process'} in {repo_id}:")
-            for file in files_to_process:
-                print(f"- {file}")
-            confirm = input(f"\nProceed? (y/n): ").lower()
-            if confirm != 'y':
-                logger.info("Operation cancelled by user")
-                return False, 0
-
-        processed_count = 0
-        for file_path in files_to_process:
-            try:
-                if dry_run:
-                    logger.info(f"[DRY RUN] Would delete {file_path} from {repo_id}")
-                else:
-                    api.delete_file(
-                        path_in_repo=file_path,
-                        repo_id=repo_id,
-                        token=api_token,
-                        commit_message=f"Removing old iq1 file: {file_path}"
-                    )
-                    logger.info(f"Deleted {file_path} from {repo_id}")
-                processed_count += 1
-            except Exception as e:
-                logger.error(f"Failed to process {file_path}: {e}")
-
-        return True, processed_count
-    except Exception as e:
-        logger.error(f"Error processing {repo_id}: {e}", exc_info=True)
-        return False, 0
+    def predicate(entry):
+        if not is_iq1_file(entry):
+            return False
+        if last_modified(entry) is None:
+            logger.debug(f"No last modified date for {entry.path}, skipping")
+            return False
+        return is_old(entry)
+    return predicate
 
 def main():
     args = parse_arguments()
@@ -107,32 +67,25 @@ def main():
     if args.dry_run:
         logger.info("\nRunning in DRY RUN mode - no files will be deleted\n")
     
-    repos = list(api.list_models(author="Mungert"))
+    repos = maintenance.list_repos("Mungert")
     logger.info(f"Found {len(repos)} repositories to check")
     logger.info(f"Looking for files older than {args.days} days")
-    
-    confirmed = False
-    total_processed = 0
-    for repo in repos:
-        success, count = process_iq_files(
-            repo.id, 
-            dry_run=args.dry_run,
-            days=args.days,
-            require_confirmation=not confirmed,
-            debug=args.debug,
-            skip_files_without_date=args.skip_files_without_date
-        )
-        total_processed += count
-        if success and not confirmed:
-            confirmed = True
-            logger.info(f"\nConfirmation received. {'Processing' if args.dry_run else 'Deleting'} files from remaining models automatically...")
-            continue
-        if confirmed and not success:
-            logger.info(f"⏩ No matching files in {repo.id} - skipping")
-    
-    action = "processed (dry run)" if args.dry_run else "deleted"
-    logger.info(f"\nOperation complete! Successfully {action} {total_processed} files across all repositories.")
+
+    plan, errors = maintenance.plan(repos, old_iq1_predicate(args.days), expand=True)
+    total = print_plan(plan, errors)
+    if not total or args.dry_run:
+        action = "processed (dry run)" if args.dry_run else "deleted"
+        logger.info(f"\nOperation complete! Successfully {action} {total} files across all repositories.")
+        return
+
+    if not args.yes:
+        confirm = input(f"\nDelete {total} files from {len(plan)} repositories? (y/n): ").lower()
+        if confirm != 'y':
+            logger.info("Operation cancelled by user")
+            return
+
+    total_processed, _ = maintenance.delete(plan, commit_message="Removing old iq1 files")
+    logger.info(f"\nOperation complete! Successfully deleted {total_processed} files across all repositories.")
 
 if __name__ == "__main__":
     main()
-
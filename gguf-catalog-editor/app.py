@@ -1,13 +1,14 @@
 import sys
 import os
-import re
+import threading
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 print("sys.path:", sys.path)
 print("Parent dir contents:", os.listdir(os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))))
 
 from flask import Flask, render_template, request, redirect, url_for, session, flash
 import json
-from redis_utils import init_redis_catalog
+from redis_utils import init_redis_catalog, is_ndjson_path
+from search_index import CatalogSearchIndex
 from dotenv import load_dotenv
 from datetime import datetime
 
@@ -40,13 +41,25 @@ app = Flask(__name__)
 app.jinja_env.filters['field_type'] = get_field_type
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev-secret-key")
 
+# Shared catalog client: one RedisModelCatalog (and connection pool) for all
+# requests, rebuilt only when the saved settings change
+CATALOG_MAX_CONNECTIONS = int(os.getenv("CATALOG_MAX_CONNECTIONS", "16"))
+CATALOG_HEALTH_CHECK_INTERVAL = int(os.getenv("CATALOG_HEALTH_CHECK_INTERVAL", "30"))
+_client_lock = threading.Lock()
+_config_cache = {"mtime": None, "config": None}
+_client = {"key": None, "catalog": None, "search_index": None}
+
 def get_config():
-    """Load Redis config from secure file"""
+    """Load Redis config from secure file (re-read only when the file changes)"""
     try:
-        if CONFIG_FILE.exists():
+        if not CONFIG_FILE.exists():
+            return None
+        mtime = CONFIG_FILE.stat().st_mtime_ns
+        if _config_cache["mtime"] != mtime:
             with open(CONFIG_FILE) as f:
-                return json.load(f)
-        return None
+                _config_cache["config"] = json.load(f)
+            _config_cache["mtime"] = mtime
+        return _config_cache["config"]
     except Exception as e:
         flash(f"Error loading config: {e}", "danger")
         return None
@@ -56,29 +69,49 @@ def save_config(config):
     try:
         with open(CONFIG_FILE, 'w') as f:
             json.dump(config, f)
+        _config_cache["mtime"] = None
         return True
     except Exception as e:
         flash(f"Error saving config: {e}", "danger")
         return False
 
 def get_catalog():
-    """Initialize Redis connection using saved config"""
+    """Return the shared Redis catalog client for the saved config"""
     config = get_config()
     if not config:
         flash("Redis connection not configured!", "danger")
         return None
-    
-    try:
-        return init_redis_catalog(
-            host=config.get('host', "redis.readyforquantum.com"),
-            port=config.get('port', 46379),
-            password=config.get('password', ""),
-            user=config.get('user', "admin"),
-            ssl=config.get('ssl', True)
-        )
-    except Exception as e:
-        flash(f"Redis connection failed: {e}", "danger")
-        return None
+
+    key = json.dumps(config, sort_keys=True)
+    with _client_lock:
+        if _client["key"] == key:
+            return _client["catalog"]
+        try:
+            catalog = init_redis_catalog(
+                host=config.get('host', "redis.readyforquantum.com"),
+                port=config.get('port', 46379),
+                password=config.get('password', ""),
+                user=config.get('user', "admin"),
+                ssl=config.get('ssl', True),
+                max_connections=CATALOG_MAX_CONNECTIONS,
+                health_check_interval=CATALOG_HEALTH_CHECK_INTERVAL
+            )
+        except Exception as e:
+            flash(f"Redis connection failed: {e}", "danger")
+            return None
+        try:
+            # Checked once per client so list_page stays a single round trip per view
+            catalog.ensure_indexes()
+        except Exception as e:
+            flash(f"Could not verify catalog indexes: {e}", "warning")
+        # The old client is only dropped, not closed: requests still running on it
+        # keep their connections, and its pool is released once they finish
+        _client.update(key=key, catalog=catalog, search_index=CatalogSearchIndex())
+        return catalog
+
+def get_search_index():
+    """Return the search index belonging to the shared catalog client"""
+    return _client["search_index"]
 
 @app.route('/settings', methods=['GET', 'POST'])
 def settings():
@@ -102,39 +135,41 @@ def settings():
         user=current_config.get('user', ''),
         ssl=current_config.get('ssl', True))
 
+# Orderings the index page can serve straight from the catalog's sorted indexes
+INDEX_ORDER_FIELDS = ['added', 'id', 'parameters', 'attempts', 'last_attempt']
+
 @app.route('/')
 def index():
     catalog = get_catalog()
     if not catalog: 
         return redirect(url_for('settings'))
 
-    # Pagination logic using Redis HSCAN for efficiency
     page = request.args.get('page', 1, type=int)
     per_page = 10
+    order_by = request.args.get('order_by', 'added')
+    if order_by not in INDEX_ORDER_FIELDS:
+        order_by = 'added'
+    order_dir = request.args.get('order_dir', 'desc')
+    if order_dir not in ['asc', 'desc']:
+        order_dir = 'desc'
 
-    # Use HSCAN to fetch only the models for the current page
-    start = (page - 1) * per_page
-    end = start + per_page
-
-    # Get all model IDs (fast, as it's just keys)
-    all_model_ids = list(catalog.r.hkeys(catalog.catalog_key))
-    total = len(all_model_ids)
+    # One EVALSHA against the sorted index returns the total and this page's models
+    total, models = catalog.list_page(
+        order_by=order_by,
+        desc=(order_dir == 'desc'),
+        start=(page - 1) * per_page,
+        count=per_page
+    )
     total_pages = (total + per_page - 1) // per_page
 
-    # Get only the model IDs for the current page
-    page_model_ids = all_model_ids[start:end]
-    # Fetch only these models from Redis
-    if page_model_ids:
-        page_models = catalog.r.hmget(catalog.catalog_key, page_model_ids)
-        models = list(zip(page_model_ids, [json.loads(m) if m else {} for m in page_models]))
-    else:
-        models = []
-
     return render_template(
         'index.html',
         models=models,
         page=page,
-        total_pages=total_pages
+        total_pages=total_pages,
+        order_by=order_by,
+        order_dir=order_dir,
+        order_fields=INDEX_ORDER_FIELDS
     )
 
 @app.route('/search', methods=['GET', 'POST'])
@@ -158,178 +193,36 @@ def search():
         search_term = request.args.get('search_term', '').strip()
         search_type = request.args.get('search_type', 'i')
 
-    # Get all model IDs (fast, as it's just keys)
-    all_model_ids = list(catalog.r.hkeys(catalog.catalog_key))
-    fields = []
-    if all_model_ids:
-        # Fetch the first model to get field names
-        first_model_json = catalog.r.hget(catalog.catalog_key, all_model_ids[0])
-        if first_model_json:
-            first_model = json.loads(first_model_json)
-            fields = list(first_model.keys())
-
     # Sorting parameters
     order_by = request.args.get('order_by', None)
     order_dir = request.args.get('order_dir', 'asc')
     if order_dir not in ['asc', 'desc']:
         order_dir = 'asc'
-
-    # Handle field number selection
-    selected_field = None
-    if search_type.isdigit() and fields:
-        field_idx = int(search_type) - 1
-        if 0 <= field_idx < len(fields):
-            selected_field = fields[field_idx]
-
-    # Filter model IDs based on search
-    matched_ids = []
-    match_infos = {}
-    st = search_term.lower()
-    for model_id in all_model_ids:
-        matched = False
-        match_info = []
-        # ID search
-        if search_type == 'i':
-            if not search_term or st in str(model_id).lower():
-                matched = True
-        # All fields search
-        elif search_type == 'a':
-            if not search_term:
-                matched = True
-            else:
-                if st in str(model_id).lower():
-                    matched = True
-                    match_info.append("id")
-                # Fetch model JSON only if needed
-                model_json = catalog.r.hget(catalog.catalog_key, model_id)
-                if model_json:
-                    data = json.loads(model_json)
-                    for field, value in data.items():
-                        if _value_matches_search(value, st):
-                            matched = True
-                            match_info.append(field)
-        # Specific field search
-        elif search_type.isdigit() and selected_field:
-            # Fetch only the field value
-            model_json = catalog.r.hget(catalog.catalog_key, model_id)
-            if model_json:
-                data = json.loads(model_json)
-                value = data.get(selected_field)
-                if _value_matches_search(value, search_term):
-                    matched = True
-                    match_info.append(selected_field)
-        if matched:
-            matched_ids.append(model_id)
-            match_infos[model_id] = match_info
-
-    # Always define pagination variables, even if no results or GET request
     page = request.args.get('page', 1, type=int)
     per_page = 10
-    total = len(matched_ids)
-    total_pages = (total + per_page - 1) // per_page if total > 0 else 1
-
-    # Pagination
-    start = (page - 1) * per_page
-    end = start + per_page
-    page_model_ids = matched_ids[start:end]
-
-    # Fetch only the models for the current page
-    if page_model_ids:
-        page_models = catalog.r.hmget(catalog.catalog_key, page_model_ids)
-        paginated_results = []
-        for model_id, model_json in zip(page_model_ids, page_models):
-            if model_json:
-                data = json.loads(model_json)
-                paginated_results.append((model_id, data, match_infos.get(model_id, [])))
-    else:
-        paginated_results = []
-
-    # Robust sorting logic: always sort as tuple (type, value) to avoid TypeError
-    def get_sort_key(item):
-        model_id, data, _ = item
-        if order_by == 'id':
-            return (0, str(model_id).lower(), "")
-        elif order_by in data:
-            value = data[order_by]
-            from dateutil.parser import parse as date_parse
-            import datetime
-
-            if value is None or (isinstance(value, str) and value.strip() == ""):
-                return (5, "", "")
-
-            if isinstance(value, str):
-                try:
-                    dt = date_parse(value)
-                    return (1, dt.isoformat(), str(value))
-                except Exception:
-                    pass
-            try:
-                return (2, float(value), str(value))
-            except Exception:
-                pass
-            try:
-                return (2, int(value), str(value))
-            except Exception:
-                pass
-            return (3, str(value).lower(), str(value))
-        else:
-            return (6, "", "")
 
-    if order_by:
-        paginated_results.sort(key=get_sort_key, reverse=(order_dir == 'desc'))
+    # Match, sort and paginate the whole result set through the in-process index
+    found = get_search_index().search(
+        catalog,
+        search_term,
+        search_type=search_type,
+        order_by=order_by,
+        order_dir=order_dir,
+        page=page,
+        per_page=per_page
+    )
 
     return render_template('search.html',
-        results=paginated_results,
-        fields=fields,
+        results=found["results"],
+        fields=found["fields"],
         search_term=search_term,
         search_type=search_type,
         page=page,
-        total_pages=total_pages,
+        total_pages=found["total_pages"],
         order_by=order_by,
         order_dir=order_dir
     )
 
-def _value_matches_search(value, search_term):
-    """Check if a field value matches the search term using regex (case-insensitive) and print debug info."""
-    if not search_term:
-        print(f"_value_matches_search: empty search_term, always True", flush=True)
-        return True
-
-    pattern = re.compile(re.escape(search_term), re.IGNORECASE)
-    print(f"_value_matches_search: search_term={search_term!r}, value={value!r}, type={type(value)}", flush=True)
-
-    if isinstance(value, bool):
-        target = 'true' if value else 'false'
-        result = bool(pattern.search(target))
-        print(f"  [bool] pattern={pattern.pattern!r}, target={target!r}, result={result}", flush=True)
-        return result
-    elif isinstance(value, (list, dict)):
-        try:
-            target = json.dumps(value)
-            result = bool(pattern.search(target))
-            print(f"  [list/dict] pattern={pattern.pattern!r}, target={target!r}, result={result}", flush=True)
-            return result
-        except Exception as e:
-            target = str(value)
-            result = bool(pattern.search(target))
-            print(f"  [list/dict fallback] pattern={pattern.pattern!r}, target={target!r}, result={result}, error={e}", flush=True)
-            return result
-    target = str(value)
-    result = bool(pattern.search(target))
-    print(f"  [str] pattern={pattern.pattern!r}, target={target!r}, result={result}", flush=True)
-    return result
-
-
-def _convert_to_search_string(value):
-    """Convert any field value to searchable string"""
-    if isinstance(value, bool):
-        return 'true' if value else 'false'
-    elif isinstance(value, (list, dict)):
-        return json.dumps(value).lower()
-    elif value is None:
-        return ''
-    return str(value).lower()
-
 @app.route('/edit/<path:model_id>', methods=['GET', 'POST'])  # Note the 'path:' prefix
 def edit_model(model_id):
     catalog = get_catalog()
@@ -394,8 +287,8 @@ def edit_model(model_id):
                     changed = True
 
         if changed:
-            # Save the updated model in one Redis call
-            catalog.r.hset(catalog.catalog_key, model_id, json.dumps(updated_model))
+            # Save the updated model (and its index entries) in one Redis round trip
+            catalog.save_model(model_id, updated_model)
             flash("Model updated successfully!", "success")
         else:
             flash("No changes detected.", "info")
@@ -481,7 +374,7 @@ def backup():
     if not catalog: 
         return redirect(url_for('settings'))
     
-    file_path = f"backup_{datetime.now().isoformat()}.json"
+    file_path = f"backup_{datetime.now().isoformat()}.ndjson.gz"
     if catalog.backup_to_file(file_path):
         flash(f"Backup saved to {file_path}", "success")
     else:
@@ -507,12 +400,12 @@ def export():
     if not catalog:
         return redirect(url_for('settings'))
 
-    # Warn if catalog is very large
-    total_models = catalog.r.hlen(catalog.catalog_key)
-    if total_models > 1000:
-        flash(f"Warning: Catalog is large ({total_models} models). Export may take a while.", "warning")
-
-    file_path = f"export_{datetime.now().isoformat()}.json"
+    # Streamed with HSCAN into gzip'd NDJSON, so memory stays flat for large catalogs.
+    # ?format=json still produces the legacy single-object dump.
+    if request.args.get('format') == 'json':
+        file_path = f"export_{datetime.now().isoformat()}.json"
+    else:
+        file_path = f"export_{datetime.now().isoformat()}.ndjson.gz"
     if catalog.backup_to_file(file_path):
         from flask import send_file
         return send_file(file_path, as_attachment=True)
@@ -637,10 +530,12 @@ def restore():
 
     if request.method == 'POST' and 'file' in request.files:
         file = request.files['file']
-        if file.filename.endswith('.json'):
+        if file.filename.endswith('.json') or is_ndjson_path(file.filename):
             try:
-                # Save uploaded file temporarily
-                file_path = f"/tmp/restore_{datetime.now().isoformat()}.json"
+                # Save uploaded file temporarily, keeping its suffixes so the
+                # catalog picks the streaming NDJSON/compressed reader
+                suffix = "".join(Path(file.filename).suffixes[-2:])
+                file_path = f"/tmp/restore_{datetime.now().isoformat()}{suffix}"
                 # Check file size before saving
                 file.seek(0, os.SEEK_END)
                 size_mb = file.tell() / (1024 * 1024)
@@ -655,7 +550,7 @@ def restore():
             except Exception as e:
                 flash(f"Error processing file: {e}", "danger")
         else:
-            flash("Invalid file format! Please upload a JSON file.", "danger")
+            flash("Invalid file format! Please upload a .json, .ndjson or .ndjson.gz/.zst file.", "danger")
         return redirect(url_for('index'))
 
     return render_template('restore.html')
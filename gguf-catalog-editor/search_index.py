@@ -0,0 +1,237 @@
+import json
+import threading
+import time
+from datetime import datetime
+
+
+def to_search_string(value):
+    """Convert any field value to a lower-cased searchable string."""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    elif isinstance(value, (list, dict)):
+        return json.dumps(value).lower()
+    elif value is None:
+        return ''
+    return str(value).lower()
+
+
+def decode_entry(model_json):
+    """Decode a catalog value; None when it is not valid JSON or not an object."""
+    try:
+        data = json.loads(model_json)
+    except (TypeError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _stream_id(event_id):
+    """Turn a Redis stream id "ms-seq" into a comparable tuple."""
+    ms, _, seq = str(event_id).partition("-")
+    return int(ms), int(seq or 0)
+
+
+def sort_key(model_id, data, order_by):
+    """
+    Sort key that never compares mismatched types: (rank, value).
+
+    Dates sort before numbers before strings, and missing/empty values last.
+    """
+    if order_by == 'id':
+        return (0, str(model_id).lower())
+    if order_by not in data:
+        return (6, "")
+    value = data[order_by]
+    if value is None or (isinstance(value, str) and value.strip() == ""):
+        return (5, "")
+    if isinstance(value, str):
+        try:
+            return (1, datetime.fromisoformat(value.strip()).isoformat())
+        except ValueError:
+            pass
+    if not isinstance(value, (list, dict)):
+        try:
+            return (2, float(value))
+        except (TypeError, ValueError):
+            pass
+    return (3, to_search_string(value))
+
+
+class CatalogSearchIndex:
+    """
+    In-process n-gram index over the model catalog for the editor's /search page.
+
+    The index is built once with HSCAN and then kept current by replaying the
+    catalog's change stream (see RedisModelCatalog.changes_key), so a search
+    costs one XRANGE plus the HMGET of models that actually changed. Substring
+    queries of at least `ngram` characters are answered by intersecting n-gram
+    postings and verifying the few candidates; shorter queries scan the
+    in-memory documents.
+    """
+
+    def __init__(self, ngram=3, full_rebuild_seconds=600):
+        self.ngram = ngram
+        # Safety net for writers that bypass RedisModelCatalog and emit no events
+        self.full_rebuild_seconds = full_rebuild_seconds
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.models = {}        # model_id -> decoded entry
+        self.id_text = {}       # model_id -> lower-cased id
+        self.field_text = {}    # model_id -> {field: lower-cased value}
+        self.id_grams = {}      # gram -> {model_id}, id only
+        self.all_grams = {}     # gram -> {model_id}, id and every field
+        self.fields = []        # ordered union of field names
+        self._field_set = set()
+        self.last_event_id = None
+        self.built_at = 0.0
+
+    def _grams(self, text):
+        n = self.ngram
+        return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+    def _add(self, model_id, data):
+        self._remove(model_id)
+        id_text = str(model_id).lower()
+        field_text = {field: to_search_string(value) for field, value in data.items()}
+        self.models[model_id] = data
+        self.id_text[model_id] = id_text
+        self.field_text[model_id] = field_text
+        for field in data:
+            if field not in self._field_set:
+                self._field_set.add(field)
+                self.fields.append(field)
+        id_grams = self._grams(id_text)
+        for gram in id_grams:
+            self.id_grams.setdefault(gram, set()).add(model_id)
+        all_grams = set(id_grams)
+        for text in field_text.values():
+            all_grams |= self._grams(text)
+        for gram in all_grams:
+            self.all_grams.setdefault(gram, set()).add(model_id)
+
+    def _remove(self, model_id):
+        if model_id not in self.models:
+            return
+        id_grams = self._grams(self.id_text[model_id])
+        all_grams = set(id_grams)
+        for text in self.field_text[model_id].values():
+            all_grams |= self._grams(text)
+        for postings, grams in ((self.id_grams, id_grams), (self.all_grams, all_grams)):
+            for gram in grams:
+                ids = postings.get(gram)
+                if ids is not None:
+                    ids.discard(model_id)
+                    if not ids:
+                        del postings[gram]
+        del self.models[model_id]
+        del self.id_text[model_id]
+        del self.field_text[model_id]
+
+    def _rebuild(self, catalog):
+        self._reset()
+        # Take the stream position first so edits made during the scan get replayed
+        last = catalog.r.xrevrange(catalog.changes_key, count=1)
+        self.last_event_id = last[0][0] if last else "0-0"
+        for model_id, model_json in catalog.iter_catalog():
+            data = decode_entry(model_json)
+            if data is not None:
+                self._add(model_id, data)
+        self.built_at = time.time()
+
+    def refresh(self, catalog):
+        """Bring the index up to date with the catalog, incrementally when possible."""
+        if self.last_event_id is None or time.time() - self.built_at > self.full_rebuild_seconds:
+            self._rebuild(catalog)
+            return
+        events = catalog.r.xrange(catalog.changes_key, min=f"({self.last_event_id}", max="+")
+        if not events:
+            return
+        # If the capped stream was trimmed past our position we may have missed events
+        first = catalog.r.xrange(catalog.changes_key, count=1)
+        if self.last_event_id != "0-0" and first and _stream_id(first[0][0]) > _stream_id(self.last_event_id):
+            self._rebuild(catalog)
+            return
+        changed = set()
+        for event_id, event in events:
+            if event.get("op") == "reset":
+                self._rebuild(catalog)
+                return
+            changed.add(event.get("id"))
+        changed = [mid for mid in changed if mid]
+        for model_id, model_json in zip(changed, catalog.r.hmget(catalog.catalog_key, changed)):
+            data = decode_entry(model_json) if model_json else None
+            if data is not None:
+                self._add(model_id, data)
+            else:
+                self._remove(model_id)
+        self.last_event_id = events[-1][0]
+
+    def _candidates(self, term, postings, universe):
+        if len(term) < self.ngram:
+            return universe
+        ids = None
+        for gram in sorted(self._grams(term), key=lambda g: len(postings.get(g, ()))):
+            hits = postings.get(gram)
+            if not hits:
+                return set()
+            ids = set(hits) if ids is None else ids & hits
+            if not ids:
+                return set()
+        return ids
+
+    def search(self, catalog, search_term, search_type='i', order_by=None, order_dir='asc', page=1, per_page=10):
+        """
+        Search, sort and paginate in one pass over the matches.
+
+        Args:
+            search_term: Case-insensitive substring to look for ("" matches everything)
+            search_type: 'i' for IDs, 'a' for all fields, or the 1-based number of a field in self.fields
+            order_by: 'id' or a field name to sort the full result set by
+            order_dir: 'asc' or 'desc'
+
+        Returns:
+            dict: results (list of (model_id, data, matched_fields)), total, total_pages, fields
+        """
+        with self._lock:
+            self.refresh(catalog)
+            term = (search_term or "").lower()
+            fields = list(self.fields)
+            universe = self.models.keys()
+
+            selected_field = None
+            if search_type.isdigit():
+                idx = int(search_type) - 1
+                if 0 <= idx < len(fields):
+                    selected_field = fields[idx]
+
+            matches = []
+            if search_type == 'i':
+                for model_id in self._candidates(term, self.id_grams, universe):
+                    if term in self.id_text[model_id]:
+                        matches.append((model_id, []))
+            elif search_type == 'a':
+                for model_id in self._candidates(term, self.all_grams, universe):
+                    if not term:
+                        matches.append((model_id, []))
+                        continue
+                    info = ["id"] if term in self.id_text[model_id] else []
+                    info += [f for f, text in self.field_text[model_id].items() if term in text]
+                    if info:
+                        matches.append((model_id, info))
+            elif selected_field:
+                for model_id in self._candidates(term, self.all_grams, universe):
+                    if term in self.field_text[model_id].get(selected_field, ""):
+                        matches.append((model_id, [selected_field]))
+
+            if order_by:
+                matches.sort(key=lambda m: sort_key(m[0], self.models[m[0]], order_by),
+                             reverse=(order_dir == 'desc'))
+            else:
+                matches.sort(key=lambda m: m[0])
+
+            total = len(matches)
+            total_pages = (total + per_page - 1) // per_page if total > 0 else 1
+            start = (page - 1) * per_page
+            results = [(mid, self.models[mid], info) for mid, info in matches[start:start + per_page]]
+            return {"results": results, "total": total, "total_pages": total_pages, "fields": fields}
@@ -8,6 +8,8 @@ Usage:
                                 [--include SUBSTR ...]
                                 [--exclude SUBSTR ...]
                                 [--message "commit message"]
+                                [--workers N] [--rate-per-minute N]
+                                [--journal FILE] [--restart]
                                 [--dry-run]
                                 [--yes]
 
@@ -20,14 +22,29 @@ Examples:
 
   # Datasets, with a custom message
   python hf_super_squash_all.py --repo-type dataset --message "Reclaim storage"
+
+Repos are processed by a pool of workers that share one rate controller: calls
+are spaced to --rate-per-minute and every 429 widens the spacing and triggers a
+growing cooldown. Each finished repo is appended to the journal, so rerunning
+after an interruption or failures continues where it stopped (--restart starts
+over). A run that finishes without failures removes the journal, so the next
+maintenance pass squashes every repo again. Repos whose default branch has a
+single commit are skipped.
 """
 
 import os
 import sys
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Optional, List
+from urllib.parse import quote
 
 from huggingface_hub import HfApi, login
+from huggingface_hub.utils import get_session, build_hf_headers, hf_raise_for_status, HfHubHTTPError
+from repo_maintenance import Journal, RateController, call_with_rate
+
+DEFAULT_JOURNAL = "super_squash_journal.jsonl"
+
 
 def detect_default_branch(api: HfApi, repo_id: str, repo_type: str) -> str:
     """
@@ -41,9 +58,43 @@ def detect_default_branch(api: HfApi, repo_id: str, repo_type: str) -> str:
             # Some repos still default to "main" or "master"; try "main" first.
             return "main"
         return default_branch
+    except HfHubHTTPError as e:
+        status = getattr(e.response, "status_code", None)
+        # Rate limits and server errors must reach call_with_rate, not become "main"
+        if status is not None and (status == 429 or status >= 500):
+            raise
+        return "main"
     except Exception:
         return "main"
 
+def has_multiple_commits(api: HfApi, repo_id: str, repo_type: str, branch: str) -> bool:
+    """
+    True if the branch has more than one commit.
+
+    Reads only the first page of the commits endpoint with limit=2 instead of
+    paginating through the whole history like list_repo_commits does.
+    """
+    # Same route as list_repo_commits: /api/{models,datasets,spaces}/{repo_id}/commits/{rev}
+    url = f"{api.endpoint}/api/{repo_type}s/{repo_id}/commits/{quote(branch, safe='')}"
+    response = get_session().get(url, params={"limit": 2}, headers=build_hf_headers(token=api.token))
+    hf_raise_for_status(response)
+    return len(response.json()) > 1
+
+def squash_repo(api: HfApi, rate: RateController, repo_id: str, repo_type: str, message: str) -> str:
+    """Squash one repo. Returns the journal status."""
+    branch = call_with_rate(rate, detect_default_branch, api, repo_id, repo_type)
+    if not call_with_rate(rate, has_multiple_commits, api, repo_id, repo_type, branch):
+        return "single-commit"
+    call_with_rate(
+        rate,
+        api.super_squash_history,
+        repo_id=repo_id,
+        branch=branch,
+        commit_message=message,
+        repo_type=repo_type,
+    )
+    return "squashed"
+
 def should_process(name: str, include: List[str], exclude: List[str]) -> bool:
     n = name.lower()
     if include and not any(s in n for s in include):
@@ -59,6 +110,11 @@ def main():
     p.add_argument("--include", nargs="*", default=[], help="Process only repos whose name contains any of these substrings (case-insensitive)")
     p.add_argument("--exclude", nargs="*", default=[], help="Skip repos whose name contains any of these substrings (case-insensitive)")
     p.add_argument("--message", default="Super-squash history to reclaim storage", help="Commit message for the squash")
+    p.add_argument("--workers", type=int, default=int(os.getenv("SQUASH_WORKERS", "4")), help="Repos processed in parallel")
+    p.add_argument("--rate-per-minute", type=int, default=60, help="Hub API calls per minute across all workers (adapts down on 429)")
+    p.add_argument("--journal", default=DEFAULT_JOURNAL,
+                   help="Progress journal used to resume unfinished runs (removed after a run without failures)")
+    p.add_argument("--restart", action="store_true", help="Ignore the journal and process every repo again")
     p.add_argument("--dry-run", action="store_true", help="Show what would be done but do not execute")
     p.add_argument("--yes", action="store_true", help="Do not prompt for confirmation; proceed automatically")
     args = p.parse_args()
@@ -109,10 +165,19 @@ def main():
         print("No repositories matched the filters.")
         return
 
-    print(f"Matched {len(repo_ids)} repos.")
+    journal = Journal(args.journal, done_statuses={"squashed", "single-commit"},
+                      restart=args.restart and not args.dry_run)
+    pending = [r for r in repo_ids if not journal.is_done(r)]
+    print(f"Matched {len(repo_ids)} repos, {len(repo_ids) - len(pending)} already done in {args.journal}.")
+    if not pending:
+        if not args.dry_run:
+            # The previous run finished but was stopped before it could remove its journal
+            journal.discard()
+        return
     if args.dry_run:
-        for r in repo_ids:
-            branch = detect_default_branch(api, r, args.repo_type)
+        rate = RateController(args.rate_per_minute)
+        for r in pending:
+            branch = call_with_rate(rate, detect_default_branch, api, r, args.repo_type)
             print(f"[DRY-RUN] Would super-squash {r} (branch: {branch}) with message: {args.message}")
         return
 
@@ -125,26 +190,28 @@ def main():
             print("Aborted.")
             return
 
-    successes = 0
-    failures = 0
-
-    for repo_id in repo_ids:
-        branch = detect_default_branch(api, repo_id, args.repo_type)
-        print(f"\nProcessing: {repo_id} (branch: {branch})")
-        try:
-            api.super_squash_history(
-                repo_id=repo_id,
-                branch=branch,
-                commit_message=args.message,
-                repo_type=args.repo_type,
-            )
-            print("  ✓ Super-squash completed.")
-            successes += 1
-        except Exception as e:
-            print(f"  ✗ Error: {e}")
-            failures += 1
-
-    print(f"\nDone. Successful: {successes}  Failed: {failures}")
+    rate = RateController(rate_limit_per_minute=args.rate_per_minute)
+    counts = {"squashed": 0, "single-commit": 0, "failed": 0}
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = {pool.submit(squash_repo, api, rate, r, args.repo_type, args.message): r for r in pending}
+        for future in as_completed(futures):
+            repo_id = futures[future]
+            try:
+                status = future.result()
+                journal.record(repo_id, status)
+                print(f"  ✓ {repo_id}: {'super-squash completed' if status == 'squashed' else 'single commit, skipped'}")
+            except Exception as e:
+                status = "failed"
+                journal.record(repo_id, status, error=str(e))
+                print(f"  ✗ {repo_id}: {e}")
+            counts[status] += 1
+
+    print(f"\nDone. Successful: {counts['squashed']}  Skipped (single commit): {counts['single-commit']}  Failed: {counts['failed']}")
+    if counts["failed"]:
+        print(f"Rerun to retry the failed repos; progress is kept in {args.journal}.")
+    else:
+        journal.discard()
     print("Note: Storage metrics in Settings can take time to refresh.")
 
 if __name__ == "__main__":
@@ -19,41 +19,40 @@ def main():
         ssl=True
     )
 
-    all_models = catalog.load_catalog()
     now = datetime.now()
     cutoff = now - timedelta(days=30)
+    # The "added" sorted-set index holds every parseable added date as a timestamp,
+    # so nothing here has to fetch or decode model JSON.
+    catalog.ensure_indexes()
+    total_models = catalog.r.hlen(catalog.catalog_key)
+    added_scores = catalog.r.zrange(catalog.index_key("added"), 0, -1, withscores=True)
+    converted_old = set(catalog.find(converted=True, added_lt=cutoff))
     updated = 0
-    total_with_added = 0
+    total_with_added = len(added_scores)
     total_old = 0
     already_converted = 0
 
-    print(f"Loaded {len(all_models)} models from catalog.")
+    print(f"Loaded {total_models} models from catalog.")
     print(f"Today's date: {now}")
     print(f"Cutoff date (models added before this are considered old): {cutoff}")
 
     added_dates = []
     old_models = []
-    for model_id, entry in all_models.items():
-        added_str = entry.get("added", "")
-        converted = entry.get("converted", False)
-        if added_str:
-            total_with_added += 1
-            try:
-                added_date = datetime.fromisoformat(added_str)
-                added_dates.append(added_date)
-            except Exception:
-                print(f"Skipping {model_id}: could not parse date '{added_str}'")
-                continue
-            if added_date < cutoff:
-                total_old += 1
-                old_models.append((model_id, added_str, converted))
-                print(f"{model_id}: added={added_str}, converted={converted}")
-                if not converted:
-                    print(f"Marking {model_id} as converted (added: {added_str})")
-                    if catalog.update_model_field(model_id, "converted", True):
-                        updated += 1
-                else:
-                    already_converted += 1
+    for model_id, score in added_scores:
+        added_date = datetime.fromtimestamp(score)
+        added_str = added_date.isoformat()
+        added_dates.append(added_date)
+        if added_date < cutoff:
+            converted = model_id in converted_old
+            total_old += 1
+            old_models.append((model_id, added_str, converted))
+            print(f"{model_id}: added={added_str}, converted={converted}")
+            if not converted:
+                print(f"Marking {model_id} as converted (added: {added_str})")
+                if catalog.update_model_field(model_id, "converted", True):
+                    updated += 1
+            else:
+                already_converted += 1
 
     print(f"\nCutoff date for conversion: {cutoff}")
     print(f"Models older than cutoff ({total_old}):")
@@ -64,7 +63,7 @@ def main():
     print(f"{already_converted} models were already converted and older than 1 month.")
     print(f"{total_old} models are older than 1 month in total.")
     print(f"{total_with_added} models have an 'added' date.")
-    print(f"{len(all_models)} models in total.")
+    print(f"{total_models} models in total.")
 
     # Print summary of added dates
     if added_dates:
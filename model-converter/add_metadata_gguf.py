@@ -6,6 +6,7 @@ import tempfile
 from pathlib import Path
 import subprocess
 import argparse
+from llama_toolchain import resolve_toolchain_dir
 """
 add_metadata_gguf.py
 
@@ -14,7 +15,7 @@ from the llama.cpp/gguf-py/gguf/scripts directory. It supports both direct key=t
 and loading overrides from a file.
 
 Main Steps:
-1. Copies update_gguf.py to the expected llama.cpp/gguf-py/gguf/scripts directory.
+1. Copies update_gguf.py to the gguf-py/gguf/scripts directory of the job's llama.cpp toolchain.
 2. Runs update_gguf.py with the specified input GGUF file, outputting to a temporary file.
 3. Supports metadata overrides via command-line or file.
 4. Replaces the original GGUF file with the updated file containing new metadata.
@@ -57,7 +58,8 @@ def add_metadata(input_file_path: str, overrides: list[str] = None, override_fil
     script_dir = Path(__file__).parent
     src_script = script_dir / "update_gguf.py"
 
-    gguf_dir = Path.home() / "code" / "models" / "llama.cpp" / "gguf-py"
+    # gguf-py of the toolchain this job pinned, not the shared llama.cpp checkout
+    gguf_dir = Path(resolve_toolchain_dir()) / "gguf-py"
     dest_dir = gguf_dir / "gguf" / "scripts"
 
     if not dest_dir.exists():
@@ -1,28 +1,47 @@
 #!/usr/bin/env python3
 """
-Add all your Hugging Face models that satisfy a name match to a collection.
+Sync a Hugging Face collection with all your models that satisfy a name match.
+
+The collection's current items are fetched once and only the missing models are
+added (optionally stale ones removed), so a re-run with no new models makes no
+write calls. Writes are paced by the shared repo_maintenance.RateController,
+which backs off adaptively on HTTP 429.
 
 Usage examples
 --------------
 # Case-insensitive 'startswith' (default):
-python add_models_to_collection.py
+python add_models_to_collection.py --title "Qwen3 GGUF" --prefix Qwen3
+
+# Case-sensitive 'contains' anywhere in name, removing models that no longer match:
+python add_models_to_collection.py --title "Coder GGUF" --prefix Coder --matchany --prune
 
-# Case-sensitive 'contains' anywhere in name:
-python add_models_to_collection.py --matchany
+# Show what would change:
+python add_models_to_collection.py --title "Qwen3 GGUF" --prefix Qwen3 --dry-run
 """
 from huggingface_hub import (
     HfApi, login, list_models, list_collections,
-    create_collection, add_collection_item,
+    create_collection,
 )
 from dotenv import load_dotenv
 import huggingface_hub as hfhub
-import argparse, os, sys, time
+import argparse, os, sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from repo_maintenance import RateController, call_with_rate
 
 # ───────────────────────── 0 · CLI flags ────────────────────────────────
 cli = argparse.ArgumentParser(description="Populate a HF collection with models.")
 cli.add_argument("--matchany", action="store_true",
                  help="Match PREFIX anywhere in model name (case-sensitive). "
                       "Default: match only at the start (case-insensitive).")
+cli.add_argument("--user", help="HF username (default: model-converter/username)")
+cli.add_argument("--title", help="Collection display title")
+cli.add_argument("--prefix", help="Model name prefix to include")
+cli.add_argument("--prune", action="store_true",
+                 help="Remove models from the collection that no longer match")
+cli.add_argument("--dry-run", action="store_true", help="Show the diff without writing")
+cli.add_argument("--rate-per-minute", type=int, default=120,
+                 help="Collection writes per minute (adapts down on 429)")
 args = cli.parse_args()
 
 # ───────────────────────── 1 · Authenticate ─────────────────────────────
@@ -34,14 +53,21 @@ login(token=token)                          # stores token
 api = HfApi()
 print(f"📦 huggingface_hub {hfhub.__version__}")
 
-# ───────────────────────── 2 · Prompt user ──────────────────────────────
-user   = input("Your HF username (case-sensitive): ").strip()
-title  = input("Collection display title: ").strip()
-prefix = input("Model name prefix to include: ").strip()
+# ───────────────────────── 2 · Options ──────────────────────────────────
+if not args.title or not args.prefix:
+    cli.error("--title and --prefix are required")
+if args.user:
+    user = args.user
+else:
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "username"), "r") as f:
+        user = f.read().strip()
+title, prefix = args.title, args.prefix
 
 # ───────────────────────── 3 · Ensure collection ────────────────────────
 coll = next((c for c in list_collections(owner=user) if c.title == title), None)
 if coll is None:
+    if args.dry_run:
+        sys.exit(f"❌  Collection '{title}' does not exist (dry run, not creating)")
     print("🆕  Creating collection …")
     coll = create_collection(
         title=title,
@@ -54,6 +80,10 @@ if coll is None:
 else:
     print(f"✅  Using existing collection: {coll.slug}")
 
+# list_collections only returns a preview of the items, so fetch the full list once
+current = {item.item_id: item for item in api.get_collection(coll.slug).items
+           if item.item_type == "model"}
+
 # ───────────────────────── 4 · Gather models ────────────────────────────
 def model_matches(model_id: str) -> bool:
     # remove "user/" prefix for matching
@@ -63,25 +93,43 @@ def model_matches(model_id: str) -> bool:
     return short.lower().startswith(prefix.lower())
 
 models = [m.id for m in list_models(author=user) if model_matches(m.id)]
-if not models:
+if not models and not args.prune:
     sys.exit("❌  No models matched the given criteria.")
 
-print(f"🔍  {len(models)} model(s) match:")
-for m in models: print(" •", m)
+wanted = set(models)
+to_add = [m for m in models if m not in current]
+to_remove = [mid for mid in current if mid.startswith(f"{user}/") and mid not in wanted] if args.prune else []
+
+print(f"🔍  {len(models)} model(s) match, {len(current)} already in collection: "
+      f"{len(to_add)} to add, {len(to_remove)} to remove")
+for m in to_add: print(" +", m)
+for m in to_remove: print(" -", m)
+if args.dry_run or not (to_add or to_remove):
+    print("\n🎉  Nothing to write." if not (to_add or to_remove) else "\n(dry run, no changes made)")
+    sys.exit(0)
+
+# ───────────────────────── 5 · Apply diff ───────────────────────────────
+# Same pacing/429 policy as hf_super_squash_all.py (repo_maintenance.RateController)
+rate = RateController(args.rate_per_minute)
+failures = 0
+for i, mid in enumerate(to_add, 1):
+    print(f"[{i}/{len(to_add)}] adding {mid.ljust(50)}", end="")
+    try:
+        call_with_rate(rate, api.add_collection_item, collection_slug=coll.slug, item_id=mid,
+                       item_type="model", exists_ok=True)
+        print(" ✓")
+    except Exception as e:
+        failures += 1
+        print(" ✗", e)
 
-# ───────────────────────── 5 · Add items ────────────────────────────────
-for i, mid in enumerate(models, 1):
-    print(f"[{i}/{len(models)}] adding {mid.ljust(50)}", end="")
+for i, mid in enumerate(to_remove, 1):
+    print(f"[{i}/{len(to_remove)}] removing {mid.ljust(48)}", end="")
     try:
-        add_collection_item(
-            collection_slug=coll.slug,
-            item_id=mid,
-            item_type="model",
-            exists_ok=True
-        )
+        call_with_rate(rate, api.delete_collection_item, collection_slug=coll.slug,
+                       item_object_id=current[mid].item_object_id, missing_ok=True)
         print(" ✓")
     except Exception as e:
+        failures += 1
         print(" ✗", e)
-    time.sleep(0.4)
 
-print("\n🎉  Completed. View at:", coll.url)
+print(f"\n🎉  Completed with {failures} failure(s). View at:", coll.url)
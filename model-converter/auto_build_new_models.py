@@ -8,16 +8,19 @@ Main Steps:
 1. Loads environment variables and configures logging.
 2. Connects to a Redis instance to manage the model catalog.
 3. Loads a JSON grammar and a quantized GGUF model for LLM-based commit analysis.
-4. Fetches recent commits from the llama.cpp GitHub repository.
-5. For each new commit, analyzes commit messages and file changes using the LLM to detect new model additions.
+4. Polls the llama.cpp GitHub repository with conditional requests, paging back only to last_commit.txt.
+5. For each new commit, runs a deterministic pre-filter (commit_prefilter.py) over paths, diffs and the
+   commit message, and only sends ambiguous commits to the LLM to detect new model additions.
 6. If a new model is detected, searches for it on Hugging Face and adds it to the Redis catalog.
 7. Runs in a continuous loop, checking for new commits every 10 minutes.
 
 Functions:
+    - get_commit_poller(): Shared GitHubCommitPoller (github_poller.py) with ETag revalidation and a sha-keyed details cache.
     - fetch_last_50_commits(): Fetches and caches the last 50 commits from GitHub.
     - load_cached_commits(): Loads cached commits from disk.
     - fetch_commit_details(commit_sha): Fetches details for a specific commit.
-    - analyze_commit(commit): Uses the LLM to analyze a commit for new model detection.
+    - CommitAnalyzer: Long-lived LLM analyzer exposing analyze(commit) and analyze_batch(commits).
+    - analyze_commit(commit): Uses the shared CommitAnalyzer to analyze a commit for new model detection.
     - extract_relevant_file_changes(files): Extracts relevant file changes for model detection.
     - build_commit_analysis_prompt(message, file_changes): Builds the prompt for the LLM.
     - parse_and_validate_llm_response(response_text): Parses and validates the LLM's JSON response.
@@ -48,9 +51,11 @@ import re
 import time
 from datetime import datetime
 from llama_cpp import Llama, LlamaGrammar
-from huggingface_hub import HfApi
 from dotenv import load_dotenv
 from redis_utils import init_redis_catalog  # Import our Redis utility
+from github_poller import GitHubCommitPoller
+from hf_model_resolver import get_model_resolver
+from commit_prefilter import classify_commit, AMBIGUOUS, NEW_MODEL
 # Configure logging
 logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s",
@@ -107,10 +112,10 @@ GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 
 # GitHub API settings
 GITHUB_REPO = "ggml-org/llama.cpp"
-GITHUB_API_URL = f"https://api.github.com/repos/{GITHUB_REPO}/commits"
+GITHUB_API_BASE = "https://api.github.com"
+GITHUB_API_URL = f"{GITHUB_API_BASE}/repos/{GITHUB_REPO}/commits"
 LAST_COMMIT_FILE = "last_commit.txt"
 COMMITS_CACHE_FILE = "commits_cache.json"
-HEADERS = {"Authorization": f"Bearer {GITHUB_TOKEN}"}
 MAX_TOKENS = 8192
 
 # Local model paths
@@ -128,126 +133,172 @@ except Exception as e:
     logging.error(f"Failed to load grammar: {e}")
     exit(1)
 
+_commit_poller = None
+
+def get_commit_poller():
+    """Return the process-wide GitHubCommitPoller (ETag revalidation, cached commit details)."""
+    global _commit_poller
+    if _commit_poller is None:
+        _commit_poller = GitHubCommitPoller(GITHUB_REPO, token=GITHUB_TOKEN, cache_file=COMMITS_CACHE_FILE,
+                                            api_url=GITHUB_API_BASE, per_page=50)
+    return _commit_poller
+
 def fetch_last_50_commits():
-    """Fetch the last 50 commits from GitHub API and cache them."""
+    """Fetch the last 50 commits from GitHub API (304 when unchanged) and cache them."""
     logging.info(f"Fetching last 50 commits from {GITHUB_REPO}...")
     try:
-        params = {"per_page": 50}
-        response = requests.get(GITHUB_API_URL, headers=HEADERS, params=params, timeout=10)
-        response.raise_for_status()
-        commits = response.json()
-        
+        commits = get_commit_poller().fetch_recent()
         if not commits:
             logging.warning("No commits found!")
             return None
-
-        logging.info(f"Fetched {len(commits)} commits from GitHub API.")
-        with open(COMMITS_CACHE_FILE, "w") as f:
-            json.dump(commits, f, indent=2)
         return commits
-
     except requests.RequestException as e:
         logging.error(f"GitHub API error: {e}")
         return None
 
 def load_cached_commits():
     """Load commits from the cache file if it exists."""
-    if os.path.exists(COMMITS_CACHE_FILE):
-        logging.info(f"Loading cached commits from {COMMITS_CACHE_FILE}...")
-        with open(COMMITS_CACHE_FILE, "r") as f:
-            return json.load(f)
-    return None
+    return get_commit_poller().cache["commits"] or None
 
 def fetch_commit_details(commit_sha):
-    """Fetch details for a specific commit."""
+    """Fetch details for a specific commit (served from the sha-keyed cache when possible)."""
     logging.info(f"Fetching details for commit {commit_sha}...")
-    try:
-        commit_url = f"https://api.github.com/repos/{GITHUB_REPO}/commits/{commit_sha}"
-        commit_response = requests.get(commit_url, headers=HEADERS, timeout=10)
-        commit_response.raise_for_status()
-        return commit_response.json()
-    except requests.RequestException as e:
-        logging.error(f"GitHub API error: {e}")
-        return None
+    return get_commit_poller().fetch_detail(commit_sha)
+
+class CommitAnalyzer:
+    """
+    Long-lived LLM commit analyzer.
+
+    The GGUF model is loaded once (lazily, on the first analysis) and kept for the
+    lifetime of the process together with the JSON grammar. Every prompt built by
+    build_commit_analysis_prompt() starts with the same COMMIT_ANALYSIS_SYSTEM_PROMPT,
+    and llama.cpp keeps the KV cache of the previous prompt, so only the tokens
+    after that shared prefix (the commit message and file changes) are evaluated
+    for each commit.
+    """
+
+    def __init__(self, model_path=LOCAL_MODEL_PATH, grammar=None, n_ctx=MAX_TOKENS, max_tokens=MAX_TOKENS):
+        self.model_path = model_path
+        self.grammar = grammar
+        self.n_ctx = n_ctx
+        self.max_tokens = max_tokens
+        self.llm = None
+
+    def load(self):
+        """Load the quantized GGUF model if it is not loaded yet."""
+        if self.llm is not None:
+            return self.llm
+        logging.info("Loading quantized GGUF model...")
+        try:
+            self.llm = Llama(
+                model_path=self.model_path,
+                n_ctx=self.n_ctx,
+                verbose=False,
+                chat_format="chatml"
+            )
+        except Exception as e:
+            logging.error(f"Failed to load model: {e}")
+            exit(1)
+        return self.llm
 
-def analyze_commit(commit):
-    """Analyze commit message and file changes to detect new models using the LLM."""
-    logging.info("Loading quantized GGUF model...")
-    try:
-        llm = Llama(
-            model_path=LOCAL_MODEL_PATH,
-            n_ctx=MAX_TOKENS,
-            verbose=False,
-            chat_format="chatml"
-        )
-    except Exception as e:
-        logging.error(f"Failed to load model: {e}")
-        exit(1)
+    def analyze(self, commit):
+        """
+        Analyze commit message and file changes to detect new models using the LLM.
 
-    commit_sha = commit.get("sha", "UNKNOWN_SHA")[:8]  # Shorten SHA for readability
-    message = commit.get("commit", {}).get("message", "No commit message found")
-    files = commit.get("files", [])
+        Returns:
+            tuple: (is_new_model, model_name)
+        """
+        llm = self.load()
 
-    # Enhanced logging for commit info
-    logging.info(f"\n{'='*50}\nAnalyzing commit: {commit_sha}")
-    logging.info(f"Commit message preview: {message[:200]}...")  # First 200 chars
-    logging.info(f"Total files changed: {len(files)}")
+        commit_sha = commit.get("sha", "UNKNOWN_SHA")[:8]  # Shorten SHA for readability
+        message = commit.get("commit", {}).get("message", "No commit message found")
+        files = commit.get("files", [])
 
-    file_changes = extract_relevant_file_changes(files)
-    logging.info(f"Relevant files found: {len(file_changes)}")
-    for i, change in enumerate(file_changes[:3]):  # Show first 3 relevant files
-        logging.info(f"  {i+1}. {change['filename']}")
-        logging.info(f"     Changes preview: {change['patch_preview'][:1000]}...")
+        # Enhanced logging for commit info
+        logging.info(f"\n{'='*50}\nAnalyzing commit: {commit_sha}")
+        logging.info(f"Commit message preview: {message[:200]}...")  # First 200 chars
+        logging.info(f"Total files changed: {len(files)}")
 
-    prompt_messages = build_commit_analysis_prompt(message, file_changes)
-    
-    # Log the system prompt (first message)
-    if prompt_messages and len(prompt_messages) > 0:
-        logging.debug("System prompt:")
-        for line in prompt_messages[0]['content'].split('\n')[:10]:  # First 10 lines
-            logging.debug(f"  {line}")
+        file_changes = extract_relevant_file_changes(files)
+        logging.info(f"Relevant files found: {len(file_changes)}")
+        for i, change in enumerate(file_changes[:3]):  # Show first 3 relevant files
+            logging.info(f"  {i+1}. {change['filename']}")
+            logging.info(f"     Changes preview: {change['patch_preview'][:1000]}...")
 
-    try:
-        logging.info("Sending prompt to LLM...")
-        llm_response = llm.create_chat_completion(
-            messages=prompt_messages,
-            max_tokens=MAX_TOKENS,
-            temperature=0.0,
-            grammar=grammar
-        )
-
-        # Log full LLM response for debugging
-        logging.debug(f"Raw LLM response: {json.dumps(llm_response, indent=2)}")
-
-        choice = llm_response.get("choices", [{}])[0]
-        response_text = choice["message"].get("content", "").strip() if "message" in choice else choice.get("text", "").strip()
-        
-        # Log the raw response before parsing
-        logging.info(f"LLM raw response: {response_text[:200]}...")  # First 200 chars
-        
-        llm_output = parse_and_validate_llm_response(response_text)
-        is_new_model = llm_output.get("is_new_model", False)
-        model_name = llm_output.get("model_name_if_found", None)
-        confidence = llm_output.get("confidence", "unknown")
-        reason = llm_output.get("reason_for_answer", "No reason provided")
-        
-        logging.info(f"\nCommit Analysis Results:")
-        logging.info(f"  New model detected: {is_new_model}")
-        if model_name:
-            logging.info(f"  Model name: {model_name}")
-        logging.info(f"  Confidence: {confidence}")
-        logging.info(f"  Reason: {reason}")
-        logging.info(f"{'='*50}\n")
-
-        return is_new_model, model_name
-
-    except (json.JSONDecodeError, ValueError) as e:
-        logging.error(f"Invalid LLM response format: {e}")
-        logging.error(f"Response that failed parsing: {response_text[:500]}...")  # First 500 chars
-        return False, None
-    except Exception as e:
-        logging.error(f"Unexpected error during LLM analysis: {e}")
-        return False, None
+        prompt_messages = build_commit_analysis_prompt(message, file_changes)
+
+        response_text = ""
+        try:
+            logging.info("Sending prompt to LLM...")
+            llm_response = llm.create_chat_completion(
+                messages=prompt_messages,
+                max_tokens=self.max_tokens,
+                temperature=0.0,
+                grammar=self.grammar
+            )
+
+            # Log full LLM response for debugging
+            logging.debug(f"Raw LLM response: {json.dumps(llm_response, indent=2)}")
+
+            choice = llm_response.get("choices", [{}])[0]
+            response_text = choice["message"].get("content", "").strip() if "message" in choice else choice.get("text", "").strip()
+
+            # Log the raw response before parsing
+            logging.info(f"LLM raw response: {response_text[:200]}...")  # First 200 chars
+
+            llm_output = parse_and_validate_llm_response(response_text)
+            is_new_model = llm_output.get("is_new_model", False)
+            model_name = llm_output.get("model_name_if_found", None)
+            confidence = llm_output.get("confidence", "unknown")
+            reason = llm_output.get("reason_for_answer", "No reason provided")
+
+            logging.info(f"\nCommit Analysis Results:")
+            logging.info(f"  New model detected: {is_new_model}")
+            if model_name:
+                logging.info(f"  Model name: {model_name}")
+            logging.info(f"  Confidence: {confidence}")
+            logging.info(f"  Reason: {reason}")
+            logging.info(f"{'='*50}\n")
+
+            return is_new_model, model_name
+
+        except (json.JSONDecodeError, ValueError) as e:
+            logging.error(f"Invalid LLM response format: {e}")
+            logging.error(f"Response that failed parsing: {response_text[:500]}...")  # First 500 chars
+            return False, None
+        except Exception as e:
+            logging.error(f"Unexpected error during LLM analysis: {e}")
+            return False, None
+
+    def analyze_batch(self, commits):
+        """
+        Analyze several commits with the same loaded model.
+
+        Commits are evaluated one after another so each prompt reuses the cached
+        system prompt prefix left by the previous one.
+
+        Returns:
+            list: (commit, is_new_model, model_name) in input order
+        """
+        self.load()
+        results = []
+        for commit in commits:
+            is_new_model, model_name = self.analyze(commit)
+            results.append((commit, is_new_model, model_name))
+        return results
+
+_commit_analyzer = None
+
+def get_commit_analyzer():
+    """Return the process-wide CommitAnalyzer, creating it on first use."""
+    global _commit_analyzer
+    if _commit_analyzer is None:
+        _commit_analyzer = CommitAnalyzer(grammar=grammar)
+    return _commit_analyzer
+
+def analyze_commit(commit):
+    """Analyze commit message and file changes to detect new models using the LLM."""
+    return get_commit_analyzer().analyze(commit)
 
 def extract_relevant_file_changes(files):
     """Extract relevant file changes for model addition detection."""
@@ -262,55 +313,38 @@ def extract_relevant_file_changes(files):
             file_changes.append({"filename": filename, "patch_preview": patch_preview})
     return file_changes
 
-def build_commit_analysis_prompt(message, file_changes):
-    """Extract relevant file changes for model addition detection."""
-    file_changes = []
-    for file in files:
-        filename = file.get("filename", "")
-        patch = file.get("patch", "")  # Get the patch, default to empty string if missing
-
-        # Check if the file is relevant to model addition
-        if (
-            any(keyword in filename.lower() for keyword in ["convert", "hf_to_gguf", "models"])
-            or filename.startswith("scripts/")
-        ):
-            # Include the first 10 lines of the patch (if available)
-            if patch:
-                patch_preview = "\n".join(patch.split("\n")[:10])
-            else:
-                patch_preview = "No changes preview available"
-            file_changes.append({"filename": filename, "patch_preview": patch_preview})
-    return file_changes
+# Kept identical across calls so the cached KV prefix can be reused (see CommitAnalyzer)
+COMMIT_ANALYSIS_SYSTEM_PROMPT = (
+    "/no_think\n"
+    "You are an AI assistant that analyzes GitHub commits to detect new AI models.\n"
+    "Your task is to determine if a new AI model is being added based on the commit message and file changes.\n"
+    "Respond ONLY in valid JSON format with the following structure:\n"
+    "{\n"
+    '  "is_new_model": true/false,\n'
+    '  "model_name_if_found": "Name of the model if detected, otherwise null",\n'
+    '  "confidence": "high|medium|low",\n'
+    '  "reason_for_answer": "Explain why or why not."\n'
+    "}\n"
+    "Rules for detecting new models:\n"
+    "1. A new model must be explicitly mentioned in the commit message with keywords like 'add', 'support', or 'implement'.\n"
+    "2. The model name must not be 'ggml', 'llama', or any other framework name.\n"
+    "3. If no relevant files are changed (e.g., model definitions, configs, or scripts), confidence must be 'low'.\n"
+    "4. If the commit message mentions 'bug fix', 'optimize', or 'refactor', it is unlikely to be a new model.\n"
+    "5. Analyze the C++ code changes in the patch preview to detect new models. Look for:\n"
+    "   - New class definitions for model Mistral3 (e.g., 'class Mistral3Model').\n"
+    "   - Model registration for model Mistral3 (e.g., 'Model.register(\"Mistral3ForConditionalGeneration\")').\n"
+    "   - Architecture changes (e.g., 'model_arch = gguf.MODEL_ARCH.LLAMA').\n"
+    " Here are two examples of C++ code that indicates a model is added along with the mode that was added. Model.register(\"Mistral3ForConditionalGeneration\") class Mistral3Model(LlamaModel) : this would indicate adding a new model called Mistral 3. Model.register(\"Gemma3ForCausalLM\", \"Gemma3ForConditionalGeneration\") class Gemma3Model(Model) : this would indiate adding a a new model called Gemma 3.\n"
+    "\n"
+    "Examples of non-model commits:\n"
+    "- 'Fix quantization bugs'\n"
+    "- 'Update documentation'\n"
+    "- 'Add SWA rope parameters' (no relevant file changes)\n"
+)
 
 def build_commit_analysis_prompt(message, file_changes):
     """Build the prompt messages for analyzing a commit."""
-    system_message = (
-        "/no_think\n"
-        "You are an AI assistant that analyzes GitHub commits to detect new AI models.\n"
-        "Your task is to determine if a new AI model is being added based on the commit message and file changes.\n"
-        "Respond ONLY in valid JSON format with the following structure:\n"
-        "{\n"
-        '  "is_new_model": true/false,\n'
-        '  "model_name_if_found": "Name of the model if detected, otherwise null",\n'
-        '  "confidence": "high|medium|low",\n'
-        '  "reason_for_answer": "Explain why or why not."\n'
-        "}\n"
-        "Rules for detecting new models:\n"
-        "1. A new model must be explicitly mentioned in the commit message with keywords like 'add', 'support', or 'implement'.\n"
-        "2. The model name must not be 'ggml', 'llama', or any other framework name.\n"
-        "3. If no relevant files are changed (e.g., model definitions, configs, or scripts), confidence must be 'low'.\n"
-        "4. If the commit message mentions 'bug fix', 'optimize', or 'refactor', it is unlikely to be a new model.\n"
-        "5. Analyze the C++ code changes in the patch preview to detect new models. Look for:\n"
-        "   - New class definitions for model Mistral3 (e.g., 'class Mistral3Model').\n"
-        "   - Model registration for model Mistral3 (e.g., 'Model.register(\"Mistral3ForConditionalGeneration\")').\n"
-        "   - Architecture changes (e.g., 'model_arch = gguf.MODEL_ARCH.LLAMA').\n"
-        " Here are two examples of C++ code that indicates a model is added along with the mode that was added. Model.register(\"Mistral3ForConditionalGeneration\") class Mistral3Model(LlamaModel) : this would indicate adding a new model called Mistral 3. Model.register(\"Gemma3ForCausalLM\", \"Gemma3ForConditionalGeneration\") class Gemma3Model(Model) : this would indiate adding a a new model called Gemma 3.\n"
-        "\n"
-        "Examples of non-model commits:\n"
-        "- 'Fix quantization bugs'\n"
-        "- 'Update documentation'\n"
-        "- 'Add SWA rope parameters' (no relevant file changes)\n"
-    )
+    system_message = COMMIT_ANALYSIS_SYSTEM_PROMPT
 
     if file_changes:
         file_context = "Model building files have been changed. This may indicate a new model has been added:\n"
@@ -336,6 +370,7 @@ def build_commit_analysis_prompt(message, file_changes):
         {"role": "user", "content": user_message}
     ]
     return messages
+
 def parse_and_validate_llm_response(response_text):
     """Parse and validate the LLM response."""
     response_text = response_text.strip()
@@ -361,39 +396,35 @@ def extract_parameter_size(model_id):
         return int(match.group(1))
     return None
 
-def find_huggingface_model(model_name, max_parameters=15):
-    """Search for the model on Hugging Face with authentication."""
-    api = HfApi()
+def find_huggingface_model(model_name, max_parameters=15, limit=50):
+    """Search for the model on Hugging Face with authentication (top `limit` results by downloads, cached)."""
     try:
         # Add token from environment
         token = os.getenv("HF_API_TOKEN")
         if not token:
             logging.error("No Hugging Face token found in environment variables")
             return None
-            
-        models = list(api.list_models(
-            search=model_name,
-            token=token  # Explicitly pass the token
-        ))
-        
+
+        models = get_model_resolver(token=token).search(model_name, limit=limit, sort="downloads")
+
         if not models:
             return None
 
-        # Rest of your existing filtering logic...
         filtered_models = []
         for model_info in models:
             try:
                 num_parameters = None
-                if hasattr(model_info, "config") and model_info.config is not None:
-                    num_parameters = model_info.config.get("num_parameters", None)
+                config = model_info.get("config")
+                if config is not None:
+                    num_parameters = config.get("num_parameters", None)
                 if num_parameters is None:
-                    param_size = extract_parameter_size(model_info.modelId)
+                    param_size = extract_parameter_size(model_info["id"])
                     if param_size is not None:
                         num_parameters = param_size * 1e9
                 if num_parameters is not None and num_parameters <= max_parameters * 1e9:
                     filtered_models.append((model_info, num_parameters))
             except Exception as e:
-                logging.warning(f"Error processing model {model_info.modelId}: {e}")
+                logging.warning(f"Error processing model {model_info.get('id')}: {e}")
 
         if not filtered_models:
             logging.info(f"No models found with <= {max_parameters}B parameters.")
@@ -402,15 +433,15 @@ def find_huggingface_model(model_name, max_parameters=15):
         filtered_models.sort(key=lambda x: x[1], reverse=True)
         largest_model, num_parameters = filtered_models[0]
         base_model = None
-        if hasattr(largest_model, "config") and largest_model.config is not None:
-            base_model = largest_model.config.get("base_model", None)
+        if largest_model.get("config") is not None:
+            base_model = largest_model["config"].get("base_model", None)
 
         return {
-            "model_id": largest_model.modelId,
+            "model_id": largest_model["id"],
             "base_model": base_model,
             "num_parameters": num_parameters
         }
-        
+
     except Exception as e:
         logging.error(f"Hugging Face API error: {e}")
         return None
@@ -422,20 +453,31 @@ def main():
         with open(LAST_COMMIT_FILE, "r") as f:
             last_commit = f.read().strip()
 
-    commits = fetch_last_50_commits() or load_cached_commits() or []
-    commits_to_process = list(reversed(commits))[next((i+1 for i, c in enumerate(reversed(commits)) 
-                                                     if c.get("sha") == last_commit), 0):]
+    try:
+        commits_to_process = get_commit_poller().new_commits(last_commit)
+    except requests.RequestException as e:
+        logging.error(f"GitHub API error: {e}")
+        return
 
     if not commits_to_process:
         logging.info("No new commits to process.")
         return
 
+    # Fetch all missing details up front with a small worker pool
+    details = get_commit_poller().fetch_details([c.get("sha") for c in commits_to_process if c.get("sha")])
+
     for commit in commits_to_process:
         commit_sha = commit.get("sha", "UNKNOWN_SHA")
         if "files" not in commit:
-            commit = fetch_commit_details(commit_sha) or commit
-
-        is_new_model, model_name = analyze_commit(commit)
+            commit = details.get(commit_sha) or commit
+
+        # Most commits (CI, docs, kernels) are decided from paths and diffs alone
+        decision, model_name, reason = classify_commit(commit)
+        logging.info(f"Pre-filter {commit_sha[:8]}: {decision} ({reason})")
+        if decision == AMBIGUOUS:
+            is_new_model, model_name = get_commit_analyzer().analyze(commit)
+        else:
+            is_new_model = decision == NEW_MODEL
         with open(LAST_COMMIT_FILE, "w") as f:
             f.write(commit_sha)
 
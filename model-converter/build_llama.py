@@ -2,15 +2,27 @@ import subprocess
 import os
 import shutil
 import sys
+import json
+import hashlib
+from llama_toolchain import install_binaries, publish_toolchain, toolchain_name, current_toolchain_name
 
 # Define paths
 llama_cpp_dir = os.path.expanduser("~/code/models/llama.cpp")
-src_dir = os.path.join(llama_cpp_dir, "src")
-build_dir = os.path.join(llama_cpp_dir, "build")
+# Builds run in a separate git worktree of the checkout, so the reset/clean/pull
+# below never touches files that running conversions read from llama_cpp_dir
+build_tree_dir = os.getenv("LLAMA_BUILD_TREE", os.path.expanduser("~/code/models/llama.cpp-build"))
+src_dir = os.path.join(build_tree_dir, "src")
+build_dir = os.path.join(build_tree_dir, "build")
 bin_dir = os.path.join(build_dir, "bin")
 patch_file = os.path.abspath("./fix-override.diff")
 patch_file2 = os.path.abspath("./imatrix_word_boundary.patch")
 
+# Records what the current build tree was built from (HEAD sha + patch)
+build_stamp_file = os.path.join(build_dir, ".build_stamp.json")
+
+# Only the tools the conversion pipeline runs
+BUILD_TARGETS = ["llama-quantize", "llama-imatrix", "llama-gguf-split", "llama-perplexity"]
+
 # CMake configuration
 cmake_command = [
     "cmake", "-B", build_dir,
@@ -19,7 +31,12 @@ cmake_command = [
     "-DBLAS_INCLUDE_DIRS=~/code/models/OpenBLAS",
     "-DLLAMA_CURL=OFF"
 ]
-build_command = ["cmake", "--build", build_dir, "--config", "Release", "-j"]
+if shutil.which("ccache"):
+    cmake_command += [
+        "-DCMAKE_C_COMPILER_LAUNCHER=ccache",
+        "-DCMAKE_CXX_COMPILER_LAUNCHER=ccache",
+    ]
+build_command = ["cmake", "--build", build_dir, "--config", "Release", "-j", "--target", *BUILD_TARGETS]
 
 def run_command(command, cwd=None):
     """Execute shell command with error handling."""
@@ -48,51 +65,142 @@ def apply_patch():
     finally:
         os.chdir(original_dir)
 
-def prepare_repo():
-    """Forcefully clean and update repository"""
-    print("Forcefully resetting repository...")
+def git_head(repo_dir=build_tree_dir):
+    """Return the HEAD sha of repo_dir (default: the build worktree), or None if there are no commits."""
+    result = subprocess.run(["git", "rev-parse", "HEAD"], cwd=repo_dir, capture_output=True, text=True)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+def upstream_ref():
+    """Name of the upstream branch of the llama.cpp checkout (e.g. origin/master), or None."""
+    result = subprocess.run(["git", "rev-parse", "--abbrev-ref", "--symbolic-full-name", "@{u}"],
+                            cwd=llama_cpp_dir, capture_output=True, text=True)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+def upstream_head():
+    """Fetch and return the sha of the upstream branch, or None if it cannot be determined."""
+    ref = upstream_ref()
+    if not ref:
+        return None
+    # Fetching only moves remote-tracking refs; no working tree is touched
+    subprocess.run(["git", "fetch", "--quiet"], cwd=llama_cpp_dir, capture_output=True)
+    result = subprocess.run(["git", "rev-parse", ref], cwd=llama_cpp_dir, capture_output=True, text=True)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+def ensure_build_tree():
+    """Create the build worktree (detached at the checkout's HEAD) if it does not exist yet."""
+    if os.path.exists(os.path.join(build_tree_dir, ".git")):
+        return
+    print(f"Creating llama.cpp build worktree at {build_tree_dir}")
+    run_command(["git", "worktree", "prune"], cwd=llama_cpp_dir)
+    run_command(["git", "worktree", "add", "--detach", build_tree_dir, "HEAD"], cwd=llama_cpp_dir)
+
+def sync_checkout(head):
+    """
+    Detach the shared llama.cpp checkout at the commit just built.
+
+    Its binaries are replaced on every build, and get_gguf_tensor_info.py,
+    perp_test.py etc. still use its gguf-py, convert script and binaries from
+    there, so the Python side has to move with them.
+    """
+    if git_head(llama_cpp_dir) == head:
+        return
+    print(f"Moving llama.cpp checkout to {head[:8]}")
+    run_command(["git", "checkout", "--force", "--detach", head], cwd=llama_cpp_dir)
+
+def build_key(head, apply_patch_flag):
+    """Identify a build by HEAD sha plus the content of the patch applied on top of it."""
+    key = {"head": head, "patch": None}
+    if apply_patch_flag and os.path.exists(patch_file):
+        with open(patch_file, "rb") as f:
+            key["patch"] = hashlib.sha256(f.read()).hexdigest()
+    return key
+
+def read_build_stamp():
+    try:
+        with open(build_stamp_file, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_build_stamp(key):
+    tmp_path = build_stamp_file + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(key, f)
+    os.replace(tmp_path, build_stamp_file)
 
-    has_commits = subprocess.run(["git", "rev-list", "-n", "1", "--all"], 
-                                 cwd=llama_cpp_dir, capture_output=True).returncode == 0
+def binaries_present(directory):
+    return all(os.path.exists(os.path.join(directory, target)) for target in BUILD_TARGETS)
 
-    if has_commits:
-        stash_result = subprocess.run(["git", "stash", "--include-untracked", "--all"], 
-                                      cwd=llama_cpp_dir, capture_output=True)
-        if stash_result.returncode == 0:
-            subprocess.run(["git", "stash", "drop"], cwd=llama_cpp_dir, capture_output=True)
+def prepare_repo():
+    """
+    Forcefully clean the build worktree and move it to the latest upstream commit.
+
+    The build directory survives: git clean excludes it, so ignored build
+    output is reused by the next incremental build. The shared llama.cpp
+    checkout is only moved (see sync_checkout) once the new build is published.
 
-        subprocess.run(["git", "reset", "--hard", "HEAD"], cwd=llama_cpp_dir)
-    else:
-        print("No commits yet - skipping stash/reset")
+    Returns:
+        tuple: (head before, head after) the update
+    """
+    ensure_build_tree()
+    old_head = git_head()
+    target = upstream_head()
 
-    subprocess.run(["git", "clean", "-fd"], cwd=llama_cpp_dir)
+    print("Forcefully resetting build worktree...")
+    subprocess.run(["git", "reset", "--hard", target or "HEAD"], cwd=build_tree_dir)
+    subprocess.run(["git", "clean", "-fd", "-e", "/build/"], cwd=build_tree_dir)
+    if not target:
+        print("No upstream branch - building the current commit")
 
-    if has_commits:
-        print("Pulling latest changes...")
-        subprocess.run(["git", "pull"], cwd=llama_cpp_dir)
-    else:
-        print("No commits yet - skipping pull")
+    return old_head, git_head()
 
 def build_and_copy(apply_patch_flag=False):
-    """Main build process"""
+    """
+    Main build process.
+
+    Skips the reset/pull/build entirely when upstream has not moved and the
+    existing build tree was made from the same HEAD and patch. A successful
+    build is also published as a versioned toolchain (see llama_toolchain.py).
+    """
     try:
-        prepare_repo()
+        head = git_head() if os.path.exists(os.path.join(build_tree_dir, ".git")) else None
+        key = build_key(head, apply_patch_flag) if head else None
+        if head and upstream_head() == head and read_build_stamp() == key \
+                and binaries_present(bin_dir) and binaries_present(llama_cpp_dir) \
+                and git_head(llama_cpp_dir) == head \
+                and current_toolchain_name() == toolchain_name(head, key["patch"]):
+            print(f"llama.cpp is up to date at {head[:8]} - skipping rebuild")
+            return True
+
+        old_head, new_head = prepare_repo()
 
         if apply_patch_flag:
             if not apply_patch():
                 raise RuntimeError("Patch application failed")
 
-        print("Configuring build...")
-        run_command(cmake_command, cwd=llama_cpp_dir)
+        key = build_key(new_head, apply_patch_flag)
+        if old_head and old_head == new_head and read_build_stamp() == key and binaries_present(bin_dir):
+            print(f"No upstream changes ({new_head[:8]}) - reusing existing build")
+        else:
+            print(f"Updating llama.cpp {str(old_head)[:8]} -> {str(new_head)[:8]}")
+            print("Configuring build...")
+            run_command(cmake_command, cwd=build_tree_dir)
 
-        print("Building...")
-        run_command(build_command, cwd=llama_cpp_dir)
+            print("Building...")
+            run_command(build_command, cwd=build_tree_dir)
+            write_build_stamp(key)
 
         print("Copying binaries...")
         if not os.path.exists(bin_dir):
             raise FileNotFoundError(f"Binary directory not found: {bin_dir}")
-        for f in os.listdir(bin_dir):
-            shutil.copy2(os.path.join(bin_dir, f), llama_cpp_dir)
+        install_binaries(bin_dir, llama_cpp_dir)
+
+        # Versioned copy for jobs; `current` only moves after the smoke test passes
+        toolchain = publish_toolchain(bin_dir, build_tree_dir, toolchain_name(new_head, key["patch"]),
+                                      {"commit": new_head, "patch": key["patch"]})
+        if toolchain is None:
+            raise RuntimeError("Smoke test failed - keeping the previous toolchain")
+        sync_checkout(new_head)
 
         print("\nBuild successful!")
         return True
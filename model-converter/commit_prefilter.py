@@ -0,0 +1,157 @@
+"""
+commit_prefilter.py
+
+Deterministic first-pass classifier for llama.cpp commits, run before the LLM analysis in
+auto_build_new_models.py. It looks at the changed file paths, the diff hunks of
+convert_hf_to_gguf.py and gguf-py/gguf/constants.py, and the commit message:
+
+    - NEW_MODEL: a new MODEL_ARCH entry is added together with a new @ModelBase.register(...)
+    - NOT_MODEL: no model-related file is touched, or the model-related diffs are fully
+      visible and add neither a registration nor an architecture
+    - AMBIGUOUS: everything else; only these commits are sent to the LLM
+
+Functions:
+    - classify_commit(commit): Returns (decision, model_name, reason).
+"""
+
+import re
+
+NEW_MODEL = "new_model"
+NOT_MODEL = "not_model"
+AMBIGUOUS = "ambiguous"
+
+CONVERT_SCRIPT = "convert_hf_to_gguf.py"
+CONSTANTS_FILE = "gguf-py/gguf/constants.py"
+
+# Paths outside these never add a model (CI, docs, ggml kernels, server, ...)
+RELEVANT_FILE_KEYWORDS = ["convert", "hf_to_gguf", "models"]
+RELEVANT_PREFIXES = ("scripts/", "gguf-py/", "src/llama-arch", "src/llama-model", "src/models/")
+
+REGISTER_RE = re.compile(r"^([+-])\s*@(?:ModelBase|Model|TextModel|MmprojModel)\.register\((.*)\)")
+CLASS_RE = re.compile(r"^\+\s*class\s+(\w+)\s*\(")
+ARCH_AUTO_RE = re.compile(r"^([+-])\s*([A-Z][A-Z0-9_]*)\s*=\s*auto\(\)")
+ARCH_NAME_RE = re.compile(r"^([+-])\s*MODEL_ARCH\.([A-Z0-9_]+)\s*:\s*[\"']([^\"']+)[\"']")
+QUOTED_RE = re.compile(r"[\"']([^\"']+)[\"']")
+HUNK_RE = re.compile(r"^@@ .* @@\s*(.*)$")
+
+# Subject prefixes used by llama.cpp for commits that never add a model
+NEGATIVE_SUBJECT_RE = re.compile(
+    r"^\s*(fix|docs?|ci|build|cmake|tests?|refactor|perf|chore|readme|revert|sync|"
+    r"ggml|cuda|vulkan|metal|sycl|opencl|cann|musa|hip|rpc|cpu|server|webui|bench|"
+    r"llama-bench|common|arg|sampling|kv-cache|memory|graph|batch|mtmd|vocab|chat|jinja)\b"
+)
+POSITIVE_MESSAGE_RE = re.compile(
+    r"\b(add|adds|added|support|supports|implement|implements|introduce|initial)\b"
+    r"[^\n]*\b(model|models|arch|architecture)\b"
+    r"|^\s*(model|models|convert)\s*:\s*(add|support|implement)",
+    re.IGNORECASE | re.MULTILINE
+)
+
+
+def is_relevant_file(filename):
+    """Same path test as extract_relevant_file_changes, plus the C++ architecture sources."""
+    lowered = filename.lower()
+    return any(kw in lowered for kw in RELEVANT_FILE_KEYWORDS) or filename.startswith(RELEVANT_PREFIXES)
+
+
+def _registrations(patch):
+    """Return (added HF architectures, added class names) from a convert_hf_to_gguf.py patch."""
+    added, removed, classes = set(), set(), []
+    for line in patch.splitlines():
+        match = REGISTER_RE.match(line)
+        if match:
+            names = set(QUOTED_RE.findall(match.group(2)))
+            (added if match.group(1) == "+" else removed).update(names)
+            continue
+        match = CLASS_RE.match(line)
+        if match:
+            classes.append(match.group(1))
+    return added - removed, classes
+
+
+def _new_architectures(patch):
+    """Return architecture names newly added to MODEL_ARCH / MODEL_ARCH_NAMES in constants.py."""
+    added, removed = {}, set()
+    in_model_arch = False
+    for line in patch.splitlines():
+        hunk = HUNK_RE.match(line)
+        if hunk:
+            in_model_arch = "class MODEL_ARCH" in hunk.group(1)
+            continue
+        body = line[1:]
+        if body.startswith("class "):
+            in_model_arch = body.startswith("class MODEL_ARCH(")
+            continue
+        match = ARCH_NAME_RE.match(line)
+        if match:
+            if match.group(1) == "+":
+                added[match.group(2)] = match.group(3)
+            else:
+                removed.add(match.group(2))
+            continue
+        match = ARCH_AUTO_RE.match(line)
+        if match and in_model_arch:
+            if match.group(1) == "+":
+                added.setdefault(match.group(2), match.group(2).lower())
+            else:
+                removed.add(match.group(2))
+    return {arch: name for arch, name in added.items() if arch not in removed}
+
+
+def _model_name(hf_architectures, classes, architectures):
+    """Best search name for Hugging Face: 'Gemma3ForCausalLM' -> 'Gemma3'."""
+    for hf_arch in sorted(hf_architectures):
+        name = re.split(r"For[A-Z]|Model$|LMHead", hf_arch)[0]
+        if name:
+            return name
+    for cls in classes:
+        name = re.sub(r"Model$", "", cls)
+        if name:
+            return name
+    if architectures:
+        return sorted(architectures.values())[0]
+    return None
+
+
+def classify_commit(commit):
+    """
+    Classify a GitHub commit (with "files" from the commit details API) without the LLM.
+
+    Returns:
+        tuple: (decision, model_name, reason) where decision is NEW_MODEL, NOT_MODEL or AMBIGUOUS
+    """
+    message = commit.get("commit", {}).get("message", "") or ""
+    subject = message.split("\n", 1)[0].lower()
+    files = commit.get("files")
+    if files is None:
+        return AMBIGUOUS, None, "no file list available"
+
+    relevant = [f for f in files if is_relevant_file(f.get("filename", ""))]
+    if not relevant:
+        return NOT_MODEL, None, f"none of {len(files)} changed files are model related"
+
+    hf_architectures, classes, architectures = set(), [], {}
+    patch_missing = False
+    for f in relevant:
+        filename = f.get("filename", "")
+        patch = f.get("patch")
+        if filename.endswith(CONVERT_SCRIPT) or filename == CONSTANTS_FILE:
+            # GitHub omits the patch for very large diffs
+            if not patch:
+                patch_missing = True
+                continue
+            if filename.endswith(CONVERT_SCRIPT):
+                added, new_classes = _registrations(patch)
+                hf_architectures |= added
+                classes += new_classes
+            else:
+                architectures.update(_new_architectures(patch))
+
+    if architectures and hf_architectures:
+        name = _model_name(hf_architectures, classes, architectures)
+        return NEW_MODEL, name, f"new MODEL_ARCH {sorted(architectures)} registered as {sorted(hf_architectures)}"
+    if architectures or hf_architectures or patch_missing:
+        return AMBIGUOUS, None, "partial model evidence in diffs"
+    if POSITIVE_MESSAGE_RE.search(message) and not NEGATIVE_SUBJECT_RE.match(subject):
+        return AMBIGUOUS, None, "commit message mentions adding a model"
+    return NOT_MODEL, None, "model-related files changed without new registrations or architectures"
@@ -35,6 +35,9 @@ from dotenv import load_dotenv
 import shutil
 from update_readme import update_readme  # Import the update_readme function
 from add_metadata_gguf import add_metadata
+from llama_toolchain import resolve_toolchain_dir
+from pipeline_trace import start_trace, span
+from quant_results import run_measured
 from pathlib import Path
 
 def main():
@@ -66,6 +69,8 @@ def main():
     args = parser.parse_args()
 
     repo_id = args.repo_id
+    # Joins the run model_converter.py started (PIPELINE_RUN_ID)
+    start_trace(repo_id)
     llama_dir = os.path.expanduser("~/code/models/llama.cpp")
 
     # Define the final output file path
@@ -123,41 +128,44 @@ def main():
     local_file_paths = {}
     reused_count = 0
     downloaded_count = 0
-    for file_name in files:
-        expected_size = expected_sizes.get(file_name)
-        local_path = None
-
-        # First check local cache only.
-        try:
-            local_path = hf_hub_download(
-                repo_id=repo_id,
-                filename=file_name,
-                token=api_token,
-                local_files_only=True,
-            )
-            if expected_size is not None and os.path.getsize(local_path) != expected_size:
-                print(
-                    f"Cached file incomplete (size mismatch), will re-download: {file_name} "
-                    f"({os.path.getsize(local_path)} != {expected_size})"
-                )
-                local_path = None
-            else:
-                reused_count += 1
-        except Exception:
+    with span("download", files=len(files)) as span_attrs:
+        for file_name in files:
+            expected_size = expected_sizes.get(file_name)
             local_path = None
 
-        # If missing/incomplete, fetch from hub (hf_hub_download reuses cache and resumes when possible).
-        if local_path is None:
-            print(f"Downloading missing/incomplete file: {file_name}")
+            # First check local cache only.
             try:
-                local_path = retry(lambda: hf_hub_download(repo_id=repo_id, filename=file_name, token=api_token))
-                downloaded_count += 1
-            except Exception as e:
-                print(f"Failed to download {file_name}: {e}")
-                return 1
+                local_path = hf_hub_download(
+                    repo_id=repo_id,
+                    filename=file_name,
+                    token=api_token,
+                    local_files_only=True,
+                )
+                if expected_size is not None and os.path.getsize(local_path) != expected_size:
+                    print(
+                        f"Cached file incomplete (size mismatch), will re-download: {file_name} "
+                        f"({os.path.getsize(local_path)} != {expected_size})"
+                    )
+                    local_path = None
+                else:
+                    reused_count += 1
+            except Exception:
+                local_path = None
 
-        local_file_paths[file_name] = local_path
-        downloaded_files.append(local_path)
+            # If missing/incomplete, fetch from hub (hf_hub_download reuses cache and resumes when possible).
+            if local_path is None:
+                print(f"Downloading missing/incomplete file: {file_name}")
+                try:
+                    local_path = retry(lambda: hf_hub_download(repo_id=repo_id, filename=file_name, token=api_token))
+                    downloaded_count += 1
+                except Exception as e:
+                    print(f"Failed to download {file_name}: {e}")
+                    span_attrs["failed"] = file_name
+                    return 1
+
+            local_file_paths[file_name] = local_path
+            downloaded_files.append(local_path)
+        span_attrs.update(downloaded=downloaded_count, reused=reused_count)
 
     safetensors_files = [f for f in files if f.endswith(".safetensors")]
     safetensors_complete = 0
@@ -187,8 +195,11 @@ def main():
                 f_out.write(f_in.read())
         print(f"README.md saved to {readme_output_path}")
 
-    # Update the path to the convert_hf_to_gguf.py script
-    convert_script_path = f"{llama_dir}/convert_hf_to_gguf.py"
+    # Use the convert script of the toolchain pinned for this job (LLAMA_TOOLCHAIN_DIR)
+    toolchain_dir = resolve_toolchain_dir()
+    convert_script_path = os.path.join(toolchain_dir, "convert_hf_to_gguf.py")
+    if not os.path.exists(convert_script_path):
+        convert_script_path = f"{llama_dir}/convert_hf_to_gguf.py"
 
     if not output_exists:
         print(f"No {outtype.upper()} output at {output_file}, converting...")
@@ -202,13 +213,14 @@ def main():
         ]
 
         print("\nRunning conversion:", " ".join(convert_command))
-        result = subprocess.run(convert_command, capture_output=True, text=True)
+        with span("convert", outtype=outtype):
+            result, _, _ = run_measured(convert_command)
 
         if result.returncode == 0:
             print(f"Successfully created {outtype.upper()} GGUF: {output_file}")
         else:
             print("Error during conversion:")
-            print(result.stderr)
+            print(result.stderr.decode("utf-8", errors="replace"))
             return 1  # Explicitly indicate failure
 
     def convert_to_mmproj(convert_script_path, model_snapshot_dir, output_dir, model_name):
@@ -9,6 +9,7 @@ print("Parent dir contents:", os.listdir(os.path.abspath(os.path.join(os.path.di
 from redis_utils import init_redis_catalog
 from make_files import get_model_size
 from model_converter import ModelConverter
+from hf_model_resolver import get_model_resolver
 
 # Only instantiate ModelConverter once
 def get_model_converter():
@@ -31,6 +32,8 @@ if not api_token:
 # Authenticate with Hugging Face
 login(token=api_token)
 api = HfApi()
+# Cached, concurrent list_models/model_info lookups (hf_resolver_cache.json)
+resolver = get_model_resolver(token=api_token)
 
 # Initialize Redis catalog
 catalog = init_redis_catalog(
@@ -55,20 +58,19 @@ def map_author_models_to_originals(author):
     """
     print(f"Fetching all models for author '{author}'...")
     author_repos = list(api.list_models(author=author))
-    base_names = [strip_gguf_suffix(repo.id.split("/")[-1]) for repo in author_repos]
+    base_names = {repo.id: strip_gguf_suffix(repo.id.split("/")[-1]) for repo in author_repos}
     print(f"Found {len(base_names)} base names for author (after stripping -GGUF).")
 
+    # One search per distinct base name, run concurrently and served from cache on reruns
+    search_results = resolver.search_many(base_names.values(), limit=10)
+
     mapping = {}
-    for repo in author_repos:
-        author_model_id = repo.id
-        base_name = strip_gguf_suffix(author_model_id.split("/")[-1])
-        # Use the search API to find models with this base name
-        search_results = list(api.list_models(search=base_name, limit=10))
+    for author_model_id, base_name in base_names.items():
         # Try to find an exact match on the base name
         found = False
-        for result in search_results:
-            if strip_gguf_suffix(result.id.split("/")[-1]) == base_name and result.id != author_model_id:
-                mapping[author_model_id] = result.id
+        for result in search_results.get(base_name) or []:
+            if strip_gguf_suffix(result["id"].split("/")[-1]) == base_name and result["id"] != author_model_id:
+                mapping[author_model_id] = result["id"]
                 found = True
                 break
         if not found:
@@ -85,9 +87,9 @@ def get_parameters_and_moe_for_model(model_id, api):
     # 1. Try config
     params = None
     try:
-        info = api.model_info(model_id)
-        if "num_parameters" in info.config:
-            params = int(info.config["num_parameters"])
+        config = resolver.model_info(model_id).get("config") or {}
+        if "num_parameters" in config:
+            params = int(config["num_parameters"])
     except Exception as e:
         print(f"[WARN] Could not get num_parameters from config for {model_id}: {e}")
 
@@ -123,6 +125,8 @@ def write_models_to_redis(model_ids):
     """
     enriched_models = []
     now = datetime.now().isoformat()
+    # Warm the model_info cache for the whole batch concurrently
+    resolver.model_info_many(model_ids)
     for model_id in model_ids:
         params, is_moe = get_parameters_and_moe_for_model(model_id, api)
         enriched_models.append({
@@ -19,6 +19,7 @@ def main():
     parser = argparse.ArgumentParser(description="Get GGUF tensor quantization types")
     parser.add_argument("gguf_file", help="Input GGUF file")
     parser.add_argument("-o", "--output", required=True, help="Output file path")
+    parser.add_argument("-e", "--elements-output", help="Also write name=element_count lines to this file")
     args = parser.parse_args()
 
     import traceback
@@ -41,6 +42,11 @@ def main():
                 print(f"{clean_name}: quant_type={quant_type}, raw_value={raw_value}")
                 f.write(f"{clean_name}={quant_type} ({raw_value})\n")
         print(f"Quantization data written to: {args.output}")
+        if args.elements_output:
+            with open(args.elements_output, "w") as f:
+                for tensor in reader.tensors:
+                    f.write(f"{clean_tensor_name(tensor.name)}={int(tensor.n_elements)}\n")
+            print(f"Element counts written to: {args.elements_output}")
     except Exception as e:
         print("Error during tensor processing or writing:")
         traceback.print_exc()
@@ -0,0 +1,170 @@
+"""
+github_poller.py
+
+Conditional-request poller for the commit list of a GitHub repository, used by
+auto_build_new_models.py.
+
+- The first page of /commits is requested with If-None-Match, so an unchanged
+  repository costs a 304 that does not count against the rate limit.
+- Further pages are only requested until the last processed commit is found.
+- Commit details (files and patches) are fetched concurrently with a small
+  worker pool and cached by sha, so restarts never refetch them.
+
+Cache file layout (commits_cache.json):
+    {"etag": "...", "commits": [newest first commit summaries], "details": {sha: commit}}
+A legacy cache holding a plain list of commits is still accepted.
+"""
+
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+class GitHubCommitPoller:
+    """Polls /repos/{repo}/commits with ETag revalidation and a persistent sha-keyed details cache."""
+
+    def __init__(self, repo, token=None, cache_file="commits_cache.json", api_url="https://api.github.com",
+                 per_page=50, max_pages=10, max_workers=4, timeout=10, max_cached_details=1000):
+        self.repo = repo
+        self.cache_file = cache_file
+        self.commits_url = f"{api_url.rstrip('/')}/repos/{repo}/commits"
+        self.per_page = per_page
+        self.max_pages = max_pages
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.max_cached_details = max_cached_details
+        self.session = requests.Session()
+        self.session.headers["Accept"] = "application/vnd.github+json"
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+        self._lock = threading.Lock()
+        self.cache = self._load_cache()
+
+    def _load_cache(self):
+        cache = {"etag": None, "commits": [], "details": {}}
+        if not os.path.exists(self.cache_file):
+            return cache
+        try:
+            with open(self.cache_file, "r") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"Ignoring unreadable commits cache {self.cache_file}: {e}")
+            return cache
+        if isinstance(data, list):
+            # Legacy cache: the raw first page without an ETag
+            cache["commits"] = data
+        elif isinstance(data, dict):
+            cache["etag"] = data.get("etag")
+            cache["commits"] = data.get("commits") or []
+            cache["details"] = data.get("details") or {}
+        return cache
+
+    def save_cache(self):
+        """Write the cache atomically so an interrupted run never leaves a truncated file."""
+        with self._lock:
+            tmp_path = f"{self.cache_file}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.cache, f, indent=2)
+            os.replace(tmp_path, self.cache_file)
+
+    def _get_page(self, page, etag=None):
+        headers = {"If-None-Match": etag} if etag else {}
+        response = self.session.get(
+            self.commits_url,
+            params={"per_page": self.per_page, "page": page},
+            headers=headers,
+            timeout=self.timeout,
+        )
+        if response.status_code == 304:
+            return None, etag
+        response.raise_for_status()
+        return response.json(), response.headers.get("ETag")
+
+    def fetch_recent(self):
+        """
+        Return the first page of commits (newest first), revalidated with the cached ETag.
+
+        Returns:
+            list: commit summaries; the cached page on 304
+        """
+        page, etag = self._get_page(1, self.cache["etag"] if self.cache["commits"] else None)
+        if page is None:
+            logging.info(f"{self.repo}: commit list not modified (304)")
+            return self.cache["commits"]
+        logging.info(f"Fetched {len(page)} commits from {self.repo}.")
+        with self._lock:
+            self.cache["etag"] = etag
+            self.cache["commits"] = page
+        self.save_cache()
+        return page
+
+    def new_commits(self, last_commit=None):
+        """
+        Return commits newer than last_commit, oldest first.
+
+        Pages past the first are only requested while last_commit has not been
+        seen. Without a last_commit, or when it is not found within max_pages
+        (force-push, hand-edited state), only the first page is returned so a
+        lost position never turns into hundreds of detail fetches and builds.
+        """
+        first_page = self.fetch_recent()
+        commits = []
+        page_commits = first_page
+        page = 1
+        while True:
+            for commit in page_commits:
+                if last_commit and commit.get("sha") == last_commit:
+                    return list(reversed(commits))
+                commits.append(commit)
+            if not last_commit or len(page_commits) < self.per_page or page >= self.max_pages:
+                if last_commit:
+                    logging.warning(f"Last processed commit {last_commit[:8]} not found in {page} page(s); "
+                                    f"only considering the {len(first_page)} newest commits")
+                    return list(reversed(first_page))
+                return list(reversed(commits))
+            page += 1
+            page_commits, _ = self._get_page(page)
+            page_commits = page_commits or []
+
+    def _fetch_detail(self, sha):
+        response = self.session.get(f"{self.commits_url}/{sha}", timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def fetch_details(self, shas):
+        """
+        Fetch commit details for shas, concurrently for the ones not cached yet.
+
+        Returns:
+            dict: sha -> commit details; shas that failed to fetch are missing
+        """
+        details = {sha: self.cache["details"][sha] for sha in shas if sha in self.cache["details"]}
+        missing = [sha for sha in dict.fromkeys(shas) if sha not in details]
+        if not missing:
+            return details
+
+        logging.info(f"Fetching details for {len(missing)} commits ({len(details)} cached)...")
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {sha: pool.submit(self._fetch_detail, sha) for sha in missing}
+            for sha, future in futures.items():
+                try:
+                    details[sha] = future.result()
+                except requests.RequestException as e:
+                    logging.error(f"GitHub API error for commit {sha[:8]}: {e}")
+                    continue
+                with self._lock:
+                    self.cache["details"][sha] = details[sha]
+        with self._lock:
+            cached = self.cache["details"]
+            for sha in list(cached)[:max(0, len(cached) - self.max_cached_details)]:
+                del cached[sha]
+        self.save_cache()
+        return details
+
+    def fetch_detail(self, sha):
+        """Fetch (or load from cache) the details of one commit."""
+        return self.fetch_details([sha]).get(sha)
@@ -0,0 +1,207 @@
+"""
+hf_model_resolver.py
+
+Cached, batched Hugging Face model resolution shared by auto_build_new_models.py and
+fix_missing_models.py.
+
+- list_models searches and model_info lookups are stored in a persistent JSON cache
+  with a TTL (hf_resolver_cache.json by default), so repeated backfills hit the Hub
+  only for new names.
+- Lookups run on a bounded thread pool; concurrent requests for the same key are
+  coalesced onto one in-flight call.
+- Searches always pass limit/sort so only the top rows are pulled.
+- The cache is written after every single lookup, after each *_many batch,
+  every save_every stores and at interpreter exit.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from huggingface_hub import HfApi
+
+DEFAULT_CACHE_FILE = "hf_resolver_cache.json"
+
+
+def _model_to_dict(model):
+    """Keep the serializable fields the callers use from a ModelInfo."""
+    siblings = []
+    for sibling in getattr(model, "siblings", None) or []:
+        siblings.append({"rfilename": sibling.rfilename, "size": getattr(sibling, "size", None)})
+    return {
+        "id": getattr(model, "id", None) or getattr(model, "modelId", None),
+        "sha": getattr(model, "sha", None),
+        "downloads": getattr(model, "downloads", None),
+        "config": getattr(model, "config", None),
+        "siblings": siblings,
+    }
+
+
+class HfModelResolver:
+    def __init__(self, api=None, token=None, cache_file=DEFAULT_CACHE_FILE, ttl_seconds=24 * 3600,
+                 max_workers=8, save_every=50):
+        self.api = api or HfApi()
+        self.token = token
+        self.cache_file = cache_file
+        self.ttl_seconds = ttl_seconds
+        self.save_every = save_every
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._dirty = 0
+        self.cache = self._load_cache()
+        atexit.register(self.flush)
+
+    def _load_cache(self):
+        cache = {"search": {}, "info": {}}
+        if self.cache_file and os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, "r") as f:
+                    data = json.load(f)
+                cache["search"] = data.get("search", {})
+                cache["info"] = data.get("info", {})
+            except (OSError, ValueError, AttributeError) as e:
+                logging.warning(f"Ignoring unreadable resolver cache {self.cache_file}: {e}")
+        return cache
+
+    def flush(self):
+        """Persist the cache atomically."""
+        if not self.cache_file:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp_path = f"{self.cache_file}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(self.cache, f)
+                os.replace(tmp_path, self.cache_file)
+            except OSError as e:
+                logging.warning(f"Could not write resolver cache {self.cache_file}: {e}")
+                return
+            self._dirty = 0
+
+    def _cached(self, section, key):
+        entry = self.cache[section].get(key)
+        if entry and time.time() - entry["t"] < self.ttl_seconds:
+            return True, entry["v"]
+        return False, None
+
+    def _store(self, section, key, value):
+        with self._lock:
+            self.cache[section][key] = {"t": time.time(), "v": value}
+            self._dirty += 1
+            should_save = self._dirty >= self.save_every
+        if should_save:
+            self.flush()
+
+    def _submit(self, section, key, fetch):
+        """Return a Future for key, reusing the cache or an in-flight request for the same key."""
+        hit, value = self._cached(section, key)
+        if hit:
+            future = Future()
+            future.set_result(value)
+            return future
+        with self._lock:
+            inflight_key = (section, key)
+            future = self._inflight.get(inflight_key)
+            if future is not None:
+                return future
+
+            def run():
+                try:
+                    value = fetch()
+                    self._store(section, key, value)
+                    return value
+                finally:
+                    with self._lock:
+                        self._inflight.pop(inflight_key, None)
+
+            future = self._pool.submit(run)
+            self._inflight[inflight_key] = future
+            return future
+
+    # --- searches -------------------------------------------------------
+
+    def _search_key(self, query, author, limit, sort):
+        return json.dumps([query, author, limit, sort])
+
+    def submit_search(self, query=None, author=None, limit=20, sort="downloads"):
+        def fetch():
+            kwargs = {"limit": limit, "sort": sort, "token": self.token}
+            if query:
+                kwargs["search"] = query
+            if author:
+                kwargs["author"] = author
+            return [_model_to_dict(m) for m in self.api.list_models(**kwargs)]
+        return self._submit("search", self._search_key(query, author, limit, sort), fetch)
+
+    def search(self, query=None, author=None, limit=20, sort="downloads"):
+        """
+        Search the Hub (cached).
+
+        Returns:
+            list: dicts with id, sha, downloads, config, siblings
+        """
+        try:
+            return self.submit_search(query, author=author, limit=limit, sort=sort).result()
+        finally:
+            self.flush()
+
+    def search_many(self, queries, limit=20, sort="downloads"):
+        """Run several searches concurrently. Returns dict query -> results (None on error)."""
+        futures = {q: self.submit_search(q, limit=limit, sort=sort) for q in dict.fromkeys(queries)}
+        results = {}
+        for query, future in futures.items():
+            try:
+                results[query] = future.result()
+            except Exception as e:
+                logging.warning(f"Hugging Face search failed for '{query}': {e}")
+                results[query] = None
+        self.flush()
+        return results
+
+    # --- model_info -----------------------------------------------------
+
+    def submit_model_info(self, model_id, files_metadata=False):
+        def fetch():
+            return _model_to_dict(self.api.model_info(model_id, files_metadata=files_metadata, token=self.token))
+        key = f"{model_id}|files" if files_metadata else model_id
+        return self._submit("info", key, fetch)
+
+    def model_info(self, model_id, files_metadata=False):
+        """Cached model_info as a dict (see search())."""
+        try:
+            return self.submit_model_info(model_id, files_metadata=files_metadata).result()
+        finally:
+            self.flush()
+
+    def model_info_many(self, model_ids, files_metadata=False):
+        """Fetch several model_info lookups concurrently. Returns dict id -> info (None on error)."""
+        futures = {m: self.submit_model_info(m, files_metadata) for m in dict.fromkeys(model_ids)}
+        results = {}
+        for model_id, future in futures.items():
+            try:
+                results[model_id] = future.result()
+            except Exception as e:
+                logging.warning(f"model_info failed for {model_id}: {e}")
+                results[model_id] = None
+        self.flush()
+        return results
+
+
+_resolvers = {}
+_resolvers_lock = threading.Lock()
+
+
+def get_model_resolver(token=None, cache_file=DEFAULT_CACHE_FILE):
+    """Return the process-wide resolver for (token, cache_file)."""
+    with _resolvers_lock:
+        key = (token, cache_file)
+        if key not in _resolvers:
+            _resolvers[key] = HfModelResolver(token=token, cache_file=cache_file)
+        return _resolvers[key]
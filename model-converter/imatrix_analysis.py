@@ -0,0 +1,227 @@
+"""
+imatrix_analysis.py
+
+Fast imatrix analysis: loading, comparison, sensitivity ranking and quant rule
+suggestions.
+
+- Both imatrix layouts are read with imatrix_tools.read_imatrix_entries and the
+  in_sum2 / counts accumulators are turned into per-column means.
+- Comparisons concatenate every tensor into one array and compute per-tensor
+  MAD, MSD and correlation with np.*.reduceat, so no Python loop runs per value.
+- Tensors are ranked by sensitivity and the top ones can be written as a
+  quant_rules.json overlay (exact tensor names, one bump) for tensor_list_builder.
+
+Usage:
+  python imatrix_analysis.py compare a-imatrix.gguf b.imatrix [--top 20] [--overlay bumps.json]
+  python imatrix_analysis.py rank model-imatrix.gguf [--top 20] [--overlay bumps.json]
+"""
+
+import argparse
+import json
+import re
+
+import numpy as np
+
+from imatrix_tools import read_imatrix_entries
+
+# Low-bit targets an overlay applies to by default
+DEFAULT_BASE_TYPES = ["IQ1_S", "IQ1_M", "IQ2_XXS", "IQ2_XS", "IQ2_S", "IQ2_M", "Q2_K", "Q2_K_S",
+                      "IQ3_XXS", "IQ3_XS", "IQ3_S", "IQ3_M", "Q3_K", "Q3_K_S", "Q3_K_M"]
+
+
+def load_imatrix(path):
+    """
+    Load an imatrix (GGUF or legacy layout) as mean activations.
+
+    Returns:
+        dict: tensor name -> {"values": float32 mean squared activation per input
+            column (experts concatenated), "n_call": int}
+    """
+    entries, _ = read_imatrix_entries(path)
+    imatrix = {}
+    for name, entry in entries.items():
+        counts = entry["counts"]
+        values = (entry["in_sum2"] / np.maximum(counts, 1)[:, None]).reshape(-1).astype(np.float32)
+        imatrix[name] = {"values": values, "n_call": int(counts.max()) if counts.size else 0}
+    return imatrix
+
+
+def _segments(arrays):
+    lengths = np.array([a.size for a in arrays], dtype=np.int64)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    return np.concatenate(arrays).astype(np.float64), starts, lengths
+
+
+def _normalize_segments(x, starts, lengths):
+    """Min-max normalize each segment to [0, 1] (constant segments become 0)."""
+    lo = np.minimum.reduceat(x, starts)
+    span = np.maximum.reduceat(x, starts) - lo
+    scale = np.divide(1.0, span, out=np.zeros_like(span), where=span > 0)
+    return (x - np.repeat(lo, lengths)) * np.repeat(scale, lengths)
+
+
+def compare_imatrices(a, b):
+    """
+    Compare two loaded imatrices tensor by tensor, vectorized over all tensors.
+
+    Returns:
+        tuple: (rows, skipped) where rows is a list of dicts with name, mad, msd and
+            corr (NaN when a tensor is constant), and skipped lists tensor names
+            missing from one side or with different sizes.
+    """
+    names = sorted(n for n in a.keys() & b.keys()
+                   if a[n]["values"].size == b[n]["values"].size and a[n]["values"].size > 0)
+    skipped = sorted((a.keys() | b.keys()) - set(names))
+    if not names:
+        return [], skipped
+
+    x, starts, lengths = _segments([a[n]["values"] for n in names])
+    y, _, _ = _segments([b[n]["values"] for n in names])
+    x = _normalize_segments(x, starts, lengths)
+    y = _normalize_segments(y, starts, lengths)
+    diff = x - y
+
+    def seg_mean(v):
+        return np.add.reduceat(v, starts) / lengths
+
+    mad = seg_mean(np.abs(diff))
+    msd = seg_mean(diff * diff)
+    mx, my = seg_mean(x), seg_mean(y)
+    cov = seg_mean(x * y) - mx * my
+    var = (seg_mean(x * x) - mx * mx) * (seg_mean(y * y) - my * my)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = np.where(var > 0, cov / np.sqrt(np.where(var > 0, var, 1)), np.nan)
+
+    rows = [{"name": n, "mad": float(mad[i]), "msd": float(msd[i]), "corr": float(corr[i])}
+            for i, n in enumerate(names)]
+    return rows, skipped
+
+
+def rank_by_difference(rows):
+    """Sort comparison rows by sensitivity: MAD plus loss of correlation."""
+    for row in rows:
+        corr = row["corr"] if not np.isnan(row["corr"]) else 1.0
+        row["score"] = row["mad"] + (1.0 - corr)
+    return sorted(rows, key=lambda r: r["score"], reverse=True)
+
+
+def tensor_role(name):
+    """'blk.12.ffn_down_exps.weight' -> 'ffn_down_exps'."""
+    base = name[:-len(".weight")] if name.endswith(".weight") else name
+    return re.sub(r"^blk\.\d+\.", "", base)
+
+
+def importance_scores(imatrix):
+    """
+    Per-tensor importance from a single imatrix.
+
+    A tensor's score is its mean activation energy relative to the median of the
+    tensors with the same role (e.g. attn_v across all layers), times one plus
+    the share of energy carried by its top 1% input columns (outlier channels
+    are what low-bit quants lose first).
+
+    Returns:
+        list: dicts with name, role, mean, concentration and score, highest score first.
+    """
+    names = [n for n in imatrix if imatrix[n]["values"].size > 0]
+    if not names:
+        return []
+    x, starts, lengths = _segments([imatrix[n]["values"] for n in names])
+    mean = np.add.reduceat(x, starts) / lengths
+    total = np.add.reduceat(x, starts)
+    concentration = np.zeros(len(names))
+    for i, n in enumerate(names):
+        # Top-k share needs a partition per tensor; the partition itself is O(n) NumPy
+        v = x[starts[i]:starts[i] + lengths[i]]
+        k = max(1, v.size // 100)
+        concentration[i] = np.partition(v, v.size - k)[-k:].sum() / total[i] if total[i] > 0 else 0.0
+
+    roles = [tensor_role(n) for n in names]
+    role_median = {}
+    for role in set(roles):
+        idx = [i for i, r in enumerate(roles) if r == role]
+        role_median[role] = float(np.median(mean[idx]))
+    rows = []
+    for i, n in enumerate(names):
+        median = role_median[roles[i]]
+        relative = mean[i] / median if median > 0 else 0.0
+        rows.append({"name": n, "role": roles[i], "mean": float(mean[i]),
+                     "concentration": float(concentration[i]),
+                     "score": float(relative * (1.0 + concentration[i]))})
+    return sorted(rows, key=lambda r: r["score"], reverse=True)
+
+
+def layer_sensitivity(ranked):
+    """Aggregate tensor scores per block: list of (layer index, mean score), highest first."""
+    per_layer = {}
+    for row in ranked:
+        match = re.match(r"blk\.(\d+)\.", row["name"])
+        if match:
+            per_layer.setdefault(int(match.group(1)), []).append(row["score"])
+    return sorted(((layer, float(np.mean(s))) for layer, s in per_layer.items()),
+                  key=lambda item: item[1], reverse=True)
+
+
+def suggest_overlay(ranked, top=20, bump=1, base_types=None):
+    """
+    quant_rules.json overlay bumping the `top` most sensitive tensors.
+
+    Names are written without ".weight", the form tensor_list_builder matches.
+    """
+    layer_names = [row["name"][:-len(".weight")] if row["name"].endswith(".weight") else row["name"]
+                   for row in ranked[:top]]
+    if not layer_names:
+        return {"rules": []}
+    return {"rules": [{
+        "base_type": list(base_types or DEFAULT_BASE_TYPES),
+        "layer_name": layer_names,
+        "bump": bump,
+        "bump_experts": bump,
+    }]}
+
+
+def _print_rows(rows, fields, top):
+    print("  ".join(f"{f:>12}" if f != "name" else f"{f:<48}" for f in fields))
+    for row in rows[:top]:
+        print("  ".join(f"{row[f]:<48}" if f == "name" else f"{row[f]:>12.6f}" for f in fields))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare imatrices and rank tensors by sensitivity")
+    sub = parser.add_subparsers(dest="command", required=True)
+    compare_p = sub.add_parser("compare", help="Compare two imatrices")
+    compare_p.add_argument("file1")
+    compare_p.add_argument("file2")
+    rank_p = sub.add_parser("rank", help="Rank the tensors of one imatrix by importance")
+    rank_p.add_argument("file")
+    for p in (compare_p, rank_p):
+        p.add_argument("--top", type=int, default=20, help="Rows to show / tensors to bump")
+        p.add_argument("--overlay", help="Write a quant_rules.json overlay bumping the top tensors")
+        p.add_argument("--bump", type=int, default=1)
+        p.add_argument("--base-types", nargs="*", help="Target types the overlay applies to")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        rows, skipped = compare_imatrices(load_imatrix(args.file1), load_imatrix(args.file2))
+        ranked = rank_by_difference(rows)
+        if skipped:
+            print(f"Skipped {len(skipped)} tensors missing from one file or with different sizes")
+        if rows:
+            print(f"Average MAD: {np.mean([r['mad'] for r in rows]):.6f}  "
+                  f"MSD: {np.mean([r['msd'] for r in rows]):.6f}  "
+                  f"Correlation: {np.nanmean([r['corr'] for r in rows]):.6f}")
+        _print_rows(ranked, ["name", "mad", "msd", "corr", "score"], args.top)
+    else:
+        ranked = importance_scores(load_imatrix(args.file))
+        _print_rows(ranked, ["name", "mean", "concentration", "score"], args.top)
+
+    print("\nMost sensitive layers:", ", ".join(f"{layer} ({score:.3f})"
+                                               for layer, score in layer_sensitivity(ranked)[:10]))
+    if args.overlay:
+        with open(args.overlay, "w") as f:
+            json.dump(suggest_overlay(ranked, args.top, args.bump, args.base_types), f, indent=4)
+        print(f"Wrote overlay for {min(args.top, len(ranked))} tensors to {args.overlay}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,570 @@
+"""
+imatrix_tools.py
+
+Parallel importance-matrix generation for make_files.py.
+
+- The training set is split on line boundaries into parts that run in separate
+  llama-imatrix processes. llama.cpp mmaps the model, so the processes share one
+  copy of the weights in the page cache and memory stays bounded by the number
+  of processes (IMATRIX_PROCESSES).
+- The partial imatrices are merged by summing the per-tensor accumulators
+  (in_sum2 and counts for GGUF imatrices, values and ncall for the legacy format).
+- Results are cached by model content fingerprint, training-set hash, llama.cpp
+  toolchain and extra llama-imatrix arguments, so a renamed or re-downloaded
+  model with identical weights reuses its imatrix but a new build or different
+  options do not.
+
+Published imatrices are found by HEAD-probing all candidate URLs concurrently
+(RemoteImatrixResolver); misses are remembered for a TTL so models without a
+published imatrix go straight to local generation.
+
+imatrix-files/index.json maps model name -> {path, sha256, size, source} so a
+model's imatrix is found with one dict lookup (see lookup_imatrix); it is kept
+up to date by copy_imatrix_files_from_repos.py and by make_files.py.
+
+Functions:
+    - read_imatrix_entries(path): Read a GGUF or legacy imatrix into accumulators.
+    - copy_imatrix_as_gguf(src, dest): Copy an imatrix, converting the legacy layout to GGUF.
+    - merge_imatrix_files(paths, output_path): Sum partial imatrices into one file.
+    - generate_imatrix(...): Cached, chunked, parallel llama-imatrix run.
+    - download_with_resume(url, dest, expected_size): Resumable, size-validated download.
+    - lookup_imatrix(imatrix_dir, model_name) / register_imatrix(...): Local index access.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+GGUF_MAGIC = b"GGUF"
+IN_SUM2_SUFFIX = ".in_sum2"
+COUNTS_SUFFIX = ".counts"
+DEFAULT_CHUNK_SIZE = 512
+# Each process should still get enough threads to be efficient
+MIN_THREADS_PER_PROCESS = 8
+MAX_PROCESSES = 4
+INDEX_FILE = "index.json"
+# File names the converter and older uploads use for imatrices
+IMATRIX_SUFFIXES = ("-imatrix.gguf", ".imatrix")
+
+
+def is_gguf_file(path):
+    with open(path, "rb") as f:
+        return f.read(4) == GGUF_MAGIC
+
+
+def file_hash(path, block_size=1 << 20):
+    """sha256 of a whole file (used for training sets)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def model_fingerprint(path, samples=64, sample_size=1 << 20):
+    """
+    Content fingerprint of a (large) GGUF model.
+
+    Hashes the size, the first 16 MiB (header, metadata and tensor infos) and
+    `samples` evenly spaced blocks of tensor data, which identifies the weights
+    without reading tens of gigabytes.
+    """
+    size = os.path.getsize(path)
+    h = hashlib.blake2b(digest_size=32)
+    h.update(str(size).encode())
+    with open(path, "rb") as f:
+        h.update(f.read(16 << 20))
+        if size > (16 << 20):
+            step = max(1, (size - sample_size) // samples)
+            for offset in range(16 << 20, size, step):
+                f.seek(offset)
+                h.update(f.read(sample_size))
+    return h.hexdigest()
+
+
+def _field_value(reader, key, default=None):
+    field = reader.fields.get(key)
+    if field is None:
+        return default
+    return field.contents()
+
+
+def read_imatrix_entries(path):
+    """
+    Read an imatrix file (GGUF or legacy .dat layout) as summable accumulators.
+
+    Returns:
+        tuple: (entries, meta) where entries maps tensor name to
+            {"in_sum2": float32 array (n_mat, n_per_mat), "counts": float32 array (n_mat,)}
+            and meta holds format, chunk_count, chunk_size and datasets.
+    """
+    if is_gguf_file(path):
+        from gguf import GGUFReader
+
+        reader = GGUFReader(path)
+        sums, counts = {}, {}
+        for tensor in reader.tensors:
+            data = np.array(tensor.data, dtype=np.float32)
+            if tensor.name.endswith(IN_SUM2_SUFFIX):
+                name = tensor.name[:-len(IN_SUM2_SUFFIX)]
+                sums[name] = data.reshape(-1, data.shape[-1])
+            elif tensor.name.endswith(COUNTS_SUFFIX):
+                counts[tensor.name[:-len(COUNTS_SUFFIX)]] = data.reshape(-1)
+        entries = {name: {"in_sum2": sums[name], "counts": counts[name]} for name in sums if name in counts}
+        meta = {
+            "format": "gguf",
+            "chunk_count": int(_field_value(reader, "imatrix.chunk_count", 0) or 0),
+            "chunk_size": int(_field_value(reader, "imatrix.chunk_size", DEFAULT_CHUNK_SIZE) or DEFAULT_CHUNK_SIZE),
+            "datasets": list(_field_value(reader, "imatrix.datasets", []) or []),
+        }
+        return entries, meta
+
+    entries = {}
+    with open(path, "rb") as f:
+        n_entries = struct.unpack('<i', f.read(4))[0]
+        for _ in range(n_entries):
+            name_len = struct.unpack('<i', f.read(4))[0]
+            name = f.read(name_len).decode('utf-8')
+            n_call = struct.unpack('<i', f.read(4))[0]
+            n_values = struct.unpack('<i', f.read(4))[0]
+            values = np.frombuffer(f.read(n_values * 4), dtype=np.float32).copy()
+            # Legacy values are mean * n_call, so they add up like in_sum2
+            entries[name] = {"in_sum2": values.reshape(1, -1), "counts": np.array([n_call], dtype=np.float32)}
+        tail = f.read(4)
+        last_call = struct.unpack('<i', tail)[0] if len(tail) == 4 else 0
+        datasets = []
+        tail = f.read(4)
+        if len(tail) == 4:
+            datasets.append(f.read(struct.unpack('<i', tail)[0]).decode('utf-8'))
+    meta = {"format": "dat", "chunk_count": last_call, "chunk_size": DEFAULT_CHUNK_SIZE, "datasets": datasets}
+    return entries, meta
+
+
+def write_imatrix(path, entries, meta, fmt=None):
+    """Write accumulators in GGUF (".gguf" paths) or legacy layout."""
+    fmt = fmt or ("gguf" if path.endswith(".gguf") else "dat")
+    if fmt == "gguf":
+        from gguf import GGUFWriter
+
+        writer = GGUFWriter(path, arch="imatrix")
+        writer.add_type("imatrix")
+        writer.add_array("imatrix.datasets", meta.get("datasets") or [])
+        writer.add_uint32("imatrix.chunk_count", int(meta.get("chunk_count", 0)))
+        writer.add_uint32("imatrix.chunk_size", int(meta.get("chunk_size", DEFAULT_CHUNK_SIZE)))
+        for name in sorted(entries):
+            writer.add_tensor(name + IN_SUM2_SUFFIX, entries[name]["in_sum2"].astype(np.float32))
+            writer.add_tensor(name + COUNTS_SUFFIX, entries[name]["counts"].astype(np.float32).reshape(-1, 1))
+        writer.write_header_to_file()
+        writer.write_kv_data_to_file()
+        writer.write_tensors_to_file()
+        writer.close()
+        return
+
+    with open(path, "wb") as f:
+        f.write(struct.pack('<i', len(entries)))
+        for name in sorted(entries):
+            values = entries[name]["in_sum2"].astype(np.float32).reshape(-1)
+            encoded = name.encode('utf-8')
+            f.write(struct.pack('<i', len(encoded)))
+            f.write(encoded)
+            f.write(struct.pack('<i', int(entries[name]["counts"].max())))
+            f.write(struct.pack('<i', values.size))
+            f.write(values.tobytes())
+        f.write(struct.pack('<i', int(meta.get("chunk_count", 0))))
+        dataset = (meta.get("datasets") or [""])[0].encode('utf-8')
+        f.write(struct.pack('<i', len(dataset)))
+        f.write(dataset)
+
+
+def copy_imatrix_as_gguf(src, dest):
+    """Copy an imatrix to dest in GGUF layout, converting a legacy .dat/.imatrix file."""
+    if is_gguf_file(src):
+        shutil.copy(src, dest)
+        return
+    entries, meta = read_imatrix_entries(src)
+    tmp_path = f"{dest}.tmp{os.getpid()}"
+    write_imatrix(tmp_path, entries, meta, fmt="gguf")
+    os.replace(tmp_path, dest)
+
+
+def merge_imatrix_files(paths, output_path):
+    """
+    Merge partial imatrices by summing their per-tensor accumulators.
+
+    Tensors missing from some parts (e.g. experts that were never routed to) are
+    taken from the parts that have them.
+    """
+    merged, merged_meta = {}, None
+    for path in paths:
+        entries, meta = read_imatrix_entries(path)
+        if merged_meta is None:
+            merged_meta = dict(meta, datasets=list(meta["datasets"]))
+        else:
+            if meta["format"] != merged_meta["format"]:
+                raise ValueError(f"Cannot merge {meta['format']} imatrix {path} into {merged_meta['format']}")
+            merged_meta["chunk_count"] += meta["chunk_count"]
+            merged_meta["datasets"] += [d for d in meta["datasets"] if d not in merged_meta["datasets"]]
+        for name, entry in entries.items():
+            if name not in merged:
+                merged[name] = {"in_sum2": entry["in_sum2"].copy(), "counts": entry["counts"].copy()}
+            elif merged[name]["in_sum2"].shape != entry["in_sum2"].shape:
+                raise ValueError(f"Shape mismatch for {name} in {path}")
+            else:
+                merged[name]["in_sum2"] += entry["in_sum2"]
+                merged[name]["counts"] += entry["counts"]
+    if merged_meta is None:
+        raise ValueError("No imatrix files to merge")
+    write_imatrix(output_path, merged, merged_meta)
+    return output_path
+
+
+def split_training_set(train_file, parts, out_dir):
+    """Split a text file into `parts` pieces of similar size on line boundaries."""
+    with open(train_file, "rb") as f:
+        lines = f.readlines()
+    target = max(1, sum(len(line) for line in lines) // parts)
+    paths, current, current_size = [], [], 0
+    for line in lines:
+        current.append(line)
+        current_size += len(line)
+        if current_size >= target and len(paths) < parts - 1:
+            paths.append(current)
+            current, current_size = [], 0
+    if current:
+        paths.append(current)
+    out = []
+    for i, chunk in enumerate(paths):
+        path = os.path.join(out_dir, f"train-part-{i:02d}.txt")
+        with open(path, "wb") as f:
+            f.writelines(chunk)
+        out.append(path)
+    return out
+
+
+def imatrix_settings_hash(llama_imatrix_bin, extra_args=None):
+    """
+    Hash of what besides the model and training set shapes an imatrix: the
+    llama.cpp build (toolchain.json name next to the binary, else the binary's
+    content hash) and the extra llama-imatrix arguments.
+    """
+    bin_dir = os.path.dirname(os.path.abspath(llama_imatrix_bin))
+    try:
+        with open(os.path.join(bin_dir, "toolchain.json"), "r") as f:
+            build = json.load(f)["name"]
+    except (OSError, ValueError, KeyError):
+        try:
+            build = file_hash(llama_imatrix_bin)
+        except OSError:
+            build = os.path.abspath(llama_imatrix_bin)
+    payload = json.dumps([build, [str(a) for a in extra_args or []]])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def default_processes(threads):
+    env = os.getenv("IMATRIX_PROCESSES")
+    if env:
+        return max(1, int(env))
+    return max(1, min(MAX_PROCESSES, threads // MIN_THREADS_PER_PROCESS))
+
+
+def generate_imatrix(model_path, train_file, output_path, llama_imatrix_bin, threads,
+                     processes=None, cache_dir=None, extra_args=None):
+    """
+    Generate an imatrix for model_path over train_file, in parallel and cached.
+
+    Args:
+        model_path (str): BF16 GGUF model.
+        train_file (str): Training text.
+        output_path (str): Where the merged imatrix is written.
+        llama_imatrix_bin (str): Path of llama-imatrix.
+        threads (int): Total threads across all processes.
+        processes (int): Parallel llama-imatrix processes (default: default_processes(threads)).
+        cache_dir (str): Directory of imatrices keyed by model fingerprint, training-set
+            hash and imatrix_settings_hash().
+        extra_args (list): Extra llama-imatrix arguments.
+
+    Returns:
+        str: output_path
+    """
+    cache_path = None
+    if cache_dir:
+        key = (f"{model_fingerprint(model_path)[:16]}-{file_hash(train_file)[:16]}"
+               f"-{imatrix_settings_hash(llama_imatrix_bin, extra_args)[:12]}")
+        cache_path = os.path.join(cache_dir, f"{key}-imatrix.gguf")
+        if os.path.exists(cache_path):
+            print(f"Using cached imatrix {cache_path}")
+            shutil.copy(cache_path, output_path)
+            return output_path
+
+    processes = processes or default_processes(threads)
+    threads_per_process = max(1, threads // processes)
+    work_dir = tempfile.mkdtemp(prefix="imatrix-", dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        parts = split_training_set(train_file, processes, work_dir) if processes > 1 else [train_file]
+        jobs = []
+        for i, part in enumerate(parts):
+            part_output = os.path.join(work_dir, f"part-{i:02d}-imatrix.gguf")
+            command = [
+                llama_imatrix_bin,
+                "-m", model_path,
+                "-f", part,
+                "-o", part_output,
+                "--threads", str(threads_per_process),
+            ] + list(extra_args or [])
+            print("Running:", " ".join(command))
+            log = open(os.path.join(work_dir, f"part-{i:02d}.log"), "w")
+            jobs.append((part_output, log, subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)))
+
+        failed = []
+        for part_output, log, proc in jobs:
+            proc.wait()
+            log.close()
+            if proc.returncode != 0 or not os.path.exists(part_output):
+                with open(log.name, "r", errors="replace") as f:
+                    failed.append(f.read()[-2000:])
+        if failed:
+            print("Error generating imatrix:")
+            print(failed[0])
+            raise RuntimeError("Failed to generate imatrix file")
+
+        part_outputs = [part_output for part_output, _, _ in jobs]
+        merged = os.path.join(work_dir, "merged-imatrix.gguf")
+        if len(part_outputs) == 1:
+            shutil.move(part_outputs[0], merged)
+        else:
+            print(f"Merging {len(part_outputs)} partial imatrices")
+            merge_imatrix_files(part_outputs, merged)
+
+        if cache_path:
+            os.makedirs(cache_dir, exist_ok=True)
+            shutil.copy(merged, cache_path + ".tmp")
+            os.replace(cache_path + ".tmp", cache_path)
+        os.replace(merged, output_path)
+        return output_path
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def imatrix_model_name(filename):
+    """Model name for an imatrix file name, or None if it is not an imatrix."""
+    base = os.path.basename(filename)
+    for suffix in IMATRIX_SUFFIXES:
+        if base.endswith(suffix):
+            return base[:-len(suffix)]
+    return None
+
+
+def load_imatrix_index(imatrix_dir):
+    path = os.path.join(imatrix_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable imatrix index {path}: {e}")
+        return {}
+
+
+def save_imatrix_index(imatrix_dir, index):
+    """Write the index atomically."""
+    os.makedirs(imatrix_dir, exist_ok=True)
+    path = os.path.join(imatrix_dir, INDEX_FILE)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def register_imatrix(imatrix_dir, model_name, path, source, sha256=None, index=None):
+    """
+    Record model_name -> path in the index.
+
+    Paths inside imatrix_dir are stored relative to it. When `index` is given it
+    is updated in memory only (the caller saves it); otherwise the index file is
+    re-read, updated and saved.
+    """
+    abs_path, abs_dir = os.path.abspath(path), os.path.abspath(imatrix_dir)
+    entry = {
+        "path": os.path.relpath(abs_path, abs_dir) if abs_path.startswith(abs_dir + os.sep) else abs_path,
+        "sha256": sha256 or file_hash(path),
+        "size": os.path.getsize(path),
+        "source": source,
+        "updated": time.time(),
+    }
+    if index is not None:
+        index[model_name] = entry
+        return entry
+    index = load_imatrix_index(imatrix_dir)
+    index[model_name] = entry
+    save_imatrix_index(imatrix_dir, index)
+    return entry
+
+
+def lookup_imatrix(imatrix_dir, model_name, index=None):
+    """
+    Path of the indexed imatrix for model_name, or None.
+
+    Entries whose file is gone or has changed size are ignored.
+    """
+    entry = (index if index is not None else load_imatrix_index(imatrix_dir)).get(model_name)
+    if not entry:
+        return None
+    path = os.path.join(imatrix_dir, entry["path"])
+    if not os.path.isfile(path) or os.path.getsize(path) != entry.get("size"):
+        return None
+    return path
+
+
+class RemoteImatrixResolver:
+    """
+    Find and download a published imatrix from a list of candidate URLs.
+
+    All candidates are HEAD-probed concurrently and the first one (in list order)
+    that exists wins. When none exist the key is recorded in a negative cache file
+    for `negative_ttl` seconds.
+    """
+
+    def __init__(self, negative_cache_file=None, negative_ttl=24 * 3600, timeout=15, token=None):
+        self.negative_cache_file = negative_cache_file
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self._lock = threading.Lock()
+
+    def _load_misses(self):
+        if not self.negative_cache_file or not os.path.exists(self.negative_cache_file):
+            return {}
+        try:
+            with open(self.negative_cache_file, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_misses(self, misses):
+        if not self.negative_cache_file:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.negative_cache_file)), exist_ok=True)
+        tmp_path = self.negative_cache_file + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(misses, f, indent=2)
+        os.replace(tmp_path, self.negative_cache_file)
+
+    def is_known_missing(self, key):
+        with self._lock:
+            missed_at = self._load_misses().get(key)
+        return missed_at is not None and time.time() - missed_at < self.negative_ttl
+
+    def record_miss(self, key):
+        with self._lock:
+            misses = self._load_misses()
+            now = time.time()
+            misses = {k: t for k, t in misses.items() if now - t < self.negative_ttl}
+            misses[key] = now
+            self._save_misses(misses)
+
+    def forget_miss(self, key):
+        with self._lock:
+            misses = self._load_misses()
+            if misses.pop(key, None) is not None:
+                self._save_misses(misses)
+
+    def probe(self, url):
+        """
+        HEAD a URL, following redirects.
+
+        Returns:
+            int: Content length (0 if unknown) when the file exists, None otherwise.
+        """
+        try:
+            response = requests.head(url, headers=self.headers, allow_redirects=True, timeout=self.timeout)
+        except requests.RequestException as e:
+            print(f"Probe failed for {url}: {e}")
+            return None
+        if response.status_code != 200:
+            return None
+        size = response.headers.get("X-Linked-Size") or response.headers.get("Content-Length") or 0
+        return int(size)
+
+    def resolve(self, key, urls):
+        """
+        Return (url, size) of the first candidate that exists, or None.
+
+        Skips probing entirely while `key` is in the negative cache.
+        """
+        if self.is_known_missing(key):
+            print(f"No published imatrix for {key} (cached miss)")
+            return None
+        with ThreadPoolExecutor(max_workers=max(1, len(urls))) as pool:
+            sizes = list(pool.map(self.probe, urls))
+        for url, size in zip(urls, sizes):
+            if size is not None:
+                return url, size
+        self.record_miss(key)
+        return None
+
+    def fetch(self, key, urls, dest):
+        """Resolve and download to dest. Returns the URL used, or None if nothing is published."""
+        found = self.resolve(key, urls)
+        if found is None:
+            return None
+        url, size = found
+        print(f"Downloading imatrix from {url}")
+        download_with_resume(url, dest, expected_size=size or None, headers=self.headers, timeout=self.timeout)
+        return url
+
+
+def download_with_resume(url, dest, expected_size=None, headers=None, timeout=15, retries=3,
+                         block_size=8 << 20):
+    """
+    Download url to dest via dest + ".part", resuming with Range requests.
+
+    The final size is checked against expected_size (or the server's reported
+    total) before the file is renamed into place.
+    """
+    part_path = dest + ".part"
+    last_error = None
+    for attempt in range(1, retries + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        request_headers = dict(headers or {})
+        if offset:
+            request_headers["Range"] = f"bytes={offset}-"
+        try:
+            with requests.get(url, headers=request_headers, stream=True, timeout=timeout) as response:
+                if response.status_code == 416 and expected_size and offset == expected_size:
+                    break  # already complete
+                response.raise_for_status()
+                if offset and response.status_code != 206:
+                    offset = 0  # server ignored the range, start over
+                total = expected_size
+                content_range = response.headers.get("Content-Range")
+                if content_range and "/" in content_range and content_range.rsplit("/", 1)[1].isdigit():
+                    total = total or int(content_range.rsplit("/", 1)[1])
+                elif response.headers.get("Content-Length"):
+                    total = total or offset + int(response.headers["Content-Length"])
+                with open(part_path, "ab" if offset else "wb") as f:
+                    for block in response.iter_content(block_size):
+                        f.write(block)
+            size = os.path.getsize(part_path)
+            if total and size != total:
+                raise IOError(f"Size mismatch for {url}: got {size} bytes, expected {total}")
+            break
+        except (requests.RequestException, IOError) as e:
+            last_error = e
+            print(f"Download attempt {attempt}/{retries} failed for {url}: {e}")
+            if os.path.exists(part_path) and expected_size and os.path.getsize(part_path) > expected_size:
+                os.remove(part_path)
+    else:
+        raise RuntimeError(f"Failed to download {url}: {last_error}")
+    os.replace(part_path, dest)
+    return dest
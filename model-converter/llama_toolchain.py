@@ -0,0 +1,230 @@
+"""
+llama_toolchain.py
+
+Versioned llama.cpp toolchains.
+
+Every successful build is published to its own directory under TOOLCHAINS_DIR,
+named after the llama.cpp commit (plus the patch hash when a patch is applied):
+
+    ~/code/models/llama.cpp-toolchains/
+        3f1c2a9b07de/            llama-quantize, llama-imatrix, ..., convert_hf_to_gguf.py, gguf-py/
+        3f1c2a9b07de-p1a2b3c4d/
+        current -> 3f1c2a9b07de-p1a2b3c4d
+
+The `current` symlink is only swapped (atomically, via rename) after the new
+directory passes a smoke test. A conversion pins its toolchain once with
+pin_toolchain(), which exports LLAMA_TOOLCHAIN_DIR to the scripts it runs, so
+convert, imatrix, quantize and the README all use the same build and a rebuild
+never replaces the binaries or the convert script under a running job.
+
+Functions:
+    - resolve_toolchain_dir(): Directory with the tools a job should use.
+    - pin_toolchain(): Resolve the toolchain for a job and export it to child scripts.
+    - toolchain_commit(toolchain_dir): Full llama.cpp commit a toolchain was built from.
+    - toolchain_binary(name, toolchain_dir=None): Path of one tool.
+    - publish_toolchain(bin_dir, source_dir, name, metadata): Install, smoke test and activate a build.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import time
+
+LLAMA_CPP_DIR = os.path.expanduser("~/code/models/llama.cpp")
+TOOLCHAINS_DIR = os.getenv("LLAMA_TOOLCHAINS_DIR", os.path.expanduser("~/code/models/llama.cpp-toolchains"))
+CURRENT_LINK = os.path.join(TOOLCHAINS_DIR, "current")
+KEEP_TOOLCHAINS = int(os.getenv("LLAMA_KEEP_TOOLCHAINS", "3"))
+# Set by pin_toolchain() for the scripts a conversion runs
+TOOLCHAIN_ENV = "LLAMA_TOOLCHAIN_DIR"
+METADATA_FILE = "toolchain.json"
+
+# Binaries that must start for a toolchain to be activated
+SMOKE_TEST_BINARIES = ["llama-quantize", "llama-imatrix", "llama-gguf-split", "llama-perplexity"]
+# Python conversion sources copied alongside the binaries (convert_hf_to_gguf.py loads ./gguf-py)
+CONVERT_FILES = ["convert_hf_to_gguf.py"]
+CONVERT_DIRS = ["gguf-py"]
+
+
+def resolve_toolchain_dir():
+    """
+    Return the directory holding the llama.cpp tools for a job.
+
+    A toolchain pinned by the parent process (LLAMA_TOOLCHAIN_DIR) wins.
+    Otherwise the `current` symlink is resolved to its real path so the job keeps
+    using the same toolchain even if a newer one is activated while it runs.
+    Falls back to the llama.cpp checkout when no toolchain has been published yet.
+    """
+    pinned = os.getenv(TOOLCHAIN_ENV)
+    if pinned and os.path.isdir(pinned):
+        return pinned
+    if os.path.isdir(CURRENT_LINK):
+        return os.path.realpath(CURRENT_LINK)
+    return LLAMA_CPP_DIR
+
+
+def pin_toolchain():
+    """Resolve the current toolchain and export it (LLAMA_TOOLCHAIN_DIR) to child scripts."""
+    os.environ.pop(TOOLCHAIN_ENV, None)
+    toolchain_dir = resolve_toolchain_dir()
+    os.environ[TOOLCHAIN_ENV] = toolchain_dir
+    return toolchain_dir
+
+
+def toolchain_commit(toolchain_dir):
+    """
+    Full llama.cpp commit of a toolchain (from toolchain.json) or of a git
+    checkout. None when unknown.
+    """
+    try:
+        with open(os.path.join(toolchain_dir, METADATA_FILE), "r") as f:
+            commit = json.load(f).get("commit")
+        if commit:
+            return commit
+    except (OSError, ValueError):
+        pass
+    result = subprocess.run(["git", "-C", toolchain_dir, "rev-parse", "HEAD"], capture_output=True, text=True)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def toolchain_binary(name, toolchain_dir=None):
+    """Path of a llama.cpp tool inside toolchain_dir (default: the current toolchain)."""
+    return os.path.join(toolchain_dir or resolve_toolchain_dir(), name)
+
+
+def toolchain_name(head, patch_hash=None):
+    name = head[:12]
+    if patch_hash:
+        name += f"-p{patch_hash[:8]}"
+    return name
+
+
+def install_binaries(src, dest):
+    """
+    Install every file of src into dest atomically.
+
+    Each file is hardlinked (or copied when linking fails) to a temporary name and
+    then renamed over the destination, so a process already running the old
+    binary keeps its inode and new processes never see a half-written file.
+    """
+    for name in os.listdir(src):
+        src_path = os.path.join(src, name)
+        if not os.path.isfile(src_path):
+            continue
+        dest_path = os.path.join(dest, name)
+        tmp_path = os.path.join(dest, f".{name}.tmp{os.getpid()}")
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        try:
+            os.link(src_path, tmp_path)
+        except OSError:
+            shutil.copy2(src_path, tmp_path)
+        os.replace(tmp_path, dest_path)
+
+
+def smoke_test(toolchain_dir, binaries=SMOKE_TEST_BINARIES):
+    """
+    Check that each binary starts and prints its usage.
+
+    Returns:
+        bool: True if every binary ran (exit code 0 or 1 for --help) and produced output.
+    """
+    for name in binaries:
+        path = os.path.join(toolchain_dir, name)
+        try:
+            result = subprocess.run([path, "--help"], capture_output=True, text=True, timeout=60)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            print(f"Smoke test failed for {name}: {e}")
+            return False
+        if result.returncode not in (0, 1) or not (result.stdout or result.stderr):
+            print(f"Smoke test failed for {name}: exit code {result.returncode}")
+            return False
+    return True
+
+
+def current_toolchain_name():
+    """Name of the active toolchain, or None."""
+    if not os.path.islink(CURRENT_LINK):
+        return None
+    return os.path.basename(os.readlink(CURRENT_LINK))
+
+
+def swap_current(name):
+    """Point `current` at TOOLCHAINS_DIR/name with an atomic rename of a fresh symlink."""
+    tmp_link = os.path.join(TOOLCHAINS_DIR, f".current.tmp{os.getpid()}")
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    os.symlink(name, tmp_link)
+    os.replace(tmp_link, CURRENT_LINK)
+
+
+def prune_toolchains(keep=KEEP_TOOLCHAINS):
+    """Remove the oldest toolchains beyond `keep`, never the active one."""
+    active = current_toolchain_name()
+    entries = []
+    for name in os.listdir(TOOLCHAINS_DIR):
+        path = os.path.join(TOOLCHAINS_DIR, name)
+        if name.startswith(".") or name == "current" or os.path.islink(path) or not os.path.isdir(path):
+            continue
+        entries.append((os.path.getmtime(path), name))
+    entries.sort(reverse=True)
+    for _, name in entries[keep:]:
+        if name == active:
+            continue
+        print(f"Removing old toolchain {name}")
+        shutil.rmtree(os.path.join(TOOLCHAINS_DIR, name), ignore_errors=True)
+
+
+def publish_toolchain(bin_dir, source_dir, name, metadata=None):
+    """
+    Publish a build as TOOLCHAINS_DIR/name and make it current.
+
+    The directory is assembled under a temporary name, smoke tested, renamed into
+    place, and only then is `current` swapped. Publishing a name that already
+    exists just re-activates it.
+
+    Args:
+        bin_dir (str): Build output directory (build/bin).
+        source_dir (str): llama.cpp checkout to copy the convert script and gguf-py from.
+        name (str): Toolchain name, see toolchain_name().
+        metadata (dict): Extra fields for toolchain.json (commit, patch, ...).
+
+    Returns:
+        str: Path of the active toolchain, or None if the smoke test failed.
+    """
+    os.makedirs(TOOLCHAINS_DIR, exist_ok=True)
+    dest = os.path.join(TOOLCHAINS_DIR, name)
+
+    if not os.path.exists(os.path.join(dest, METADATA_FILE)):
+        tmp_dir = os.path.join(TOOLCHAINS_DIR, f".{name}.tmp{os.getpid()}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        try:
+            install_binaries(bin_dir, tmp_dir)
+            for filename in CONVERT_FILES:
+                src = os.path.join(source_dir, filename)
+                if os.path.exists(src):
+                    shutil.copy2(src, os.path.join(tmp_dir, filename))
+            for dirname in CONVERT_DIRS:
+                src = os.path.join(source_dir, dirname)
+                if os.path.isdir(src):
+                    shutil.copytree(src, os.path.join(tmp_dir, dirname),
+                                    ignore=shutil.ignore_patterns("__pycache__", "*.pyc"))
+
+            if not smoke_test(tmp_dir):
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                return None
+
+            with open(os.path.join(tmp_dir, METADATA_FILE), "w") as f:
+                json.dump(dict(metadata or {}, name=name, published=time.time()), f, indent=2)
+            shutil.rmtree(dest, ignore_errors=True)
+            os.rename(tmp_dir, dest)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    if current_toolchain_name() != name:
+        swap_current(name)
+        print(f"Activated llama.cpp toolchain {name}")
+    prune_toolchains()
+    return dest
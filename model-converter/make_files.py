@@ -51,9 +51,13 @@ import math
 import traceback
 import subprocess
 import argparse
-import urllib.request
 from update_readme import update_readme  # Importing the update_readme function
-from tensor_list_builder import process_quantization
+from tensor_list_builder import process_quantization, precision_override_for
+from quant_results import run_measured, record_run, tensor_plan_hash, llama_commit
+from pipeline_trace import start_trace, span
+from llama_toolchain import resolve_toolchain_dir
+from imatrix_tools import (generate_imatrix, RemoteImatrixResolver, lookup_imatrix, register_imatrix,
+                           copy_imatrix_as_gguf)
 import shutil
 from huggingface_hub import HfApi, login
 from dotenv import load_dotenv
@@ -79,7 +83,11 @@ threads = multiprocessing.cpu_count()
 
 base_dir = os.path.expanduser("~/code/models")
 run_dir = os.path.abspath("./")
+# The toolchain model_converter.py pinned for this job (LLAMA_TOOLCHAIN_DIR), else the current one
+llama_bin_dir = resolve_toolchain_dir()
 quant_rules_path=os.path.abspath("./quant_rules.json")
+# Extra bits per weight the imatrix planner may spend on sensitive tensors (0 = rules only)
+imatrix_extra_bpw = float(os.getenv("IMATRIX_EXTRA_BPW", "0"))
 # Load the .env file
 load_dotenv()
 
@@ -164,6 +172,11 @@ def _find_gguf_split_binary():
     if env_bin and os.path.isfile(env_bin) and os.access(env_bin, os.X_OK):
         return env_bin
 
+    # The toolchain this job pinned at startup.
+    toolchain_bin = os.path.join(llama_bin_dir, "llama-gguf-split")
+    if os.path.isfile(toolchain_bin) and os.access(toolchain_bin, os.X_OK):
+        return toolchain_bin
+
     # PATH lookup for standard installs.
     path_bin = shutil.which("llama-gguf-split")
     if path_bin:
@@ -353,7 +366,8 @@ def upload_large_file(file_path, repo_id, quant_name):
 
         # Large file chunking
         print("🔪 Splitting large file...")
-        chunks = split_file_standard(file_path, quant_name)
+        with span("split", quant=quant_name):
+            chunks = split_file_standard(file_path, quant_name)
         for chunk in chunks:
             if not upload_file_to_hf(chunk, repo_id, create_dir=True, quant_name=quant_name):
                 raise RuntimeError(f"Chunk upload failed: {chunk}")
@@ -477,50 +491,57 @@ def download_imatrix(input_dir, company_name, model_name):
     imatrix_file_copy = os.path.join(imatrix_dir, f"{model_name}-imatrix.gguf")
     imatrix_file = os.path.join(input_dir, f"{model_name}-imatrix.gguf")
     
+    # index.json (written by copy_imatrix_files_from_repos.py) also covers mirrored .imatrix files
+    indexed_file = lookup_imatrix(imatrix_dir, model_name)
+    if indexed_file:
+        imatrix_file_copy = indexed_file
     if os.path.exists(imatrix_file_copy):
         print(f"Found existing imatrix file in 'imatrix-files' directory: {imatrix_file_copy}")
-        shutil.copy(imatrix_file_copy, imatrix_file)
+        # Mirrored legacy .imatrix files are converted, since this copy is published as -imatrix.gguf
+        copy_imatrix_as_gguf(imatrix_file_copy, imatrix_file)
         print(f"Copied imatrix file to model's folder: {imatrix_file}")
         return imatrix_file
     
     if not os.path.exists(imatrix_file):
         print(f"{imatrix_file} not found. Attempting to download...")
         urls = build_imatrix_urls(company_name, model_name)
+        # Probe all candidates at once; misses are remembered so reruns go straight to generation
+        resolver = RemoteImatrixResolver(
+            negative_cache_file=os.path.join(imatrix_dir, "remote_misses.json"),
+            negative_ttl=int(os.getenv("IMATRIX_NEGATIVE_TTL", str(24 * 3600))),
+        )
         downloaded = False
-        for url in urls:
-            try:
-                print(f"Trying: {url}")
-                urllib.request.urlretrieve(url, imatrix_file)
+        try:
+            url = resolver.fetch(f"{company_name}/{model_name}", urls, imatrix_file)
+            if url:
                 print(f"Successfully downloaded imatrix from {url}")
                 downloaded = True
-                break
-            except Exception as e:
-                print(f"Failed to download from {url}: {e}")
+                os.makedirs(imatrix_dir, exist_ok=True)
+                shutil.copy(imatrix_file, imatrix_file_copy)
+                register_imatrix(imatrix_dir, model_name, imatrix_file_copy, source=url)
+        except Exception as e:
+            print(f"Failed to download imatrix: {e}")
 
         if not downloaded:
-            print("All download attempts failed. Generating imatrix locally...")
+            print("No published imatrix found. Generating imatrix locally...")
             bf16_model_path = os.path.join(input_dir, f"{model_name}-bf16.gguf")
             if not os.path.exists(bf16_model_path):
                 raise FileNotFoundError(f"Cannot generate imatrix: {bf16_model_path} not found")
             imatrix_train_set = f"{run_dir}/imatrix-train-set"
-            command = [
-                f"{base_dir}/llama.cpp/llama-imatrix",
-                "-m", bf16_model_path,
-                "-f", imatrix_train_set,
-                "-o", imatrix_file,
-                "--threads", str(threads)
-            ]
-            print("Running:", " ".join(command))
-            result = subprocess.run(command, capture_output=True, text=True)
-            if result.returncode != 0:
-                print("Error generating imatrix:")
-                print(result.stderr)
-                raise RuntimeError("Failed to generate imatrix file")
-            else:
-                print("Successfully generated imatrix file")
-                os.makedirs(imatrix_dir, exist_ok=True)
-                shutil.copy(imatrix_file, imatrix_file_copy)
-                print(f"Saved a copy of the imatrix file to: {imatrix_file_copy}")
+            # Chunked parallel llama-imatrix runs, cached by model fingerprint + training-set hash
+            generate_imatrix(
+                bf16_model_path,
+                imatrix_train_set,
+                imatrix_file,
+                os.path.join(llama_bin_dir, "llama-imatrix"),
+                threads,
+                cache_dir=os.path.join(imatrix_dir, "cache"),
+            )
+            print("Successfully generated imatrix file")
+            os.makedirs(imatrix_dir, exist_ok=True)
+            shutil.copy(imatrix_file, imatrix_file_copy)
+            register_imatrix(imatrix_dir, model_name, imatrix_file_copy, source="generated")
+            print(f"Saved a copy of the imatrix file to: {imatrix_file_copy}")
     
     else:
         print(f"{imatrix_file} already exists. Skipping download.")
@@ -544,22 +565,26 @@ def needs_compatibility_check(quant_type, tensor_type, embed_type):
             embed_type in ["Q5_K", "Q6_K"])
 
 def quantize_with_fallback(model_path, output_path, quant_type, tensor_type=None, embed_type=None, 
-                        use_imatrix=None, use_pure=False, allow_requantize=False, is_moe=False, precision_override=None):
+                        use_imatrix=None, use_pure=False, allow_requantize=False, is_moe=False, precision_override=None,
+                        model_name=None, quant_name=None):
     """Perform quantization with automatic fallback for Q5_K/Q6_K tensor/embed types"""
     temp_output = f"{output_path}.tmp"
+    measurements = {"wall_time": 0.0, "peak_rss_mb": 0.0}
     tensor_args = process_quantization(
         gguf_file=model_path,
         quant_rules_file=quant_rules_path,
         target_type=quant_type,
         is_moe=is_moe,
-        precision_override=precision_override
+        precision_override=precision_override,
+        imatrix_file=use_imatrix if imatrix_extra_bpw > 0 and use_imatrix and os.path.exists(use_imatrix) else None,
+        extra_bpw=imatrix_extra_bpw
     )
     print(f"is_moe is {is_moe} using tensor args : {tensor_args}")
 
     def run_quantization(t_type, e_type):
         """Helper function to run quantization with specific types"""
         print(f"trying with quants embedding {e_type} output {t_type} quant type {quant_type}")
-        command = [f"{base_dir}/llama.cpp/llama-quantize"]
+        command = [os.path.join(llama_bin_dir, "llama-quantize")]
         if allow_requantize:
             command.append("--allow-requantize")
         if use_imatrix:
@@ -574,7 +599,11 @@ def quantize_with_fallback(model_path, output_path, quant_type, tensor_type=None
         command.append(str(threads))
         print(f"Running command {command}")
 
-        result = subprocess.run(command, capture_output=True, text=False)
+        result, duration, peak_rss_mb = run_measured(command)
+        measurements["wall_time"] += duration
+        measurements["peak_rss_mb"] = max(measurements["peak_rss_mb"], peak_rss_mb)
+        measurements["config"] = {"tensor_type": t_type, "embed_type": e_type, "imatrix": bool(use_imatrix),
+                                  "pure": use_pure, "precision_override": precision_override}
         if result.stdout:
             try:
                 print("Output:", result.stdout.decode("utf-8"))
@@ -587,20 +616,39 @@ def quantize_with_fallback(model_path, output_path, quant_type, tensor_type=None
                 print("Errors (non-UTF8):", result.stderr.decode("utf-8", errors="replace"))
         return result
 
+    def record_quantization(success):
+        """Add this quantization to the results database (timings, plan hash, llama.cpp commit)."""
+        record_run(
+            source="make_files",
+            model=model_name or os.path.basename(model_path).replace("-bf16.gguf", ""),
+            quant=quant_name or quant_type,
+            quant_type=quant_type,
+            config=measurements.get("config"),
+            tensor_plan_hash=tensor_plan_hash(tensor_args),
+            llama_commit=llama_commit(llama_bin_dir),
+            wall_time=measurements["wall_time"],
+            peak_rss_mb=measurements["peak_rss_mb"],
+            size_bytes=os.path.getsize(output_path) if success and os.path.exists(output_path) else None,
+            status="ok" if success else "failed",
+        )
+
     # First try with original types
     if not needs_compatibility_check(quant_type, tensor_type, embed_type):
         result = run_quantization(tensor_type, embed_type)
         if result.returncode == 0:
             os.rename(temp_output, output_path)
+            record_quantization(True)
             return True
         print(f"⚠ Quantization failed with unexpected error:")
         print(result.stderr)
+        record_quantization(False)
         return False
 
     # Try with original Q5_K/Q6_K types first
     result = run_quantization(tensor_type, embed_type)
     if result.returncode == 0:
         os.rename(temp_output, output_path)
+        record_quantization(True)
         return True
     
     # If failed, try with Q5_1 fallback for tensor/embed types
@@ -611,6 +659,7 @@ def quantize_with_fallback(model_path, output_path, quant_type, tensor_type=None
     result = run_quantization(adjusted_tensor, adjusted_embed)
     if result.returncode == 0:
         os.rename(temp_output, output_path)
+        record_quantization(True)
         return True
     
     print(f"❌ Quantization failed even with fallback:")
@@ -619,6 +668,7 @@ def quantize_with_fallback(model_path, output_path, quant_type, tensor_type=None
         os.remove(temp_output)
     except:
         pass
+    record_quantization(False)
     return False
 
 def quantize_model(input_model, company_name, base_name, allow_requantize=False, is_moe=False, resume_quant=None):
@@ -630,7 +680,10 @@ def quantize_model(input_model, company_name, base_name, allow_requantize=False,
     if company_name is not None and base_name is not None:
         catalog.set_quant_progress(f"{company_name}/{base_name}", "imatrix")
 
-    imatrix_file = download_imatrix(input_dir, company_name, base_name)
+    # Joins the run model_converter.py started (PIPELINE_RUN_ID)
+    start_trace(f"{company_name}/{base_name}" if company_name else base_name)
+    with span("imatrix"):
+        imatrix_file = download_imatrix(input_dir, company_name, base_name)
     repo_id = f"{HF_USERNAME}/{base_name}-GGUF"
 
     # Validate BF16 model exists
@@ -673,24 +726,24 @@ def quantize_model(input_model, company_name, base_name, allow_requantize=False,
             output_path = os.path.join(output_dir, output_file)    
             print(f"\n🏗 Processing {output_file}...")
             # Determine precision override for process_quantization
-            precision_override = None
-            if "bf16" in suffix.lower():
-                precision_override = "BF16"
-            elif "f16" in suffix.lower():
-                precision_override = "F16"
-
-            success = quantize_with_fallback(
-                bf16_model_file,
-                output_path,
-                quant_type,
-                tensor_type=tensor_type,
-                embed_type=embed_type,
-                use_imatrix=imatrix_file if use_imatrix else None,
-                use_pure=use_pure,
-                allow_requantize=allow_requantize,
-                is_moe=is_moe,
-                precision_override=precision_override
-            )
+            precision_override = precision_override_for(suffix)
+
+            with span("quantize", quant=suffix, quant_type=quant_type) as span_attrs:
+                success = quantize_with_fallback(
+                    bf16_model_file,
+                    output_path,
+                    quant_type,
+                    tensor_type=tensor_type,
+                    embed_type=embed_type,
+                    use_imatrix=imatrix_file if use_imatrix else None,
+                    use_pure=use_pure,
+                    allow_requantize=allow_requantize,
+                    is_moe=is_moe,
+                    precision_override=precision_override,
+                    model_name=base_name,
+                    quant_name=suffix
+                )
+                span_attrs["success"] = success
 
             if not success:
                 print(f"[DEBUG] Quantization failed for {suffix}")
@@ -713,7 +766,9 @@ def quantize_model(input_model, company_name, base_name, allow_requantize=False,
             # Handle file upload with standardized large file support
             if repo_created:
                 # Pass the suffix (name) as the folder name
-                if upload_large_file(output_path, repo_id, suffix):
+                with span("upload", quant=suffix):
+                    uploaded = upload_large_file(output_path, repo_id, suffix)
+                if uploaded:
                     print(f"Uploaded {output_file} successfully.")
                     try:
                         os.remove(output_path)
@@ -753,7 +808,9 @@ def quantize_model(input_model, company_name, base_name, allow_requantize=False,
     # Upload imatrix file if repository was created
     if os.path.exists(imatrix_file) and repo_created:
         # Use "imatrix" as the folder name
-        if upload_large_file(imatrix_file, repo_id, "imatrix"):
+        with span("upload", quant="imatrix"):
+            uploaded = upload_large_file(imatrix_file, repo_id, "imatrix")
+        if uploaded:
             print(f"Uploaded {os.path.basename(imatrix_file)} successfully.")
             try:
                 os.remove(imatrix_file)
@@ -766,9 +823,10 @@ def quantize_model(input_model, company_name, base_name, allow_requantize=False,
     # Update README after all files are processed
     try:
         print("\n📝 Updating README.md...")
-        update_readme(input_dir, base_name, add_iquant_txt=has_iq1_iq2_files)
-        readme_path = os.path.join(output_dir, "README.md")
-        upload_large_file(readme_path, repo_id, "readme")
+        with span("readme"):
+            update_readme(input_dir, base_name, add_iquant_txt=has_iq1_iq2_files)
+            readme_path = os.path.join(output_dir, "README.md")
+            upload_large_file(readme_path, repo_id, "readme")
         # If everything succeeded, set repo to public
         try:
             print(f"Setting repository {repo_id} to public...")
@@ -780,15 +838,19 @@ def quantize_model(input_model, company_name, base_name, allow_requantize=False,
         print(f"⚠ Failed to update README: {e}")
 
 def main():
-    global threads
+    global threads, imatrix_extra_bpw
     parser = argparse.ArgumentParser(description="Automate GGUF model quantization")
     parser.add_argument("model_id", help="Full Hugging Face model ID (e.g., 'company/model')")
     parser.add_argument("--allow-requantize", action="store_true", help="Allow requantization of already quantized models")
     parser.add_argument("--is_moe", action="store_true", help="The model is a MOE model")
     parser.add_argument("--resume_quant", type=str, default=None, help="Resume quantization from this quant name (inclusive)")
     parser.add_argument("--threads", type=int, default=None, help="Number of threads to use (default: half of CPU cores)")
+    parser.add_argument("--imatrix-extra-bpw", type=float, default=None,
+                        help="Let the imatrix planner bump sensitive tensors within this many extra bits per weight")
 
     args = parser.parse_args()
+    if args.imatrix_extra_bpw is not None:
+        imatrix_extra_bpw = args.imatrix_extra_bpw
 
     if args.threads is not None:
         threads = args.threads
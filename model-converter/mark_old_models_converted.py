@@ -18,23 +18,20 @@ def main():
         ssl=True
     )
 
-    all_models = catalog.load_catalog()
+    # Use the catalog's secondary indexes instead of decoding every entry
+    unconverted = catalog.find(converted=False)
+    already_converted = len(catalog.find(converted=True))
     updated = 0
-    already_converted = 0
 
-    print(f"Loaded {len(all_models)} models from catalog.")
-    for model_id, entry in all_models.items():
-        converted = entry.get("converted", False)
-        if not converted:
-            print(f"Marking {model_id} as converted.")
-            if catalog.update_model_field(model_id, "converted", True):
-                updated += 1
-        else:
-            already_converted += 1
+    print(f"Found {len(unconverted)} unconverted models in catalog.")
+    for model_id in unconverted:
+        print(f"Marking {model_id} as converted.")
+        if catalog.update_model_field(model_id, "converted", True):
+            updated += 1
 
     print(f"\nDone. {updated} models updated.")
     print(f"{already_converted} models were already converted.")
-    print(f"{len(all_models)} models in total.")
+    print(f"{already_converted + len(unconverted)} models in total.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -12,6 +12,7 @@ import subprocess
 import threading
 import sys
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
@@ -19,6 +20,8 @@ from make_files import get_model_size
 from huggingface_hub import HfApi, HfFileSystem, login
 from build_llama import build_and_copy
 from redis_utils import init_redis_catalog
+from pipeline_trace import start_run, span, wait_child
+from llama_toolchain import pin_toolchain
 
 load_dotenv()
 
@@ -42,6 +45,13 @@ class ModelConverter:
         # Minimum disk space required for conversion (in GB)
         self.MIN_DISK_SPACE_GB = 10
         self.GET_TOP_N_MODELS=50
+        # Concurrent Hub lookups while enriching new catalog entries
+        self.ENRICH_WORKERS = int(os.getenv("CATALOG_ENRICH_WORKERS", "8"))
+        # config.json per model, reset at the start of each update_catalog cycle
+        self._config_memo = {}
+        self._config_memo_lock = threading.Lock()
+        # Background llama.cpp rebuild (see start_background_build)
+        self._build_thread = None
         # Initialize Redis connection
         REDIS_HOST = os.getenv("REDIS_HOST", "redis.readyforquantum.com")
         REDIS_PORT = int(os.getenv("REDIS_PORT", "46379"))
@@ -314,7 +324,8 @@ class ModelConverter:
 
             exit_code = None
             try:
-                exit_code = process.wait()
+                # Reaped with os.wait4 so the script's peak RSS lands in the open span
+                exit_code, _ = wait_child(process)
             except KeyboardInterrupt:
                 # Propagate SIGINT to child and ensure cleanup
                 if process.poll() is None:
@@ -432,6 +443,50 @@ class ModelConverter:
             print(f"[ERROR] File size check failed for {model_id}: {str(e)}")
             return 0
 
+    def fetch_config(self, model_id):
+        """
+        Fetch a model's config.json once per update_catalog cycle.
+
+        Args:
+            model_id (str): The Hugging Face model ID.
+
+        Returns:
+            dict: Parsed config.json (raises on HTTP or JSON errors).
+        """
+        with self._config_memo_lock:
+            if model_id in self._config_memo:
+                return self._config_memo[model_id]
+        config_url = f"https://huggingface.co/{model_id}/raw/main/config.json"
+        response = requests.get(config_url, timeout=30)
+        response.raise_for_status()
+        config = response.json()
+        with self._config_memo_lock:
+            self._config_memo[model_id] = config
+        return config
+
+    def get_repo_metadata(self, model_id):
+        """
+        Get the file list and .safetensors size of a repository with a single model_info call.
+
+        Args:
+            model_id (str): The Hugging Face model ID.
+
+        Returns:
+            dict: {"files": [filenames], "safetensors_size": int}, or None if the repo is inaccessible.
+        """
+        try:
+            info = self.api.model_info(model_id, files_metadata=True)
+        except Exception as e:
+            print(f"[ERROR] Repository not found or inaccessible: {model_id}: {e}")
+            return None
+        files = []
+        safetensors_size = 0
+        for sibling in info.siblings or []:
+            files.append(sibling.rfilename)
+            if sibling.rfilename.endswith('.safetensors') and sibling.size:
+                safetensors_size += sibling.size
+        return {"files": files, "safetensors_size": safetensors_size}
+
     def has_config_json(self, model_id):
         """
         Check if the repository has a config.json file.
@@ -517,10 +572,7 @@ class ModelConverter:
             bool: True if MoE indicators are found, False otherwise.
         """
         try:
-            config_url = f"https://huggingface.co/{model_id}/raw/main/config.json"
-            response = requests.get(config_url)
-            response.raise_for_status()
-            config = response.json()
+            config = self.fetch_config(model_id)
             
             # Convert all keys to lowercase for case-insensitive search
             all_keys = [k.lower() for k in config.keys()]
@@ -562,10 +614,7 @@ class ModelConverter:
         Returns int or None.
         """
         try:
-            config_url = f"https://huggingface.co/{model_id}/raw/main/config.json"
-            response = requests.get(config_url)
-            response.raise_for_status()
-            config = response.json()
+            config = self.fetch_config(model_id)
 
             found_match = False
 
@@ -620,69 +669,105 @@ class ModelConverter:
             print(f"MoE detection failed for {model_id}: {e}")
             return False
 
+    def enrich_model(self, model):
+        """
+        Build the catalog entry for a trending model, or None if it should be skipped.
+
+        Uses one model_info(files_metadata=True) call for the file list and sizes and
+        at most one config.json fetch (memoized) for the MoE checks.
+
+        Args:
+            model (dict): Model metadata from get_trending_models.
+
+        Returns:
+            dict: New catalog entry, or None.
+        """
+        model_id = model['modelId']
+        print(f"Processing model: {model_id}")
+        metadata = self.get_repo_metadata(model_id)
+        if metadata is None or "config.json" not in metadata["files"]:
+            print(f"Skipping {model_id} - config.json not found")
+            return None
+
+        parameters = (model.get('config') or {}).get('num_parameters')
+
+        if parameters is None:
+            base_name = model_id.split('/')[-1]
+            parameters = get_model_size(base_name)
+
+        if parameters is None or parameters == 0 or parameters == -1:
+            print(f"Estimating parameters via file size for {model_id}")
+            total_size = metadata["safetensors_size"]
+            if total_size > 0:
+                parameters = self.estimate_parameters(total_size)
+
+        if parameters is None or parameters == 0:
+            print(f"Warning: {model_id} parameters could not be determined, setting to -1")
+            parameters = -1
+
+        if parameters > self.MAX_PARAMETERS:
+            print(f"Skipping {model_id} - {parameters} parameters exceed limit.")
+            return None
+        is_moe = self.check_moe_from_config(model_id)
+        no_experts = None
+        if is_moe:
+            inferred = self.get_expert_count_from_config(model_id)
+            # only set if inferred and not already present
+            if inferred:
+                no_experts = inferred
+        new_entry = {
+            "added": datetime.now().isoformat(),
+            "parameters": parameters,
+            "has_config": True,
+            "converted": False,
+            "attempts": 0,
+            "last_attempt": None,
+            "success_date": None,
+            "error_log": [],
+            "quantizations": [],
+            "is_moe": is_moe
+        }
+        if no_experts:
+            new_entry["no_experts"] = no_experts
+        return new_entry
+
     def update_catalog(self, models):
         """
         Add new models to the catalog if they don't already exist.
 
+        Models already in the catalog are skipped before any Hub call; the rest are
+        enriched concurrently on ENRICH_WORKERS threads and added in input order.
+
         Args:
             models (list): List of model metadata dictionaries.
         """
-        current_catalog = self.load_catalog()
-        
+        model_ids = list(dict.fromkeys(model['modelId'] for model in models))
+        existing = self.model_catalog.existing_models(model_ids)
+        new_models = {}
         for model in models:
-            model_id = model['modelId']
-            print(f"Processing model: {model_id}")
-            if not self.has_config_json(model_id):
-                print(f"Skipping {model_id} - config.json not found")
-                continue
-            
-            if model_id not in current_catalog:
-                parameters = model.get('config', {}).get('num_parameters')
-                
-                if parameters is None:
-                    base_name = model_id.split('/')[-1]
-                    parameters = get_model_size(base_name)
-                
-                if parameters is None or parameters == 0 or parameters == -1:
-                    print(f"Estimating parameters via file size for {model_id}")
-                    total_size = self.get_file_sizes(model_id)
-                    if total_size > 0:
-                        parameters = self.estimate_parameters(total_size)
-                        # Store the estimated parameters in Redis immediately
-                        self.model_catalog.update_model_field(model_id, "parameters", parameters)
-
-                if parameters is None or parameters == 0:
-                    print(f"Warning: {model_id} parameters could not be determined, setting to -1")
-                    parameters = -1
+            if model['modelId'] not in existing:
+                new_models.setdefault(model['modelId'], model)
+        if not new_models:
+            return
 
-                if parameters > self.MAX_PARAMETERS:
-                    print(f"Skipping {model_id} - {parameters} parameters exceed limit.")
-                    continue
-                is_moe = self.check_moe_from_config(model_id)
-                no_experts = None
-                if is_moe:
-                    inferred = self.get_expert_count_from_config(model_id)
-                    # only set if inferred and not already present
-                    if inferred:
-                        no_experts = inferred
-                print(f"Adding {model_id} with parameters={parameters}")
-                new_entry = {
-                    "added": datetime.now().isoformat(),
-                    "parameters": parameters,
-                    "has_config": True,
-                    "converted": False,
-                    "attempts": 0,
-                    "last_attempt": None,
-                    "success_date": None,
-                    "error_log": [],
-                    "quantizations": [],
-                    "is_moe": is_moe
-                }
-                if no_experts:
-                    new_entry["no_experts"] = no_experts
-                
-                if not self.model_catalog.add_model(model_id, new_entry):
-                    print(f"Model {model_id} already exists in Redis")
+        with self._config_memo_lock:
+            self._config_memo = {}
+        print(f"Enriching {len(new_models)} new models with {self.ENRICH_WORKERS} workers")
+        with ThreadPoolExecutor(max_workers=self.ENRICH_WORKERS) as pool:
+            futures = {model_id: pool.submit(self.enrich_model, model) for model_id, model in new_models.items()}
+            entries = {}
+            for model_id, future in futures.items():
+                try:
+                    entries[model_id] = future.result()
+                except Exception as e:
+                    print(f"Error enriching {model_id}: {e}")
+
+        for model_id, new_entry in entries.items():
+            if new_entry is None:
+                continue
+            print(f"Adding {model_id} with parameters={new_entry['parameters']}")
+            if not self.model_catalog.add_model(model_id, new_entry):
+                print(f"Model {model_id} already exists in Redis")
 
     def aggressive_cache_cleanup(self):
         """
@@ -816,6 +901,11 @@ class ModelConverter:
         if quant_progress:
             print(f"Resuming quantization for {model_id} from quant: {quant_progress}")
 
+        # Stage timings go to the model's trace; make_files.py and download_convert.py join this run
+        start_run(model_id)
+        # One toolchain for the whole job: download_convert.py and make_files.py inherit it
+        toolchain_dir = pin_toolchain()
+        print(f"Using llama.cpp toolchain {toolchain_dir}")
         success = True
         try:
             print(f"Converting {model_id}...")
@@ -834,7 +924,9 @@ class ModelConverter:
                 convert_args = [model_id]
                 if mxfp4:
                     convert_args.append("--mxfp4")
-                if not self.run_script("download_convert.py", convert_args):
+                with span("download_convert"):
+                    converted = self.run_script("download_convert.py", convert_args)
+                if not converted:
                     print("Script download_convert.py failed.")
                     success = False
 
@@ -853,12 +945,16 @@ class ModelConverter:
                 make_files_args = [model_id, "--is_moe"] if is_moe else [model_id]
                 if quant_progress:
                     make_files_args += ["--resume_quant", quant_progress]
-                if not self.run_script("make_files.py", make_files_args):
+                with span("make_files", resume_quant=quant_progress):
+                    made = self.run_script("make_files.py", make_files_args)
+                if not made:
                     print("Script make_files.py failed.")
                     success = False
 
             if success:
-                if not self.run_script("upload-files.py", [model_id.split('/')[-1]]):
+                with span("upload_files"):
+                    uploaded = self.run_script("upload-files.py", [model_id.split('/')[-1]])
+                if not uploaded:
                     print("Script upload-files.py failed.")
                     success = False
 
@@ -919,9 +1015,18 @@ class ModelConverter:
         self.update_catalog(models)
         print("=== [run_conversion_cycle] Catalog update complete ===")
 
-        print("=== [run_conversion_cycle] Loading current catalog from Redis ===")
-        current_catalog = self.load_catalog()  # <-- Reload after update
-        print(f"=== [run_conversion_cycle] Catalog loaded: {len(current_catalog)} models ===")
+        print("=== [run_conversion_cycle] Querying catalog indexes for convertible models ===")
+        # Server-side filter: unconverted, has config, under the attempt and size limits
+        # and with a known parameter count (-1 means undetermined)
+        candidate_ids = self.model_catalog.find(
+            converted=False,
+            has_config=True,
+            attempts_lt=self.MAX_ATTEMPTS,
+            parameters_gt=-1,
+            parameters_lte=self.MAX_PARAMETERS,
+        )
+        current_catalog = self.model_catalog.get_models(candidate_ids)
+        print(f"=== [run_conversion_cycle] {len(current_catalog)} candidate models loaded ===")
 
         # Helper to parse last_attempt or fallback to added date
         def get_last_attempt_or_added(entry):
@@ -979,9 +1084,28 @@ class ModelConverter:
         except Exception as e:
             print(f"[run_conversion_cycle] Error during conversion cycle: {e}")
 
+    def start_background_build(self):
+        """
+        Update and rebuild llama.cpp on a background thread.
+
+        Conversions keep running meanwhile: jobs pin the toolchain that was current
+        when they started, and a new one is only activated after its smoke test.
+        """
+        if self._build_thread is not None and self._build_thread.is_alive():
+            print("llama.cpp build already in progress")
+            return
+
+        def run():
+            print("Updating and rebuilding llama.cpp...")
+            if not build_and_copy(True):
+                print("Warning: Failed to update or rebuild llama.cpp")
+
+        self._build_thread = threading.Thread(target=run, name="llama-build", daemon=True)
+        self._build_thread.start()
+
     def start_daemon(self):
         """
-        Run the conversion process continuously with 15 minute intervals between cycles.
+        Run the conversion process continuously with 1 hour intervals between cycles.
         """
         while True:
             print("Starting conversion cycle...")
@@ -989,9 +1113,7 @@ class ModelConverter:
             print("Cycle complete. Sleeping for 1 hour...")
             time.sleep(3600)
 
-            print("Updating and rebuilding llama.cpp...without patching")
-            if not build_and_copy(True):
-                print("Warning: Failed to update or rebuild llama.cpp")
+            self.start_background_build()
 
 if __name__ == "__main__":
 
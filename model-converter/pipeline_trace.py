@@ -0,0 +1,282 @@
+"""
+pipeline_trace.py
+
+Per-stage timing and resource tracing for the conversion pipeline.
+
+Each stage (download/convert, imatrix, every quant, split, upload, README) runs
+inside a span. When the span ends one JSON line is appended to the model's trace
+file with its wall time, CPU time of this process and of the child processes it
+waited for (resource.getrusage RUSAGE_SELF / RUSAGE_CHILDREN deltas), block I/O
+and the peak RSS of the commands it ran. Scripts started by model_converter.py inherit PIPELINE_RUN_ID,
+so the spans of one conversion share a run id across processes.
+
+Child rusage only covers children that have exited and been waited for, and it
+is per process, so spans running concurrently in threads share their children's
+CPU time. ru_maxrss is a lifetime high-water mark, so peak RSS is not taken from
+it: a span reports the largest peak of the commands reaped inside it with
+wait_child() (os.wait4 gives the rusage of that one child), or null if none was.
+
+Functions:
+    - start_trace(model_id): Make a Tracer for this model the active one.
+    - start_run(model_id): start_trace with a fresh run id shared with child scripts.
+    - span(stage, **attrs): Context manager recording a span on the active tracer.
+    - wait_child(proc): Reap a Popen child with os.wait4 and add its peak RSS to the open spans.
+    - load_spans(paths): Read trace files.
+    - summarize(spans, by): Per-stage aggregates.
+
+Usage:
+    python pipeline_trace.py summary [--model company/model] [--by stage|host] [--run RUN_ID]
+    python pipeline_trace.py show company/model [--run RUN_ID]
+
+Traces are written to ~/code/models/traces (env PIPELINE_TRACE_DIR).
+"""
+
+import argparse
+import glob
+import json
+import os
+import resource
+import socket
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+TRACE_DIR = os.getenv("PIPELINE_TRACE_DIR", os.path.expanduser("~/code/models/traces"))
+RUN_ID_ENV = "PIPELINE_RUN_ID"
+# ru_maxrss is KiB on Linux, bytes on macOS; ru_inblock/ru_oublock count 512-byte blocks
+RSS_TO_MB = 1.0 / (1 << 20 if sys.platform == "darwin" else 1 << 10)
+BLOCK_TO_MB = 512.0 / (1 << 20)
+
+
+def trace_path(model_id, trace_dir=None):
+    return os.path.join(trace_dir or TRACE_DIR, model_id.replace("/", "__") + ".jsonl")
+
+
+def _usage():
+    return resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+
+
+class Tracer:
+    def __init__(self, model_id, path=None, run_id=None):
+        self.model_id = model_id
+        self.path = path or trace_path(model_id)
+        self.run_id = run_id or os.getenv(RUN_ID_ENV) or uuid.uuid4().hex[:12]
+        self.host = socket.gethostname()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        """Open spans of the calling thread, innermost last."""
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def record_child_rss(self, peak_rss_mb):
+        """Add a reaped command's peak RSS to every span open in this thread."""
+        for frame in self._stack():
+            frame["peak_rss_mb"] = max(frame["peak_rss_mb"] or 0.0, peak_rss_mb)
+
+    @contextmanager
+    def span(self, stage, **attrs):
+        """Time a stage; the record is written even when the body raises."""
+        stack = self._stack()
+        parent = stack[-1]["stage"] if stack else None
+        frame = {"stage": stage, "peak_rss_mb": None}
+        stack.append(frame)
+        start = time.time()
+        self_before, children_before = _usage()
+        status, error = "ok", None
+        try:
+            yield attrs
+        except BaseException as e:
+            status, error = "error", f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            stack.pop()
+            self_after, children_after = _usage()
+            self.write({
+                "run_id": self.run_id,
+                "model": self.model_id,
+                "stage": stage,
+                "attrs": attrs,
+                "parent": parent,
+                "depth": len(stack),
+                "host": self.host,
+                "cpus": os.cpu_count(),
+                "pid": os.getpid(),
+                "start": start,
+                "wall_s": time.time() - start,
+                "cpu_user_s": self_after.ru_utime - self_before.ru_utime,
+                "cpu_sys_s": self_after.ru_stime - self_before.ru_stime,
+                "child_user_s": children_after.ru_utime - children_before.ru_utime,
+                "child_sys_s": children_after.ru_stime - children_before.ru_stime,
+                "peak_rss_mb": frame["peak_rss_mb"],
+                "read_mb": (self_after.ru_inblock - self_before.ru_inblock
+                            + children_after.ru_inblock - children_before.ru_inblock) * BLOCK_TO_MB,
+                "write_mb": (self_after.ru_oublock - self_before.ru_oublock
+                             + children_after.ru_oublock - children_before.ru_oublock) * BLOCK_TO_MB,
+                "status": status,
+                "error": error,
+            })
+
+    def write(self, record):
+        try:
+            with self._lock:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            # Tracing must never fail a conversion
+            print(f"Warning: could not write trace to {self.path}: {e}")
+
+
+_active = None
+
+
+def start_trace(model_id, path=None, run_id=None):
+    """Make a Tracer for model_id the one span() records to, and return it."""
+    global _active
+    _active = Tracer(model_id, path=path, run_id=run_id)
+    return _active
+
+
+def start_run(model_id, path=None):
+    """Start a new run for model_id; its run id is exported to child scripts via PIPELINE_RUN_ID."""
+    tracer = start_trace(model_id, path=path, run_id=uuid.uuid4().hex[:12])
+    os.environ[RUN_ID_ENV] = tracer.run_id
+    return tracer
+
+
+def wait_child(proc):
+    """
+    Wait for a subprocess.Popen child with os.wait4 instead of proc.wait().
+
+    The rusage is that of this child alone, so its peak RSS is exact even when
+    other commands run concurrently; it is added to the spans open in the
+    calling thread.
+
+    Returns:
+        tuple: (exit code, peak RSS in MB)
+    """
+    _, status, rusage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    peak_rss_mb = rusage.ru_maxrss * RSS_TO_MB
+    if _active is not None:
+        _active.record_child_rss(peak_rss_mb)
+    return proc.returncode, peak_rss_mb
+
+
+@contextmanager
+def span(stage, **attrs):
+    """Record a span on the active tracer (a no-op before start_trace)."""
+    if _active is None:
+        yield attrs
+        return
+    with _active.span(stage, **attrs) as span_attrs:
+        yield span_attrs
+
+
+def load_spans(paths):
+    spans = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    spans.append(json.loads(line))
+                except ValueError:
+                    continue  # torn last line from a killed run
+    return spans
+
+
+def summarize(spans, by="stage"):
+    """
+    Aggregate spans per stage (or per host and stage).
+
+    Returns:
+        list: dicts with the group key, count, failures, total/mean/max wall
+            seconds, CPU seconds (self + children), cpu_per_wall (average cores
+            busy), peak RSS and read/write MB; slowest total first.
+    """
+    groups = {}
+    for s in spans:
+        key = (s["host"], s["stage"]) if by == "host" else (s["stage"],)
+        groups.setdefault(key, []).append(s)
+    rows = []
+    for key, items in groups.items():
+        wall = sum(s["wall_s"] for s in items)
+        cpu = sum(s["cpu_user_s"] + s["cpu_sys_s"] + s["child_user_s"] + s["child_sys_s"] for s in items)
+        row = {"host": key[0], "stage": key[1]} if by == "host" else {"stage": key[0]}
+        row.update({
+            "count": len(items),
+            "failed": sum(1 for s in items if s["status"] != "ok"),
+            "total_s": wall,
+            "mean_s": wall / len(items),
+            "max_s": max(s["wall_s"] for s in items),
+            "cpu_s": cpu,
+            "cpu_per_wall": cpu / wall if wall > 0 else 0.0,
+            "peak_rss_mb": max((s.get("peak_rss_mb") or 0.0) for s in items),
+            "read_mb": sum(s["read_mb"] for s in items),
+            "write_mb": sum(s["write_mb"] for s in items),
+        })
+        rows.append(row)
+    return sorted(rows, key=lambda r: r["total_s"], reverse=True)
+
+
+def _print_table(rows, fields):
+    if not rows:
+        print("No spans.")
+        return
+
+    def fmt(value):
+        return f"{value:.1f}" if isinstance(value, float) else str(value)
+    widths = {f: max(len(f), *(len(fmt(r[f])) for r in rows)) for f in fields}
+    print("  ".join(f.ljust(widths[f]) for f in fields))
+    for row in rows:
+        print("  ".join(fmt(row[f]).ljust(widths[f]) for f in fields))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize conversion pipeline traces")
+    parser.add_argument("--dir", default=TRACE_DIR, help="Trace directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+    summary_p = sub.add_parser("summary", help="Per-stage totals over all (or one model's) traces")
+    summary_p.add_argument("--model", help="company/model")
+    summary_p.add_argument("--run", help="Only this run id")
+    summary_p.add_argument("--by", choices=["stage", "host"], default="stage")
+    show_p = sub.add_parser("show", help="Spans of one run, in order")
+    show_p.add_argument("model", help="company/model")
+    show_p.add_argument("--run", help="Run id (default: latest)")
+    args = parser.parse_args()
+
+    if getattr(args, "model", None):
+        paths = [trace_path(args.model, args.dir)]
+    else:
+        paths = sorted(glob.glob(os.path.join(args.dir, "*.jsonl")))
+    spans = load_spans(p for p in paths if os.path.exists(p))
+
+    if args.command == "show" and not args.run and spans:
+        args.run = max(spans, key=lambda s: s["start"])["run_id"]
+    if args.run:
+        spans = [s for s in spans if s["run_id"] == args.run]
+
+    if args.command == "summary":
+        fields = (["host"] if args.by == "host" else []) + [
+            "stage", "count", "failed", "total_s", "mean_s", "max_s", "cpu_s", "cpu_per_wall",
+            "peak_rss_mb", "read_mb", "write_mb"]
+        _print_table(summarize(spans, by=args.by), fields)
+    else:
+        print(f"Run {args.run}")
+        for s in sorted(spans, key=lambda s: s["start"]):
+            label = "  " * s["depth"] + s["stage"]
+            if s["attrs"]:
+                label += " " + " ".join(f"{k}={v}" for k, v in s["attrs"].items())
+            cpu = s["cpu_user_s"] + s["cpu_sys_s"] + s["child_user_s"] + s["child_sys_s"]
+            print(f"{time.strftime('%H:%M:%S', time.localtime(s['start']))}  {label:<40} "
+                  f"{s['wall_s']:>9.1f}s  cpu {cpu:>9.1f}s  rss {s.get('peak_rss_mb') or 0:>8.0f}MB"
+                  f"  {s['status']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+quant_results.py
+
+Local SQLite store for quantization results, shared by make_files.py and the
+perplexity harnesses (quant_bench.py, perp_test.py, perp_test_2_files.py).
+
+Every quantize (and, from the harnesses, every evaluation) becomes one row:
+model, quant config, tensor plan hash, llama.cpp commit, wall time, peak RSS,
+output size, PPL and KLD. Rows from different llama.cpp builds can then be
+compared to spot a rebuild that made quantization slower or worse.
+
+Functions:
+    - run_measured(cmd, **kwargs): Run a command, returning its wall time and peak RSS.
+    - tensor_plan_hash(tensor_args): Short hash of the --tensor-type arguments.
+    - llama_commit(llama_dir): llama.cpp commit of a toolchain or checkout.
+    - record_run(db_path=None, **fields): Insert a row, never raising.
+
+Usage:
+    python quant_results.py list [--model M] [--quant Q] [--limit 50]
+    python quant_results.py trend --model M [--quant Q]
+    python quant_results.py regressions [--threshold 0.05]
+
+The database defaults to ~/code/models/quant_results.db (env QUANT_RESULTS_DB).
+"""
+
+import argparse
+import functools
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+from pipeline_trace import wait_child
+
+DEFAULT_DB = os.getenv("QUANT_RESULTS_DB", os.path.expanduser("~/code/models/quant_results.db"))
+
+COLUMNS = [
+    ("ts", "REAL"),
+    ("source", "TEXT"),
+    ("host", "TEXT"),
+    ("model", "TEXT"),
+    ("quant", "TEXT"),
+    ("quant_type", "TEXT"),
+    ("config", "TEXT"),
+    ("tensor_plan_hash", "TEXT"),
+    ("llama_commit", "TEXT"),
+    ("wall_time", "REAL"),
+    ("peak_rss_mb", "REAL"),
+    ("size_bytes", "INTEGER"),
+    ("ppl", "REAL"),
+    ("ppl_err", "REAL"),
+    ("kld", "REAL"),
+    ("top1_agreement", "REAL"),
+    ("eval_time", "REAL"),
+    ("status", "TEXT"),
+]
+COLUMN_NAMES = [name for name, _ in COLUMNS]
+# Metrics where a higher value in a newer build is a regression
+REGRESSION_METRICS = ["wall_time", "peak_rss_mb", "ppl", "kld"]
+
+
+def run_measured(cmd, **kwargs):
+    """
+    Run a command like subprocess.run(capture_output=True) and measure it.
+
+    The child is reaped with pipeline_trace.wait_child (os.wait4), so the peak
+    RSS is that of this command alone even when other commands run concurrently,
+    and it is also counted in the trace spans open in the calling thread.
+
+    Returns:
+        tuple: (CompletedProcess with bytes stdout/stderr, wall seconds, peak RSS in MB)
+    """
+    start = time.time()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs)
+    output = {}
+
+    def drain(name, stream):
+        output[name] = stream.read()
+        stream.close()
+
+    readers = [threading.Thread(target=drain, args=(name, stream))
+               for name, stream in (("stdout", proc.stdout), ("stderr", proc.stderr))]
+    for reader in readers:
+        reader.start()
+    _, peak_rss_mb = wait_child(proc)
+    for reader in readers:
+        reader.join()
+    duration = time.time() - start
+    return subprocess.CompletedProcess(cmd, proc.returncode, output["stdout"], output["stderr"]), duration, peak_rss_mb
+
+
+def tensor_plan_hash(tensor_args):
+    """Short hash of a tensor_list_builder plan ("--tensor-type a=X ..." string or list)."""
+    if isinstance(tensor_args, (list, tuple)):
+        tensor_args = " ".join(tensor_args)
+    return hashlib.sha256((tensor_args or "").strip().encode("utf-8")).hexdigest()[:12]
+
+
+@functools.lru_cache(maxsize=None)
+def llama_commit(llama_dir):
+    """
+    Short llama.cpp commit for a toolchain directory (toolchain.json) or a git
+    checkout (update_readme.get_git_commit_info). None when unknown.
+    """
+    metadata_file = os.path.join(llama_dir, "toolchain.json")
+    if os.path.exists(metadata_file):
+        try:
+            with open(metadata_file, "r") as f:
+                commit = json.load(f).get("commit")
+            if commit:
+                return commit[:7]
+        except (OSError, ValueError):
+            pass
+    try:
+        from update_readme import get_git_commit_info
+        _, short_hash = get_git_commit_info(llama_dir)
+        return short_hash
+    except Exception:
+        return None
+
+
+class ResultsDB:
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_DB
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS quant_runs (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                         + ", ".join(f"{name} {kind}" for name, kind in COLUMNS) + ")")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_quant_runs_model ON quant_runs (model, quant)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_quant_runs_commit ON quant_runs (llama_commit)")
+
+    def _connect(self):
+        # One connection per call keeps this safe from worker threads; WAL lets
+        # make_files and a benchmark write at the same time
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def record(self, **fields):
+        """Insert one row; unknown fields are rejected. Returns the row id."""
+        unknown = set(fields) - set(COLUMN_NAMES)
+        if unknown:
+            raise ValueError(f"Unknown result fields: {', '.join(sorted(unknown))}")
+        fields.setdefault("ts", time.time())
+        fields.setdefault("host", socket.gethostname())
+        if isinstance(fields.get("config"), dict):
+            fields["config"] = json.dumps(fields["config"], sort_keys=True)
+        names = list(fields)
+        conn = self._connect()
+        try:
+            with conn:
+                cursor = conn.execute(f"INSERT INTO quant_runs ({', '.join(names)}) VALUES "
+                                      f"({', '.join('?' for _ in names)})", [fields[n] for n in names])
+            return cursor.lastrowid
+        finally:
+            conn.close()
+
+    def query(self, model=None, quant=None, source=None, limit=None):
+        """Rows (newest first) as dicts, optionally filtered."""
+        where, params = [], []
+        for column, value in (("model", model), ("quant", quant), ("source", source)):
+            if value:
+                where.append(f"{column} = ?")
+                params.append(value)
+        sql = "SELECT * FROM quant_runs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY ts DESC, id DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        conn = self._connect()
+        try:
+            return [dict(row) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def trend(self, model=None, quant=None):
+        """
+        Per (model, quant, source, tensor_plan_hash, llama_commit) averages, oldest build first.
+
+        Rows from different sources or tensor plans are never averaged together,
+        so only a llama.cpp rebuild separates consecutive entries of one series.
+
+        Returns:
+            list: dicts with model, quant, source, tensor_plan_hash, llama_commit,
+                runs, first_seen and the average of each REGRESSION_METRICS column.
+        """
+        where, params = ["status = 'ok'"], []
+        for column, value in (("model", model), ("quant", quant)):
+            if value:
+                where.append(f"{column} = ?")
+                params.append(value)
+        averages = ", ".join(f"AVG({m}) AS {m}" for m in REGRESSION_METRICS)
+        series = "model, quant, source, tensor_plan_hash"
+        sql = (f"SELECT {series}, llama_commit, COUNT(*) AS runs, MIN(ts) AS first_seen, {averages} "
+               f"FROM quant_runs WHERE {' AND '.join(where)} "
+               f"GROUP BY {series}, llama_commit ORDER BY {series}, first_seen")
+        conn = self._connect()
+        try:
+            return [dict(row) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def regressions(self, threshold=0.05, model=None):
+        """
+        Compare the latest llama.cpp build of each (model, quant, source, tensor
+        plan) with the one before.
+
+        Returns:
+            list: dicts with model, quant, source, tensor_plan_hash, metric, old/new
+                commit and value, and the relative change, for every metric that got
+                worse by more than threshold.
+        """
+        by_key = {}
+        for row in self.trend(model=model):
+            key = (row["model"], row["quant"], row["source"], row["tensor_plan_hash"])
+            by_key.setdefault(key, []).append(row)
+        found = []
+        # tensor_plan_hash is NULL for rows without per-tensor arguments
+        for key in sorted(by_key, key=lambda k: [part or "" for part in k]):
+            model_name, quant, source, plan_hash = key
+            builds = by_key[key]
+            if len(builds) < 2:
+                continue
+            old, new = builds[-2], builds[-1]
+            for metric in REGRESSION_METRICS:
+                if old[metric] is None or new[metric] is None or old[metric] <= 0:
+                    continue
+                change = (new[metric] - old[metric]) / old[metric]
+                if change > threshold:
+                    found.append({"model": model_name, "quant": quant, "source": source,
+                                  "tensor_plan_hash": plan_hash, "metric": metric,
+                                  "old_commit": old["llama_commit"], "new_commit": new["llama_commit"],
+                                  "old": old[metric], "new": new[metric], "change": change})
+        return found
+
+
+def record_run(db_path=None, **fields):
+    """Record a row in the results database; failures are reported, never raised."""
+    try:
+        return ResultsDB(db_path).record(**fields)
+    except (sqlite3.Error, OSError, ValueError) as e:
+        print(f"Warning: could not record result in {db_path or DEFAULT_DB}: {e}")
+        return None
+
+
+def _format(value):
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.4f}" if abs(value) < 100 else f"{value:.1f}"
+    return str(value)
+
+
+def print_table(rows, fields):
+    if not rows:
+        print("No results.")
+        return
+    widths = {f: max(len(f), *(len(_format(r.get(f))) for r in rows)) for f in fields}
+    print("  ".join(f.ljust(widths[f]) for f in fields))
+    for row in rows:
+        print("  ".join(_format(row.get(f)).ljust(widths[f]) for f in fields))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the quantization results database")
+    parser.add_argument("--db", default=DEFAULT_DB, help="SQLite database path")
+    sub = parser.add_subparsers(dest="command", required=True)
+    list_p = sub.add_parser("list", help="Latest rows")
+    list_p.add_argument("--model")
+    list_p.add_argument("--quant")
+    list_p.add_argument("--source", help="make_files or quant_bench")
+    list_p.add_argument("--limit", type=int, default=50)
+    trend_p = sub.add_parser("trend", help="Averages per llama.cpp commit")
+    trend_p.add_argument("--model")
+    trend_p.add_argument("--quant")
+    reg_p = sub.add_parser("regressions", help="Metrics that got worse in the latest build")
+    reg_p.add_argument("--model")
+    reg_p.add_argument("--threshold", type=float, default=0.05, help="Relative change to report (0.05 = 5%%)")
+    args = parser.parse_args()
+
+    db = ResultsDB(args.db)
+    if args.command == "list":
+        rows = db.query(model=args.model, quant=args.quant, source=args.source, limit=args.limit)
+        for row in rows:
+            row["ts"] = time.strftime("%Y-%m-%d %H:%M", time.localtime(row["ts"]))
+        print_table(rows, ["ts", "source", "model", "quant", "llama_commit", "tensor_plan_hash", "wall_time",
+                           "peak_rss_mb", "size_bytes", "ppl", "kld", "status"])
+    elif args.command == "trend":
+        print_table(db.trend(model=args.model, quant=args.quant),
+                    ["model", "quant", "source", "tensor_plan_hash", "llama_commit", "runs"] + REGRESSION_METRICS)
+    else:
+        found = db.regressions(threshold=args.threshold, model=args.model)
+        for row in found:
+            row["change"] = f"{row['change'] * 100:+.1f}%"
+        print_table(found, ["model", "quant", "source", "tensor_plan_hash", "metric",
+                            "old_commit", "new_commit", "old", "new", "change"])
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,17 +11,17 @@ import argparse
 
 def recalculate_all_model_sizes(force=False):
     converter = ModelConverter()
-    catalog = converter.load_catalog()
+    # Without --force only models whose parameters are missing, 0 or -1 need work;
+    # the parameters index answers that without decoding the whole catalog.
+    if force:
+        model_ids = converter.model_catalog.find()
+    else:
+        model_ids = converter.model_catalog.find(parameters_known=False)
     updated = 0
 
-    for model_id, entry in catalog.items():
+    for model_id in model_ids:
         print(f"\n[Recalculate] Processing {model_id}...")
 
-        parameters = entry.get('parameters', None)
-        if not force and parameters is not None and parameters != -1 and parameters != 0:
-            print(f" - Existing parameters: {parameters} (skipping recalculation)")
-            continue
-
         # Try get_model_size (local)
         base_name = model_id.split('/')[-1]
         parameters = get_model_size(base_name)
@@ -1,9 +1,12 @@
 import numpy as np
 import argparse
+import heapq
 import json
+import os
 import sys
 import re
 import subprocess
+import tempfile
 from pathlib import Path
 
 # Supported ladders (only ggml-supported canonical types)
@@ -62,6 +65,34 @@ quant_substitutions = {
     "Q6_K_M": "Q6_K",
 }
 
+# Approximate bits per weight of each ggml type (block scales included), used
+# to cost imatrix-driven bumps against a bpw / size budget
+type_bits_per_weight = {
+    "IQ1_S": 1.5625,
+    "IQ1_M": 1.75,
+    "IQ2_XXS": 2.0625,
+    "IQ2_XS": 2.3125,
+    "IQ2_S": 2.5,
+    "IQ3_XXS": 3.0625,
+    "IQ3_S": 3.4375,
+    "IQ4_NL": 4.5,
+    "IQ4_XS": 4.25,
+    "Q2_K": 2.625,
+    "Q3_K": 3.4375,
+    "Q4_K": 4.5,
+    "Q5_K": 5.5,
+    "Q6_K": 6.5625,
+    "Q4_0": 4.5,
+    "Q4_1": 5.0,
+    "Q5_0": 5.5,
+    "Q5_1": 6.0,
+    "Q8_0": 8.5,
+    "MXFP4": 4.25,
+    "F16": 16.0,
+    "BF16": 16.0,
+    "F32": 32.0,
+}
+
 def extract_layer_order(name: str) -> int:
     """
     Extract layer order from tensor name
@@ -110,6 +141,34 @@ def get_current_quant_types(gguf_file: str) -> tuple:
         print(f"Details: {str(e)}")
         sys.exit(1)
 
+def get_tensor_element_counts(gguf_file: str) -> dict:
+    """
+    Get the number of elements of every tensor (names without '.weight')
+    """
+    script_path = Path(__file__).parent / "get_gguf_tensor_info.py"
+    fd, output_file = tempfile.mkstemp(suffix=".txt", prefix="gguf_quant_info_")
+    os.close(fd)
+    elements_file = output_file[:-len(".txt")] + "_elements.txt"
+    try:
+        subprocess.run(
+            [sys.executable, str(script_path),
+            str(Path(gguf_file).expanduser().resolve()),
+            "-o", output_file, "-e", elements_file],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            timeout=30
+        )
+        element_counts = {}
+        with open(elements_file, "r") as f:
+            for line in f:
+                name, count = line.strip().split("=")
+                element_counts[name] = int(count)
+        return element_counts
+    finally:
+        for path in (output_file, elements_file):
+            if os.path.exists(path):
+                os.remove(path)
+
 def normalize_layer_order(layer_order: int, max_layer_order: int) -> float:
     """
     Normalize layer order to 0-10 range
@@ -310,7 +369,101 @@ def apply_precision_override_rule(
         )
     return suggested_quant, reason, bump_applied
 
-def process_quantization(gguf_file: str, quant_rules_file: str, target_type: str, is_moe: bool = False, precision_override: str = None):
+def type_bits(quant: str, default: float = 16.0) -> float:
+    """Bits per weight of a quant type ('Q4_K', 'Q4_K_M' or 'F32 (0)' style names)"""
+    quant = str(quant).split(" ")[0].upper()
+    return type_bits_per_weight.get(quant_substitutions.get(quant, quant), default)
+
+def upgrade_ladder(target_type: str) -> list:
+    """Types a tensor can be bumped through for this target, canonical names only"""
+    normalized_target = quant_substitutions.get(target_type, target_type)
+    if normalized_target.startswith("IQ"):
+        return [quant_substitutions.get(q, q) for q in iq_overflow_ladder]
+    return k_ladder
+
+def imatrix_importance(imatrix_file: str) -> dict:
+    """
+    Per-tensor importance scores from an imatrix, keyed like get_current_quant_types
+    (see imatrix_analysis.importance_scores). Scores are relative to the other
+    tensors of the same role, so the planner ranks layers within a role and
+    leaves the cross-role priorities to the static rules.
+    """
+    from imatrix_analysis import load_imatrix, importance_scores
+
+    return {row["name"].replace(".weight", ""): row["score"]
+            for row in importance_scores(load_imatrix(imatrix_file))}
+
+def plan_bits(plan: list, element_counts: dict) -> float:
+    """Total bits of a plan ([name, quant, reason, bump_applied] entries)"""
+    return sum(element_counts.get(name, 0) * type_bits(quant) for name, quant, _, _ in plan)
+
+def plan_imatrix_bumps(plan: list, element_counts: dict, importance: dict, target_type: str, budget_bits: float) -> list:
+    """
+    Spend a bit budget on one-step bumps for the tensors the imatrix marks as sensitive.
+
+    Quantization noise is modelled as importance * 2^(-2 * bpw); candidates are
+    taken greedily by noise reduction per extra bit, and a tensor re-enters the
+    queue with its next step after each bump. Entries in plan are updated in
+    place; tensors with precision overrides or preserved types are left alone.
+
+    Returns:
+        list: names of the tensors that were bumped
+    """
+    ladder = upgrade_ladder(target_type)
+    remaining = budget_bits - plan_bits(plan, element_counts)
+    entries = {entry[0]: entry for entry in plan}
+
+    def candidate(name):
+        quant = entries[name][1]
+        if quant not in ladder or ladder.index(quant) + 1 >= len(ladder):
+            return None
+        next_quant = ladder[ladder.index(quant) + 1]
+        cur_bits, next_bits = type_bits(quant), type_bits(next_quant)
+        cost = element_counts[name] * (next_bits - cur_bits)
+        if cost <= 0:
+            return None
+        gain = importance[name] * (2 ** (-2 * cur_bits) - 2 ** (-2 * next_bits)) / (next_bits - cur_bits)
+        return (-gain, name, next_quant, cost)
+
+    heap = []
+    for name, quant, reason, _ in plan:
+        if name not in importance or name not in element_counts:
+            continue
+        if reason.startswith(("Override", "Preserve")):
+            continue
+        item = candidate(name)
+        if item:
+            heap.append(item)
+    heapq.heapify(heap)
+
+    bumped = []
+    while heap and remaining > 0:
+        _, name, next_quant, cost = heapq.heappop(heap)
+        if cost > remaining:
+            continue
+        remaining -= cost
+        entry = entries[name]
+        entry[1] = next_quant
+        entry[2] = f"imatrix bump to {next_quant} (importance {importance[name]:.2f})"
+        entry[3] = True
+        if name not in bumped:
+            bumped.append(name)
+        item = candidate(name)
+        if item:
+            heapq.heappush(heap, item)
+    return bumped
+
+def precision_override_for(quant_name: str):
+    """Precision override make_files uses for a quant: BF16/F16 when its name says so, else None."""
+    name = quant_name.lower()
+    if "bf16" in name:
+        return "BF16"
+    if "f16" in name:
+        return "F16"
+    return None
+
+def process_quantization(gguf_file: str, quant_rules_file: str, target_type: str, is_moe: bool = False, precision_override: str = None,
+                         imatrix_file: str = None, target_bpw: float = None, size_budget: int = None, extra_bpw: float = None):
     """
     Process quantization for a model based on JSON rules
     
@@ -319,6 +472,11 @@ def process_quantization(gguf_file: str, quant_rules_file: str, target_type: str
         quant_rules_file (str): Path to JSON quantization rules
         target_type (str): Target quantization type
         is_moe (bool): Whether this is a Mixture of Experts model
+        imatrix_file (str): Optional imatrix; with a budget, the most sensitive
+            tensors get extra bumps on top of the rules (see plan_imatrix_bumps)
+        target_bpw (float): Budget as average bits per weight
+        size_budget (int): Budget as output size in bytes
+        extra_bpw (float): Budget as bits per weight on top of the rule-based plan
     """
     # Load quantization rules
     with open(quant_rules_file, 'r') as f:
@@ -327,15 +485,15 @@ def process_quantization(gguf_file: str, quant_rules_file: str, target_type: str
     # Get current quantization types and max layer order
     current_quants, max_layer_order = get_current_quant_types(gguf_file)
     
-    # Track suggestions
-    quant_suggestions = []
+    # Track the plan for every tensor: [name, quant, reason, bump_applied]
+    plan = []
     
     # Process each tensor
     for name, current_quant in current_quants.items():
         # Skip changing quant type for mxfp4
         if "mxfp4" in str(current_quant).lower():
             print(f"[DEBUG] Preserving mxfp4 quantization for tensor: {name} (current_quant={current_quant})")
-            quant_suggestions.append((name, "mxfp4", "Preserve mxfp4 quantization"))
+            plan.append([name, "mxfp4", "Preserve mxfp4 quantization", True])
             continue
 
         # Extract layer order
@@ -361,11 +519,25 @@ def process_quantization(gguf_file: str, quant_rules_file: str, target_type: str
             is_moe=is_moe, layer_order=normalized_layer_order
         )
 
-
-        
-        # Only add suggestion if it's different from current
-        if bump_applied:
-            quant_suggestions.append((name, suggested_quant, reason))
+        plan.append([name, suggested_quant, reason, bump_applied])
+
+    if imatrix_file and (target_bpw or size_budget or extra_bpw):
+        element_counts = get_tensor_element_counts(gguf_file)
+        total_elements = sum(element_counts.values())
+        limits = []
+        if target_bpw:
+            limits.append(target_bpw * total_elements)
+        if size_budget:
+            limits.append(size_budget * 8)
+        if extra_bpw:
+            limits.append(plan_bits(plan, element_counts) + extra_bpw * total_elements)
+        bumped = plan_imatrix_bumps(plan, element_counts, imatrix_importance(imatrix_file),
+                                    quant_substitutions.get(target_type, target_type), min(limits))
+        print(f"imatrix planner bumped {len(bumped)} tensors, "
+              f"{plan_bits(plan, element_counts) / max(total_elements, 1):.3f} bpw")
+
+    # Only add suggestion if it's different from current
+    quant_suggestions = [(name, quant, reason) for name, quant, reason, bump_applied in plan if bump_applied]
     # Sort by layer number before printing
     def layer_sort_key(item):
         return extract_layer_order(item[0])
@@ -394,6 +566,10 @@ def main():
     parser.add_argument("target_type", help="Target quantization type")
     parser.add_argument("--moe", action="store_true", 
                         help="Indicate if this is a Mixture of Experts model")
+    parser.add_argument("--imatrix", help="imatrix file used to bump the most sensitive tensors")
+    parser.add_argument("--target-bpw", type=float, help="Bump budget as average bits per weight")
+    parser.add_argument("--size-budget-gb", type=float, help="Bump budget as output size in GiB")
+    parser.add_argument("--extra-bpw", type=float, help="Bump budget as bits per weight on top of the rules")
     
     args = parser.parse_args()
     
@@ -401,7 +577,11 @@ def main():
         gguf_file=args.gguf_file,
         quant_rules_file=args.quant_rules,
         target_type=args.target_type,
-        is_moe=args.moe
+        is_moe=args.moe,
+        imatrix_file=args.imatrix,
+        target_bpw=args.target_bpw,
+        size_budget=int(args.size_budget_gb * 1024**3) if args.size_budget_gb else None,
+        extra_bpw=args.extra_bpw
     )
     print(tensor_args)
 
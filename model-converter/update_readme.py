@@ -30,6 +30,8 @@ Exits with code 0 on success, raises exceptions on failure.
 import os
 import subprocess
 
+from llama_toolchain import resolve_toolchain_dir, toolchain_commit
+
 iquant_section_content = """
 
 ---
@@ -125,9 +127,9 @@ def update_readme(model_dir, base_name, add_iquant_txt=False):
     if not os.path.exists(readme_file):
         raise FileNotFoundError(f"README.md not found in {model_dir}")
 
-    # Get Git commit info from llama.cpp repo
-    llama_cpp_path = os.path.expanduser("~/code/models/llama.cpp")
-    full_hash, short_hash = get_git_commit_info(llama_cpp_path)
+    # llama.cpp commit of the toolchain this job pinned (see llama_toolchain.py)
+    full_hash = toolchain_commit(resolve_toolchain_dir())
+    short_hash = full_hash[:7] if full_hash else None
     
     git_info = ""
     if short_hash:
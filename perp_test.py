@@ -1,9 +1,8 @@
 #!/usr/bin/env python3
+import argparse
 import subprocess
-import re
-import time
-import csv
 from pathlib import Path
+from quant_bench import QuantBench, default_threads, write_results, print_results, DEFAULT_DB
 
 # Configuration
 BIN_DIR = Path("../models/llama.cpp")
@@ -21,11 +20,9 @@ QUANTS = [
     "IQ4_NL", "IQ4_XS"
 ]
 
-# Get thread count safely
-try:
-    THREADS = int(subprocess.run(["nproc"], capture_output=True, text=True).stdout.strip())
-except:
-    THREADS = 4  # Fallback value
+THREADS = default_threads()
+# Concurrent quantize/perplexity jobs; THREADS is split between them
+JOBS = 2
 
 CTX_SIZE = 256
 PPL_STRIDE = 32
@@ -59,121 +56,31 @@ def prepare_test_data():
             f.write(f"Sample {i}: The quick brown fox jumps over the lazy dog.\n")
     print(f"Generated test data (~{estimate_tokens(TEST_TEXT):.0f} tokens)")
 
-def extract_perplexity(output):
-    """Extract perplexity from output - WORKS WITH YOUR EXACT FORMAT"""
-    # First try to find the specific pattern in your output
-    lines = output.split('\n')
-    for i, line in enumerate(lines):
-        if "ETA" in line and i+1 < len(lines):
-            next_line = lines[i+1].strip()
-            if match := re.match(r'^\d+\s+(\d+\.\d+)$', next_line):
-                return match.group(1)
-    
-    # Fallback patterns if the output format changes
-    if match := re.search(r'Perplexity:\s*(\d+\.\d+)', output):
-        return match.group(1)
-    if match := re.search(r'\[\d+\](\d+\.\d+)', output):
-        return match.group(1)
-    
-    return None
-
-def run_command(cmd, log_file=None):
-    """Run command with logging and timing"""
-    start = time.time()
-    try:
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                              text=True, check=True)
-        output = result.stdout
-        duration = time.time() - start
-        
-        if log_file:
-            with open(log_file, 'a') as f:
-                f.write(f"=== Command: {' '.join(cmd)} ===\n")
-                f.write(output)
-                if result.stderr:
-                    f.write("\n=== Errors ===\n")
-                    f.write(result.stderr)
-                f.write(f"\n=== Completed in {duration:.2f}s ===\n\n")
-        
-        return output, duration, True
-    except subprocess.CalledProcessError as e:
-        output = e.stdout
-        if log_file:
-            with open(log_file, 'a') as f:
-                f.write(f"=== FAILED Command: {' '.join(cmd)} ===\n")
-                f.write(output)
-                if e.stderr:
-                    f.write("\n=== Errors ===\n")
-                    f.write(e.stderr)
-                f.write(f"\n=== Failed after {time.time()-start:.2f}s ===\n\n")
-        return output, time.time()-start, False
-
 def main():
     """Main execution function"""
-    # Initialize results
-    with open(RESULTS_FILE, 'w') as f:
-        f.write("Quantization,Perplexity,Time\n")
+    parser = argparse.ArgumentParser(description="Quantize INPUT_MODEL with each of QUANTS and measure quality")
+    parser.add_argument("--kld", action="store_true",
+                        help="Compare each quant with the bf16 logits (saved once) instead of plain perplexity")
+    args = parser.parse_args()
 
     # Prepare test data
     if not TEST_TEXT.exists() or estimate_tokens(TEST_TEXT) < MIN_TOKENS:
         print("Preparing test data...")
         prepare_test_data()
 
-    # Test each quantization type
-    for ftype in QUANTS:
-        output_model = Path(f"./Meta-Llama-3-8B-{ftype}.gguf")
-        log_file = Path(f"./quantize_{ftype}.log")
-        
-        print(f"\n=== Testing {ftype} ===")
-        print(f"[{time.strftime('%H:%M:%S')}] Output: {output_model}")
-
-        # Quantization
-        if not output_model.exists():
-            quant_cmd = [
-                str(BIN_DIR/"llama-quantize"),
-                "--imatrix", str(IMATRIX_FILE),
-                "--token-embedding-type", "q5_k",
-                "--output-tensor-type", "q5_k",
-                str(INPUT_MODEL),
-                str(output_model),
-                ftype
-            ]
-            print(f"Quantizing: {' '.join(quant_cmd)}")
-            _, quant_time, success = run_command(quant_cmd, log_file)
-            if not success:
-                print("ERROR: Quantization failed")
-                continue
-        else:
-            print("Existing model found, skipping quantization")
-            quant_time = 0
-
-        # Perplexity Test
-        if output_model.exists():
-            print(f"\n[{time.strftime('%H:%M:%S')}] Running perplexity test...")
-            ppl_cmd = [
-                str(BIN_DIR/"llama-perplexity"),
-                "-m", str(output_model),
-                "-f", str(TEST_TEXT),
-                "--ctx-size", str(CTX_SIZE),
-                "--ppl-stride", str(PPL_STRIDE),
-                "--chunks", str(CHUNKS),
-                "--threads", str(THREADS)
-            ]
-            print(f"Running: {' '.join(ppl_cmd)}")
-            output, ppl_time, success = run_command(ppl_cmd, log_file)
-            
-            final_ppl = extract_perplexity(output)
-            if final_ppl:
-                print(f"[✓] Perplexity: {final_ppl} (Time: {ppl_time:.2f}s)")
-                with open(RESULTS_FILE, 'a') as f:
-                    f.write(f"{ftype},{final_ppl},{ppl_time:.2f}\n")
-            else:
-                print("[X] Failed to extract perplexity - dumping output for debugging:")
-                print("="*60)
-                print(output[-500:])  # Show last 500 chars of output
-                print("="*60)
-                with open(RESULTS_FILE, 'a') as f:
-                    f.write(f"{ftype},ERROR,\n")
+    # Same settings as before: imatrix quants with q5_k embeddings/output
+    configs = [
+        {"name": ftype, "type": ftype, "embed_type": "Q5_K", "output_type": "Q5_K",
+         "use_imatrix": True, "use_pure": False}
+        for ftype in QUANTS
+    ]
+    bench = QuantBench(INPUT_MODEL, out_dir=".", imatrix=IMATRIX_FILE, bin_dir=BIN_DIR, test_text=TEST_TEXT,
+                       threads=THREADS, jobs=JOBS, ctx_size=CTX_SIZE, ppl_stride=PPL_STRIDE, chunks=CHUNKS, kld=args.kld,
+                       results_db=DEFAULT_DB)
+    rows = bench.run(configs)
+    write_results(rows, RESULTS_FILE)
+    print()
+    print_results(rows, kld=args.kld)
 
 if __name__ == "__main__":
     main()
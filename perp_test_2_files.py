@@ -1,10 +1,8 @@
 #!/usr/bin/env python3
 import subprocess
-import re
-import time
-import csv
 from pathlib import Path
 import argparse
+from quant_bench import QuantBench, default_threads, write_results, DEFAULT_DB
 
 # Configuration
 BIN_DIR = Path("../models/llama.cpp")
@@ -14,7 +12,6 @@ RESULTS_FILE = Path("./model_comparison.csv")
 CTX_SIZE = 256
 PPL_STRIDE = 32
 CHUNKS = 1
-THREADS=4
 
 def estimate_tokens(filepath):
     """Estimate tokens from word count"""
@@ -44,81 +41,6 @@ def prepare_test_data():
             f.write(f"Sample {i}: The quick brown fox jumps over the lazy dog.\n")
     print(f"Generated test data (~{estimate_tokens(TEST_TEXT):.0f} tokens)")
 
-def extract_perplexity(output):
-    """Extract perplexity from output"""
-    lines = output.split('\n')
-    for i, line in enumerate(lines):
-        if "ETA" in line and i+1 < len(lines):
-            next_line = lines[i+1].strip()
-            if match := re.match(r'^\d+\s+(\d+\.\d+)$', next_line):
-                return match.group(1)
-    
-    if match := re.search(r'Perplexity:\s*(\d+\.\d+)', output):
-        return match.group(1)
-    if match := re.search(r'\[\d+\](\d+\.\d+)', output):
-        return match.group(1)
-    
-    return None
-
-def run_command(cmd, log_file=None):
-    """Run command with logging and timing"""
-    start = time.time()
-    try:
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                              text=True, check=True)
-        output = result.stdout
-        duration = time.time() - start
-        
-        if log_file:
-            with open(log_file, 'a') as f:
-                f.write(f"=== Command: {' '.join(cmd)} ===\n")
-                f.write(output)
-                if result.stderr:
-                    f.write("\n=== Errors ===\n")
-                    f.write(result.stderr)
-                f.write(f"\n=== Completed in {duration:.2f}s ===\n\n")
-        
-        return output, duration, True
-    except subprocess.CalledProcessError as e:
-        output = e.stdout
-        if log_file:
-            with open(log_file, 'a') as f:
-                f.write(f"=== FAILED Command: {' '.join(cmd)} ===\n")
-                f.write(output)
-                if e.stderr:
-                    f.write("\n=== Errors ===\n")
-                    f.write(e.stderr)
-                f.write(f"\n=== Failed after {time.time()-start:.2f}s ===\n\n")
-        return output, time.time()-start, False
-
-def test_model(model_path, log_file=None):
-    """Run perplexity test on a single model"""
-    print(f"\nTesting model: {model_path.name}")
-    
-    ppl_cmd = [
-        str(BIN_DIR/"llama-perplexity"),
-        "-m", str(model_path),
-        "-f", str(TEST_TEXT),
-        "--ctx-size", str(CTX_SIZE),
-        "--ppl-stride", str(PPL_STRIDE),
-        "--chunks", str(CHUNKS),
-        "--threads", str(THREADS)
-    ]
-    
-    print(f"Running: {' '.join(ppl_cmd)}")
-    output, ppl_time, success = run_command(ppl_cmd, log_file)
-    
-    final_ppl = extract_perplexity(output)
-    if final_ppl:
-        print(f"[✓] Perplexity: {final_ppl} (Time: {ppl_time:.2f}s)")
-        return float(final_ppl), ppl_time
-    else:
-        print("[X] Failed to extract perplexity - dumping output for debugging:")
-        print("="*60)
-        print(output[-500:])
-        print("="*60)
-        return None, None
-
 def main():
     """Main execution function"""
     parser = argparse.ArgumentParser(description='Compare perplexity of two GGUF models')
@@ -126,35 +48,24 @@ def main():
     parser.add_argument('model2', type=str, help='Path to second GGUF model file')
     args = parser.parse_args()
 
-    # Get thread count safely
-    try:
-        THREADS = int(subprocess.run(["nproc"], capture_output=True, text=True).stdout.strip())
-    except:
-        THREADS = 4  # Fallback value
-
     # Prepare test data
     if not TEST_TEXT.exists() or estimate_tokens(TEST_TEXT) < MIN_TOKENS:
         print("Preparing test data...")
         prepare_test_data()
 
-    # Initialize results
-    with open(RESULTS_FILE, 'w') as f:
-        f.write("Model,Perplexity,Time\n")
-
-    # Test both models
-    results = []
-    for model_path in [Path(args.model1), Path(args.model2)]:
+    model_paths = [Path(args.model1), Path(args.model2)]
+    for model_path in model_paths:
         if not model_path.exists():
             print(f"Error: Model file not found: {model_path}")
             return
-        
-        log_file = Path(f"./perplexity_{model_path.stem}.log")
-        ppl, duration = test_model(model_path, log_file)
-        
-        if ppl is not None:
-            results.append((model_path.name, ppl, duration))
-            with open(RESULTS_FILE, 'a') as f:
-                f.write(f"{model_path.name},{ppl},{duration:.2f}\n")
+
+    # Both models are evaluated at the same time, each with half the threads
+    bench = QuantBench(model_paths[0], out_dir=".", bin_dir=BIN_DIR, test_text=TEST_TEXT,
+                       threads=default_threads(), jobs=2, ctx_size=CTX_SIZE, ppl_stride=PPL_STRIDE, chunks=CHUNKS,
+                       results_db=DEFAULT_DB)
+    rows = bench.evaluate_models(model_paths)
+    write_results(rows, RESULTS_FILE)
+    results = [(r["model"], float(r["perplexity"]), float(r["eval_time"])) for r in rows if r["status"] == "ok"]
 
     # Print comparison
     if len(results) == 2:
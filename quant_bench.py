@@ -0,0 +1,519 @@
+#!/usr/bin/env python3
+"""
+quant_bench.py
+
+Quant-quality benchmark harness shared by perp_test.py and perp_test_2_files.py.
+
+- Quantize and evaluation jobs run as a small DAG (an eval waits for its
+  quantize job); up to --jobs run at once and the --threads budget is split
+  between them.
+- Quantized files are reused when a file with the same key already exists. The
+  key covers the source model fingerprint, the quant config, the imatrix hash,
+  the quant_rules.json hash and the llama.cpp commit of --bin-dir.
+- Configs come from the same quant_configs_*.json files make_files.py uses;
+  with --rules the per-tensor arguments come from tensor_list_builder exactly as
+  in make_files.quantize_with_fallback, so rule changes can be checked for
+  regressions.
+- llama-perplexity output is parsed into one results table (perplexity, tokens/s,
+  file size, timings) written as CSV.
+- With --kld the source model is run once with --kl-divergence-base to save its
+  logits (cached next to the quants), and every quant is then scored against
+  that file in parallel: mean KLD, top-1 agreement ("same top p") and delta PPL.
+- Each row is also recorded in the quantization results database
+  (model-converter/quant_results.py) with the tensor plan hash, the llama.cpp
+  commit and the quantize peak RSS, so builds can be compared over time.
+
+Usage:
+  python quant_bench.py --model Meta-Llama-3-8B-bf16.gguf \
+      --configs model-converter/quant_configs_min.json \
+      --rules model-converter/quant_rules.json \
+      --imatrix imatrix-files/Meta-Llama-3-8B-imatrix.gguf [--kld]
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import shlex
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "model-converter"))
+from imatrix_tools import file_hash, model_fingerprint
+from quant_results import DEFAULT_DB, run_measured, record_run, tensor_plan_hash, llama_commit
+
+BIN_DIR = Path(os.getenv("LLAMA_BIN_DIR", "../models/llama.cpp"))
+TEST_TEXT = Path("./perplexity_test_data.txt")
+CTX_SIZE = 256
+PPL_STRIDE = 32
+CHUNKS = 1
+
+RESULT_FIELDS = [
+    "name", "type", "embed_type", "output_type", "imatrix", "model", "size_mb",
+    "perplexity", "perplexity_err", "tokens_per_s", "mean_kld", "top1_agreement", "delta_ppl",
+    "quant_time", "peak_rss_mb", "tensor_plan_hash", "eval_time", "cached", "status",
+]
+BASE_TASK = "kld-base"
+
+
+def load_quant_configs(path, names=None):
+    """Read a quant_configs_*.json file, optionally keeping only the given config names."""
+    with open(path, "r") as f:
+        configs = json.load(f)
+    if names:
+        wanted = set(names)
+        configs = [c for c in configs if c["name"] in wanted]
+    return configs
+
+
+def default_threads():
+    return os.cpu_count() or 4
+
+
+def extract_perplexity(output):
+    """
+    Parse the final perplexity from llama-perplexity output.
+
+    Returns:
+        tuple: (perplexity, error estimate) as strings, or (None, None).
+    """
+    if match := re.search(r'Final estimate: PPL = (\d+\.\d+)(?: \+/- (\d+\.\d+))?', output):
+        return match.group(1), match.group(2)
+    lines = output.split('\n')
+    for i, line in enumerate(lines):
+        if "ETA" in line and i + 1 < len(lines):
+            if match := re.match(r'^\d+\s+(\d+\.\d+)$', lines[i + 1].strip()):
+                return match.group(1), None
+    if match := re.search(r'Perplexity:\s*(\d+\.\d+)', output):
+        return match.group(1), None
+    # Per-chunk progress "[1]6.1234,[2]..." - take the last one
+    chunks = re.findall(r'\[\d+\](\d+\.\d+)', output)
+    if chunks:
+        return chunks[-1], None
+    return None, None
+
+
+def extract_tokens_per_second(output):
+    """Prompt-eval throughput reported by llama.cpp's perf summary."""
+    match = re.search(r'prompt eval time\s*=.*?([\d.]+) tokens per second', output)
+    return match.group(1) if match else None
+
+
+def extract_kld_stats(output):
+    """
+    Parse the statistics llama-perplexity prints in --kl-divergence mode.
+
+    Returns:
+        dict: perplexity, mean_kld, top1_agreement (percent) and delta_ppl, as
+            strings; keys whose line is missing are left out.
+    """
+    patterns = {
+        "perplexity": r'Mean PPL\(Q\)\s*:\s*(-?\d+\.\d+)',
+        "delta_ppl": r'Mean PPL\(Q\)-PPL\(base\)\s*:\s*(-?\d+\.\d+)',
+        "mean_kld": r'Mean\s+KLD:\s*(-?\d+\.\d+)',
+        "top1_agreement": r'Same top p:\s*(\d+\.\d+)',
+    }
+    stats = {}
+    for key, pattern in patterns.items():
+        if match := re.search(pattern, output):
+            stats[key] = match.group(1)
+    return stats
+
+
+def run_command(cmd, log_file=None):
+    """Run command with logging and timing. Returns (combined output, seconds, success, peak RSS in MB)."""
+    result, duration, peak_rss_mb = run_measured(cmd)
+    stdout = result.stdout.decode("utf-8", errors="replace")
+    stderr = result.stderr.decode("utf-8", errors="replace")
+    success = result.returncode == 0
+    if log_file:
+        with open(log_file, 'a') as f:
+            f.write(f"=== {'Command' if success else 'FAILED Command'}: {' '.join(cmd)} ===\n")
+            f.write(stdout)
+            if stderr:
+                f.write("\n=== Errors ===\n")
+                f.write(stderr)
+            f.write(f"\n=== {'Completed in' if success else 'Failed after'} {duration:.2f}s ===\n\n")
+    # llama.cpp tools print their results to stderr
+    return stdout + "\n" + stderr, duration, success, peak_rss_mb
+
+
+def run_dag(tasks, deps, jobs):
+    """
+    Run callables with dependencies on a pool of `jobs` workers.
+
+    Args:
+        tasks (dict): name -> callable taking no arguments.
+        deps (dict): name -> list of task names that must succeed first.
+        jobs (int): Maximum tasks running at once.
+
+    Returns:
+        dict: name -> (ok, result or exception). Tasks whose dependency failed are
+            reported as (False, None) without running.
+    """
+    results, running = {}, {}
+    pending = dict(tasks)
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while pending or running:
+            for name in list(pending):
+                needed = deps.get(name, [])
+                if any(d in results and not results[d][0] for d in needed):
+                    results[name] = (False, None)
+                    del pending[name]
+                elif all(d in results for d in needed):
+                    running[pool.submit(pending.pop(name))] = name
+            if not running:
+                # Whatever is left depends on unknown tasks
+                for name in pending:
+                    results[name] = (False, None)
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = (True, future.result())
+                except Exception as e:
+                    print(f"[X] {name} failed: {e}")
+                    results[name] = (False, e)
+    return results
+
+
+class QuantBench:
+    def __init__(self, model, out_dir=".", imatrix=None, rules=None, bin_dir=BIN_DIR, test_text=TEST_TEXT,
+                 threads=None, jobs=2, ctx_size=CTX_SIZE, ppl_stride=PPL_STRIDE, chunks=CHUNKS, is_moe=False,
+                 kld=False, results_db=None):
+        self.model = Path(model)
+        self.out_dir = Path(out_dir)
+        self.imatrix = Path(imatrix) if imatrix else None
+        self.rules = Path(rules) if rules else None
+        self.bin_dir = Path(bin_dir)
+        self.test_text = Path(test_text)
+        self.jobs = max(1, jobs)
+        self.threads = threads or default_threads()
+        # Each concurrent job gets an equal share of the thread budget
+        self.threads_per_job = max(1, self.threads // self.jobs)
+        self.ctx_size = ctx_size
+        self.ppl_stride = ppl_stride
+        self.chunks = chunks
+        self.is_moe = is_moe
+        self.kld = kld
+        # Path of the results database rows are recorded in (None = don't record)
+        self.results_db = results_db
+        self._model_key = None
+        self._tensor_args = {}
+
+    # --- quantize ---------------------------------------------------------
+
+    def model_key(self):
+        if self._model_key is None:
+            h = hashlib.sha256(model_fingerprint(str(self.model)).encode())
+            if self.imatrix:
+                h.update(file_hash(str(self.imatrix)).encode())
+            if self.rules:
+                h.update(file_hash(str(self.rules)).encode())
+            # A different llama.cpp build can quantize the same inputs differently
+            h.update((llama_commit(str(self.bin_dir)) or "").encode())
+            self._model_key = h.hexdigest()
+        return self._model_key
+
+    def quant_key(self, config):
+        h = hashlib.sha256(self.model_key().encode())
+        h.update(json.dumps(config, sort_keys=True).encode())
+        return h.hexdigest()[:12]
+
+    def quant_path(self, config):
+        return self.out_dir / f"{self.model.stem}-{config['name']}-{self.quant_key(config)}.gguf"
+
+    def tensor_args(self, config):
+        """Per-tensor overrides from quant_rules.json, as make_files passes them to llama-quantize."""
+        if not self.rules:
+            return []
+        if config["name"] not in self._tensor_args:
+            from tensor_list_builder import process_quantization, precision_override_for
+            self._tensor_args[config["name"]] = shlex.split(process_quantization(
+                gguf_file=str(self.model),
+                quant_rules_file=str(self.rules),
+                target_type=config["type"],
+                is_moe=self.is_moe,
+                precision_override=precision_override_for(config["name"]),
+            ) or "")
+        return self._tensor_args[config["name"]]
+
+    def quantize_command(self, config, output_path):
+        cmd = [str(self.bin_dir / "llama-quantize")]
+        if config.get("use_imatrix") and self.imatrix:
+            cmd.extend(["--imatrix", str(self.imatrix)])
+        if config.get("use_pure"):
+            cmd.append("--pure")
+        if config.get("output_type") and config.get("embed_type"):
+            cmd.extend(["--output-tensor-type", config["output_type"]])
+            cmd.extend(["--token-embedding-type", config["embed_type"]])
+        cmd.extend(self.tensor_args(config))
+        cmd.extend([str(self.model), str(output_path), config["type"], str(self.threads_per_job)])
+        return cmd
+
+    def quantize(self, config):
+        """Quantize one config unless a file with the same key exists. Returns (path, seconds, cached, peak RSS MB)."""
+        output_path = self.quant_path(config)
+        if output_path.exists():
+            print(f"[=] {config['name']}: reusing {output_path.name}")
+            return output_path, 0.0, True, None
+        tmp_path = output_path.with_name(output_path.name + ".tmp")
+        cmd = self.quantize_command(config, tmp_path)
+        print(f"[{time.strftime('%H:%M:%S')}] Quantizing {config['name']}: {' '.join(cmd)}")
+        _, duration, success, peak_rss_mb = run_command(cmd, self.out_dir / f"quantize_{config['name']}.log")
+        if not success or not tmp_path.exists():
+            raise RuntimeError(f"quantization failed for {config['name']}")
+        os.replace(tmp_path, output_path)
+        return output_path, duration, False, peak_rss_mb
+
+    # --- evaluate ---------------------------------------------------------
+
+    def perplexity_command(self, model_path):
+        return [
+            str(self.bin_dir / "llama-perplexity"),
+            "-m", str(model_path),
+            "-f", str(self.test_text),
+            "--ctx-size", str(self.ctx_size),
+            "--ppl-stride", str(self.ppl_stride),
+            "--chunks", str(self.chunks),
+            "--threads", str(self.threads_per_job),
+        ]
+
+    def base_logits_path(self):
+        """Saved source-model logits; keyed by model, text and context so reruns reuse them."""
+        h = hashlib.sha256(self.model_key().encode())
+        h.update(file_hash(str(self.test_text)).encode())
+        h.update(f"{self.ctx_size}:{self.chunks}".encode())
+        return self.out_dir / f"{self.model.stem}-{h.hexdigest()[:12]}.kld-base"
+
+    def compute_base_logits(self):
+        """Run the source model once and save its logits for every later KLD comparison."""
+        logits_path = self.base_logits_path()
+        if logits_path.exists():
+            print(f"[=] Reusing base logits {logits_path.name}")
+            return logits_path
+        tmp_path = logits_path.with_name(logits_path.name + ".tmp")
+        cmd = [
+            str(self.bin_dir / "llama-perplexity"),
+            "-m", str(self.model),
+            "-f", str(self.test_text),
+            "--ctx-size", str(self.ctx_size),
+            "--chunks", str(self.chunks),
+            "--threads", str(self.threads_per_job),
+            "--kl-divergence-base", str(tmp_path),
+        ]
+        print(f"[{time.strftime('%H:%M:%S')}] Saving base logits: {' '.join(cmd)}")
+        output, _, success, _ = run_command(cmd, self.out_dir / "perplexity_kld_base.log")
+        if not success or not tmp_path.exists():
+            print(output[-500:])
+            raise RuntimeError("base logits run failed")
+        os.replace(tmp_path, logits_path)
+        return logits_path
+
+    def evaluate_kld(self, model_path, name):
+        """Score one model against the saved base logits."""
+        cmd = [
+            str(self.bin_dir / "llama-perplexity"),
+            "-m", str(model_path),
+            "--ctx-size", str(self.ctx_size),
+            "--chunks", str(self.chunks),
+            "--threads", str(self.threads_per_job),
+            "--kl-divergence-base", str(self.base_logits_path()),
+            "--kl-divergence",
+        ]
+        print(f"[{time.strftime('%H:%M:%S')}] KLD {name}: {' '.join(cmd)}")
+        output, duration, success, _ = run_command(cmd, self.out_dir / f"kld_{name}.log")
+        stats = extract_kld_stats(output)
+        if not success or "mean_kld" not in stats:
+            print(f"[X] Failed to extract KLD for {name} - last output:")
+            print("=" * 60)
+            print(output[-500:])
+            print("=" * 60)
+            raise RuntimeError(f"KLD run failed for {name}")
+        print(f"[✓] {name}: KLD {stats['mean_kld']}, top-1 {stats.get('top1_agreement', '?')}% (Time: {duration:.2f}s)")
+        return dict(stats,
+                    tokens_per_s=extract_tokens_per_second(output) or "",
+                    eval_time=f"{duration:.2f}",
+                    size_mb=f"{os.path.getsize(model_path) / (1 << 20):.1f}")
+
+    def evaluate(self, model_path, name):
+        """Run llama-perplexity on one model and parse the results."""
+        cmd = self.perplexity_command(model_path)
+        print(f"[{time.strftime('%H:%M:%S')}] Evaluating {name}: {' '.join(cmd)}")
+        output, duration, success, _ = run_command(cmd, self.out_dir / f"perplexity_{name}.log")
+        ppl, ppl_err = extract_perplexity(output)
+        if not success or ppl is None:
+            print(f"[X] Failed to extract perplexity for {name} - last output:")
+            print("=" * 60)
+            print(output[-500:])
+            print("=" * 60)
+            raise RuntimeError(f"perplexity run failed for {name}")
+        print(f"[✓] {name}: perplexity {ppl} (Time: {duration:.2f}s)")
+        return {
+            "perplexity": ppl,
+            "perplexity_err": ppl_err or "",
+            "tokens_per_s": extract_tokens_per_second(output) or "",
+            "eval_time": f"{duration:.2f}",
+            "size_mb": f"{os.path.getsize(model_path) / (1 << 20):.1f}",
+        }
+
+    # --- runs -------------------------------------------------------------
+
+    def run(self, configs):
+        """
+        Quantize and evaluate every config.
+
+        Returns:
+            list: one result row (dict with RESULT_FIELDS) per config, in config order.
+        """
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.model_key()  # hash the inputs once, before the workers need it
+        tasks, deps = {}, {}
+        evaluate = self.evaluate
+        if self.kld:
+            # One base pass; it runs alongside the quantize jobs and every eval waits for it
+            tasks[BASE_TASK] = self.compute_base_logits
+            evaluate = self.evaluate_kld
+        for config in configs:
+            name = config["name"]
+            tasks[f"quantize:{name}"] = lambda c=config: self.quantize(c)
+            tasks[f"eval:{name}"] = lambda c=config: evaluate(self.quant_path(c), c["name"])
+            deps[f"eval:{name}"] = [f"quantize:{name}"] + ([BASE_TASK] if self.kld else [])
+        results = run_dag(tasks, deps, self.jobs)
+
+        rows = []
+        for config in configs:
+            name = config["name"]
+            quant_ok, quant = results[f"quantize:{name}"]
+            eval_ok, evaluation = results[f"eval:{name}"]
+            # A reused quant never built its command, so its plan is computed here
+            plan = self.tensor_args(config) if quant_ok else self._tensor_args.get(name, [])
+            row = {
+                "name": name,
+                "type": config["type"],
+                "embed_type": config.get("embed_type", ""),
+                "output_type": config.get("output_type", ""),
+                "imatrix": bool(config.get("use_imatrix") and self.imatrix),
+                "model": self.quant_path(config).name,
+                "tensor_plan_hash": tensor_plan_hash(plan),
+            }
+            if quant_ok:
+                row["quant_time"] = f"{quant[1]:.2f}"
+                row["cached"] = quant[2]
+                row["peak_rss_mb"] = f"{quant[3]:.1f}" if quant[3] is not None else ""
+            if eval_ok:
+                row.update(evaluation)
+            row["status"] = "ok" if eval_ok else ("eval failed" if quant_ok else "quantize failed")
+            self.record(row, config)
+            rows.append(row)
+        return rows
+
+    def evaluate_models(self, model_paths):
+        """Evaluate existing GGUF files concurrently (no quantization)."""
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        evaluate = self.evaluate_kld if self.kld else self.evaluate
+        tasks = {str(p): (lambda p=Path(p): evaluate(p, p.stem)) for p in model_paths}
+        deps = {}
+        if self.kld:
+            self.model_key()
+            tasks[BASE_TASK] = self.compute_base_logits
+            deps = {str(p): [BASE_TASK] for p in model_paths}
+        results = run_dag(tasks, deps, self.jobs)
+        rows = []
+        for p in model_paths:
+            ok, evaluation = results[str(p)]
+            row = {"name": Path(p).stem, "model": Path(p).name, "status": "ok" if ok else "eval failed"}
+            if ok:
+                row.update(evaluation)
+            self.record(row)
+            rows.append(row)
+        return rows
+
+    def record(self, row, config=None):
+        """Add a result row to the results database. Cached quants carry no timing."""
+        if not self.results_db:
+            return
+
+        def number(field):
+            value = row.get(field)
+            return float(value) if value not in (None, "") else None
+
+        quantized = config is not None and row.get("quant_time") is not None and not row.get("cached")
+        model_path = self.quant_path(config) if config else None
+        record_run(
+            db_path=self.results_db,
+            source="quant_bench",
+            model=self.model.stem if config else row["name"],
+            quant=row["name"] if config else None,
+            quant_type=row.get("type"),
+            config=config,
+            tensor_plan_hash=row.get("tensor_plan_hash"),
+            llama_commit=llama_commit(str(self.bin_dir)),
+            wall_time=number("quant_time") if quantized else None,
+            peak_rss_mb=number("peak_rss_mb") if quantized else None,
+            size_bytes=os.path.getsize(model_path) if model_path and model_path.exists() else None,
+            ppl=number("perplexity"),
+            ppl_err=number("perplexity_err"),
+            kld=number("mean_kld"),
+            top1_agreement=number("top1_agreement"),
+            eval_time=number("eval_time"),
+            status=row["status"],
+        )
+
+
+def write_results(rows, path, fields=RESULT_FIELDS):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def print_results(rows, fields=("name", "size_mb", "perplexity", "tokens_per_s", "status"), kld=False):
+    if kld:
+        fields = ("name", "size_mb", "mean_kld", "top1_agreement", "delta_ppl", "perplexity", "status")
+    widths = {f: max(len(f), *(len(str(r.get(f, ""))) for r in rows)) for f in fields}
+    print("  ".join(f.ljust(widths[f]) for f in fields))
+    for row in rows:
+        print("  ".join(str(row.get(f, "")).ljust(widths[f]) for f in fields))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize a model with several configs and compare quality.")
+    parser.add_argument("--model", required=True, help="Source GGUF (bf16/f16)")
+    parser.add_argument("--configs", required=True, help="quant_configs_*.json file")
+    parser.add_argument("--only", nargs="*", help="Config names to run (default: all)")
+    parser.add_argument("--rules", help="quant_rules.json for per-tensor overrides (as make_files uses)")
+    parser.add_argument("--imatrix", help="imatrix file for configs with use_imatrix")
+    parser.add_argument("--moe", action="store_true", help="Apply MoE rules")
+    parser.add_argument("--out-dir", default="./quant-bench", help="Where quantized files and logs go")
+    parser.add_argument("--bin-dir", default=str(BIN_DIR), help="Directory with llama-quantize and llama-perplexity")
+    parser.add_argument("--test-text", default=str(TEST_TEXT), help="Evaluation text")
+    parser.add_argument("--threads", type=int, default=default_threads(), help="Total thread budget")
+    parser.add_argument("--jobs", type=int, default=2, help="Concurrent quantize/eval jobs")
+    parser.add_argument("--ctx-size", type=int, default=CTX_SIZE)
+    parser.add_argument("--chunks", type=int, default=CHUNKS)
+    parser.add_argument("--kld", action="store_true",
+                        help="Score quants by KL divergence against the source model's saved logits")
+    parser.add_argument("--results", default="./quantization_results.csv", help="CSV results table")
+    parser.add_argument("--db", default=DEFAULT_DB, help="Results database (see model-converter/quant_results.py)")
+    parser.add_argument("--no-db", action="store_true", help="Do not record results in the database")
+    args = parser.parse_args()
+
+    bench = QuantBench(args.model, out_dir=args.out_dir, imatrix=args.imatrix, rules=args.rules,
+                       bin_dir=args.bin_dir, test_text=args.test_text, threads=args.threads, jobs=args.jobs,
+                       ctx_size=args.ctx_size, chunks=args.chunks, is_moe=args.moe, kld=args.kld,
+                       results_db=None if args.no_db else args.db)
+    rows = bench.run(load_quant_configs(args.configs, args.only))
+    write_results(rows, args.results)
+    print()
+    print_results(rows, kld=args.kld)
+    print(f"\nResults saved to {args.results}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+readme_patcher.py
+
+Rule-based README patching across all our repos.
+
+- READMEs are fetched concurrently straight into memory (no hf_hub_download
+  cache files), together with the commit they were read at.
+- Every rule is applied in one pass; only READMEs that actually changed are
+  pushed, each with parent_commit set so a concurrent edit is never clobbered.
+- Pushes run with bounded concurrency and are recorded in a Journal, so an
+  interrupted run resumes with the repos it had not patched yet.
+
+Rules are (pattern, replacement) pairs for plain substring replacement, or
+(pattern, replacement, True) for a regular expression (re.sub syntax). A rules
+file is a JSON list of {"pattern": ..., "replacement": ..., "regex": bool}.
+"""
+
+import hashlib
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from huggingface_hub import HfApi, hf_hub_url
+from huggingface_hub.utils import get_session, build_hf_headers, hf_raise_for_status
+
+README_FILE = "README.md"
+
+
+def compile_rules(rules):
+    """Turn (pattern, replacement[, is_regex]) tuples into (compiled regex, replacement) pairs."""
+    compiled = []
+    for rule in rules:
+        pattern, replacement = rule[0], rule[1]
+        is_regex = len(rule) > 2 and rule[2]
+        if is_regex:
+            compiled.append((re.compile(pattern, re.MULTILINE), replacement))
+        else:
+            # Escape the replacement too so backslashes in plain text stay literal
+            compiled.append((re.compile(re.escape(pattern)), replacement.replace("\\", "\\\\")))
+    return compiled
+
+
+def load_rules_file(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [(r["pattern"], r["replacement"], bool(r.get("regex"))) for r in json.load(f)]
+
+
+def rules_fingerprint(rules):
+    """Short hash of a rule set, used to name its journal."""
+    return hashlib.sha256(json.dumps([list(r) for r in rules]).encode("utf-8")).hexdigest()[:12]
+
+
+def apply_rules(content, compiled_rules):
+    """
+    Apply every rule in order.
+
+    Returns:
+        tuple: (new content, number of replacements made)
+    """
+    total = 0
+    for regex, replacement in compiled_rules:
+        content, count = regex.subn(replacement, content)
+        total += count
+    return content, total
+
+
+class ReadmePatcher:
+    def __init__(self, rules, api=None, token=None, exclude_text=None, fetch_workers=16, push_workers=4,
+                 journal=None):
+        self.api = api or HfApi()
+        self.token = token
+        self.rules = compile_rules(rules)
+        self.exclude_text = exclude_text
+        self.fetch_workers = fetch_workers
+        self.push_workers = push_workers
+        self.journal = journal
+
+    def fetch_readme(self, repo_id):
+        """
+        Download README.md into memory.
+
+        Returns:
+            tuple: (content, commit sha) or (None, None) when the repo has no README.
+        """
+        url = hf_hub_url(repo_id, README_FILE)
+        response = get_session().get(url, headers=build_hf_headers(token=self.token), follow_redirects=True)
+        if response.status_code == 404:
+            return None, None
+        hf_raise_for_status(response)
+        return response.content.decode("utf-8"), response.headers.get("X-Repo-Commit")
+
+    def patch_one(self, repo_id):
+        """Fetch and patch one README. Returns a plan entry, or None if nothing changes."""
+        content, commit = self.fetch_readme(repo_id)
+        if content is None:
+            return None
+        if self.exclude_text and self.exclude_text in content:
+            return None
+        new_content, count = apply_rules(content, self.rules)
+        if new_content == content:
+            return None
+        return {"repo_id": repo_id, "old": content, "new": new_content, "replacements": count,
+                "parent_commit": commit}
+
+    def plan(self, repo_ids):
+        """
+        Fetch and patch READMEs concurrently, skipping repos the journal marks done.
+
+        Returns:
+            tuple: (list of plan entries sorted by repo_id, {repo_id: exception})
+        """
+        if self.journal:
+            repo_ids = [r for r in repo_ids if not self.journal.is_done(r)]
+        entries, errors = [], {}
+        with ThreadPoolExecutor(max_workers=self.fetch_workers) as pool:
+            futures = {pool.submit(self.patch_one, repo_id): repo_id for repo_id in repo_ids}
+            for future in as_completed(futures):
+                repo_id = futures[future]
+                try:
+                    entry = future.result()
+                except Exception as e:
+                    errors[repo_id] = e
+                    continue
+                if entry:
+                    entries.append(entry)
+                elif self.journal:
+                    self.journal.record(repo_id, "unchanged")
+        return sorted(entries, key=lambda e: e["repo_id"]), errors
+
+    def push_one(self, entry, commit_message):
+        self.api.upload_file(
+            path_or_fileobj=entry["new"].encode("utf-8"),
+            path_in_repo=README_FILE,
+            repo_id=entry["repo_id"],
+            token=self.token,
+            commit_message=commit_message,
+            parent_commit=entry["parent_commit"],
+        )
+
+    def push(self, entries, commit_message="Update README.md"):
+        """
+        Upload the patched READMEs with bounded concurrency.
+
+        Returns:
+            tuple: (number pushed, {repo_id: exception})
+        """
+        pushed, errors = 0, {}
+        with ThreadPoolExecutor(max_workers=self.push_workers) as pool:
+            futures = {pool.submit(self.push_one, entry, commit_message): entry for entry in entries}
+            for future in as_completed(futures):
+                repo_id = futures[future]["repo_id"]
+                try:
+                    future.result()
+                except Exception as e:
+                    errors[repo_id] = e
+                    print(f"❌ Error updating {repo_id}: {str(e)}")
+                    if self.journal:
+                        self.journal.record(repo_id, "failed", error=str(e))
+                    continue
+                pushed += 1
+                print(f"✓ Updated {repo_id} ({futures[future]['replacements']} replacement(s))")
+                if self.journal:
+                    self.journal.record(repo_id, "patched")
+        return pushed, errors
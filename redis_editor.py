@@ -279,7 +279,7 @@ def edit_model(catalog, model_id):
             current_data = catalog.get_model(model_id)
             if current_data:
                 current_data[field] = converted_value
-                catalog.r.hset(catalog.catalog_key, model_id, json.dumps(current_data))
+                catalog.save_model(model_id, current_data)
                 model_data[field] = converted_value
                 print("\nField updated successfully!")
                 display_current_data()
@@ -296,7 +296,7 @@ def delete_model(catalog, model_id):
         print("Deletion cancelled")
         return
     
-    if catalog.r.hdel(catalog.catalog_key, model_id):
+    if catalog.delete_model(model_id):
         print("Model deleted successfully")
     else:
         print("Model not found or deletion failed")
@@ -1,5 +1,4 @@
 from model_converter import ModelConverter
-import json
 
 def migrate_schema():
     converter = ModelConverter()
@@ -19,11 +18,7 @@ def migrate_schema():
             else:
                 # Fallback method
                 try:
-                    converter.model_catalog.r.hset(
-                        converter.model_catalog.catalog_key,
-                        model_id,
-                        json.dumps(model_data)
-                    )
+                    converter.model_catalog.save_model(model_id, model_data)
                     migrated += 1
                 except Exception as e:
                     print(f"Failed to migrate {model_id}: {str(e)}")
@@ -1,13 +1,107 @@
+import gzip
+import io
 import json
 import logging
 import time
+import uuid
 from datetime import datetime
-from typing import Dict, Optional, Any
+from typing import Dict, Iterator, Optional, Any, Tuple
 import redis
 from redis.exceptions import WatchError, RedisError
 
+try:
+    import zstandard
+except ImportError:  # zstd exports are optional
+    zstandard = None
+
+# File suffixes that select the streaming NDJSON format in backup/restore
+NDJSON_SUFFIXES = (".ndjson", ".jsonl")
+COMPRESSION_SUFFIXES = (".gz", ".zst")
+
+
+def _split_compression(file_path: str) -> Tuple[str, Optional[str]]:
+    """Return (path without compression suffix, compression name or None)."""
+    for suffix in COMPRESSION_SUFFIXES:
+        if file_path.endswith(suffix):
+            return file_path[: -len(suffix)], suffix.lstrip(".")
+    return file_path, None
+
+
+def is_ndjson_path(file_path: str) -> bool:
+    """True if file_path names an NDJSON catalog dump (optionally .gz/.zst compressed)."""
+    base, _ = _split_compression(str(file_path))
+    return base.endswith(NDJSON_SUFFIXES)
+
+
+def open_catalog_file(file_path: str, mode: str = "r"):
+    """
+    Open a catalog dump in text mode, transparently handling .gz and .zst.
+
+    Args:
+        file_path: Path to the dump file
+        mode: "r" or "w"
+    """
+    _, compression = _split_compression(str(file_path))
+    if compression == "gz":
+        return gzip.open(file_path, mode + "t", encoding="utf-8")
+    if compression == "zst":
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed; cannot handle .zst catalog files")
+        raw = open(file_path, mode + "b")
+        if mode == "w":
+            stream = zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        else:
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return open(file_path, mode, encoding="utf-8")
+
+def _as_bool(value: Any) -> bool:
+    """Interpret catalog flags that may have been stored as bools, numbers or strings."""
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "1", "yes")
+    return bool(value)
+
+
+def _as_score(value: Any) -> Optional[float]:
+    """
+    Convert a catalog value into a sorted-set score.
+
+    Numbers are used as-is, ISO dates become POSIX timestamps and anything
+    unparseable (None, "", garbage) returns None so the entry is left out.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = value.strip()
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            return None
+    return None
+
+
 class RedisModelCatalog:
-    def __init__(self, host: str, port: int, password: str, user: str, ssl: bool = True):
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        password: str,
+        user: str,
+        ssl: bool = True,
+        max_connections: Optional[int] = None,
+        health_check_interval: int = 0,
+        pool_timeout: float = 20
+    ):
         """
         Initialize Redis connection for model catalog operations.
         
@@ -17,24 +111,60 @@ class RedisModelCatalog:
             password: Redis password
             user: Redis user
             ssl: Whether to use SSL/TLS
+            max_connections: Size cap of the client's connection pool (None = unbounded).
+                A capped pool blocks callers for a free connection instead of raising.
+            health_check_interval: Seconds a pooled connection may sit idle before it
+                is PINGed on checkout (0 disables); useful for long-lived shared clients
+            pool_timeout: Seconds a caller waits for a free connection of a capped pool
         """
-        self.r = redis.Redis(
+        connection_kwargs = dict(
             host=host,
             port=port,
             password=password,
             username=user,
-            ssl=ssl,
-            ssl_cert_reqs='none',  # Disable cert verification for testing
-            ssl_check_hostname=False,  # <-- Add this line to fix the error
             decode_responses=True,
             retry_on_timeout=True,
-            socket_keepalive=True
+            socket_keepalive=True,
+            health_check_interval=health_check_interval
         )
+        if ssl:
+            connection_kwargs.update(
+                ssl_cert_reqs='none',  # Disable cert verification for testing
+                ssl_check_hostname=False
+            )
+        if max_connections:
+            # A plain ConnectionPool raises MaxConnectionsError once the cap is reached
+            pool = redis.BlockingConnectionPool(
+                max_connections=max_connections,
+                timeout=pool_timeout,
+                connection_class=redis.SSLConnection if ssl else redis.Connection,
+                **connection_kwargs
+            )
+            self.r = redis.Redis(connection_pool=pool)
+        else:
+            self.r = redis.Redis(ssl=ssl, **connection_kwargs)
         self.catalog_key = "model:catalog"
         self.converting_key = "model:converting"
         self.converting_progress_key = "model:converting:progress"
         self.converting_failed_key = "model:converting:failed"
         self.max_retries = 3
+        # Page size for HSCAN and batch size for pipelined restores
+        self.scan_page_size = 500
+        self.restore_batch_size = 500
+        # Secondary indexes, maintained on every write through this class
+        self.index_prefix = "model:catalog:idx:"
+        self.index_all_key = self.index_prefix + "all"
+        # Same members as index_all_key, all with score 0, so ZRANGE returns them by id
+        self.index_ids_key = self.index_prefix + "ids"
+        # Values indexed for fields a model does not have (the converter treats
+        # a missing attempts count as 0)
+        self.index_defaults = {"attempts": 0}
+        self.set_indexes = ("converted", "unconverted", "is_moe", "has_config")
+        self.sorted_indexes = ("parameters", "attempts", "added", "last_attempt")
+        # Capped stream of catalog change events ({"id": model_id, "op": set|del|reset})
+        # so caches such as the editor's search index can update incrementally
+        self.changes_key = "model:catalog:changes"
+        self.changes_maxlen = 10000
 
     def is_converting(self, model_id: str) -> bool:
         """Check if a model is currently being converted."""
@@ -80,6 +210,234 @@ class RedisModelCatalog:
     def get_quant_progress(self, model_id: str) -> str:
         """Get the current quantization step for a model."""
         return self.r.hget(self.converting_progress_key, model_id)
+    def index_key(self, name: str, prefix: Optional[str] = None) -> str:
+        """Redis key of the secondary index called name."""
+        return (prefix or self.index_prefix) + name
+
+    def missing_key(self, field: str, prefix: Optional[str] = None) -> str:
+        """Redis key of the set of models with no usable value for a sorted-index field."""
+        return (prefix or self.index_prefix) + field + ":missing"
+
+    def _publish_change(self, pipe, model_id: str, op: str):
+        """Queue a change event on the catalog changes stream."""
+        pipe.xadd(self.changes_key, {"id": model_id, "op": op},
+                  maxlen=self.changes_maxlen, approximate=True)
+
+    def _index_model(self, pipe, model_id: str, data: Any, publish: bool = True, prefix: Optional[str] = None):
+        """
+        Queue the commands that bring every secondary index up to date for model_id.
+
+        Entries that are not a JSON object (undecodable or e.g. null) only go into
+        the all/ids indexes and the :missing sets, so they never match a flag or
+        range filter but the index still covers every catalog entry.
+        """
+        if publish:
+            self._publish_change(pipe, model_id, "set")
+        pipe.sadd(self.index_key("all", prefix), model_id)
+        pipe.zadd(self.index_key("ids", prefix), {model_id: 0})
+        if not isinstance(data, dict):
+            for name in self.set_indexes:
+                pipe.srem(self.index_key(name, prefix), model_id)
+            for field in self.sorted_indexes:
+                pipe.zrem(self.index_key(field, prefix), model_id)
+                pipe.sadd(self.missing_key(field, prefix), model_id)
+            return
+        converted = _as_bool(data.get("converted", False))
+        pipe.sadd(self.index_key("converted" if converted else "unconverted", prefix), model_id)
+        pipe.srem(self.index_key("unconverted" if converted else "converted", prefix), model_id)
+        for flag in ("is_moe", "has_config"):
+            if _as_bool(data.get(flag, False)):
+                pipe.sadd(self.index_key(flag, prefix), model_id)
+            else:
+                pipe.srem(self.index_key(flag, prefix), model_id)
+        for field in self.sorted_indexes:
+            score = _as_score(data.get(field, self.index_defaults.get(field)))
+            if score is None:
+                pipe.zrem(self.index_key(field, prefix), model_id)
+                pipe.sadd(self.missing_key(field, prefix), model_id)
+            else:
+                pipe.zadd(self.index_key(field, prefix), {model_id: score})
+                pipe.srem(self.missing_key(field, prefix), model_id)
+
+    def _unindex_model(self, pipe, model_id: str):
+        """Queue the commands that drop model_id from every secondary index."""
+        self._publish_change(pipe, model_id, "del")
+        pipe.srem(self.index_all_key, model_id)
+        pipe.zrem(self.index_ids_key, model_id)
+        for name in self.set_indexes:
+            pipe.srem(self.index_key(name), model_id)
+        for field in self.sorted_indexes:
+            pipe.zrem(self.index_key(field), model_id)
+            pipe.srem(self.missing_key(field), model_id)
+
+    def _index_keys(self, prefix: Optional[str] = None) -> list:
+        return ([self.index_key(n, prefix) for n in ("all", "ids") + self.set_indexes + self.sorted_indexes]
+                + [self.missing_key(f, prefix) for f in self.sorted_indexes])
+
+    def drop_indexes(self):
+        """Delete every secondary index key and tell change listeners to reload."""
+        with self.r.pipeline() as pipe:
+            pipe.delete(*self._index_keys())
+            self._publish_change(pipe, "*", "reset")
+            pipe.execute()
+
+    def rebuild_indexes(self, page_size: Optional[int] = None) -> int:
+        """
+        Rebuild all secondary indexes from the catalog hash.
+
+        Needed once for catalogs written before indexes existed, or after the
+        hash was edited without going through this class. The new indexes are
+        built under temporary keys and swapped in with RENAME in one
+        transaction, so concurrent queries see either the old or the new
+        indexes, never empty ones.
+
+        Returns:
+            int: Number of models indexed
+        """
+        build_prefix = f"{self.index_prefix}build:{uuid.uuid4().hex}:"
+        count = 0
+        try:
+            with self.r.pipeline(transaction=False) as pipe:
+                for model_id, model_json in self.iter_catalog(page_size):
+                    try:
+                        data = json.loads(model_json)
+                    except json.JSONDecodeError as e:
+                        logging.error(f"Not indexing fields of {model_id}: {e}")
+                        data = None
+                    self._index_model(pipe, model_id, data, publish=False, prefix=build_prefix)
+                    count += 1
+                    if count % self.restore_batch_size == 0:
+                        pipe.execute()
+                pipe.execute()
+
+            live_keys, build_keys = self._index_keys(), self._index_keys(build_prefix)
+            with self.r.pipeline(transaction=False) as pipe:
+                for key in build_keys:
+                    pipe.exists(key)
+                built = pipe.execute()
+            with self.r.pipeline() as pipe:
+                for live, build, exists in zip(live_keys, build_keys, built):
+                    if exists:
+                        pipe.rename(build, live)
+                    else:
+                        pipe.delete(live)
+                self._publish_change(pipe, "*", "reset")
+                pipe.execute()
+        finally:
+            # Leftovers only exist if the build failed part way
+            self.r.delete(*self._index_keys(build_prefix))
+        return count
+
+    def ensure_indexes(self):
+        """Rebuild the indexes if they do not cover the same models as the catalog hash."""
+        with self.r.pipeline(transaction=False) as pipe:
+            pipe.hlen(self.catalog_key)
+            pipe.scard(self.index_all_key)
+            pipe.zcard(self.index_ids_key)
+            total, indexed, ordered = pipe.execute()
+        if not total == indexed == ordered:
+            logging.info(f"Catalog has {total} models but {indexed} are indexed; rebuilding indexes")
+            self.rebuild_indexes()
+
+    def find(
+        self,
+        converted: Optional[bool] = None,
+        is_moe: Optional[bool] = None,
+        has_config: Optional[bool] = None,
+        failed: Optional[bool] = None,
+        parameters_known: Optional[bool] = None,
+        **ranges: Any
+    ) -> list:
+        """
+        Query the catalog through its secondary indexes.
+
+        All filtering happens in Redis as set/sorted-set intersections in a
+        single transaction; no model JSON is fetched or decoded.
+
+        Args:
+            converted, is_moe, has_config: Match the boolean flag when not None
+            failed: Match membership of the converting:failed set when not None
+            parameters_known: True for models with a positive/real parameter count,
+                False for models whose parameters are missing, 0 or -1
+            **ranges: <field>_<op>=value with field one of parameters, attempts,
+                added, last_attempt and op one of lt, lte, gt, gte. Dates may be
+                datetimes or ISO strings, e.g. find(converted=False,
+                parameters_lt=33e9, attempts_lt=3)
+
+        Returns:
+            list: Matching model IDs
+        """
+        bounds = {}
+        for key, value in ranges.items():
+            field, _, op = key.rpartition("_")
+            if field not in self.sorted_indexes or op not in ("lt", "lte", "gt", "gte"):
+                raise ValueError(f"Unsupported filter: {key}")
+            score = _as_score(value)
+            if score is None:
+                raise ValueError(f"Invalid value for {key}: {value!r}")
+            lo, hi = bounds.get(field, ("-inf", "+inf"))
+            if op == "gt":
+                lo = f"({score}"
+            elif op == "gte":
+                lo = str(score)
+            elif op == "lt":
+                hi = f"({score}"
+            else:
+                hi = str(score)
+            bounds[field] = (lo, hi)
+
+        self.ensure_indexes()
+        tmp_prefix = f"{self.index_prefix}tmp:{uuid.uuid4().hex}:"
+        keys, temps = [], []
+
+        def _complement_of(name, source_key):
+            tmp = tmp_prefix + name
+            pipe.sdiffstore(tmp, [self.index_all_key, source_key])
+            temps.append(tmp)
+            return tmp
+
+        with self.r.pipeline() as pipe:
+            if converted is not None:
+                keys.append(self.index_key("converted" if converted else "unconverted"))
+            for name, wanted, source_key in (
+                ("is_moe", is_moe, self.index_key("is_moe")),
+                ("has_config", has_config, self.index_key("has_config")),
+                ("failed", failed, self.converting_failed_key),
+            ):
+                if wanted is None:
+                    continue
+                keys.append(source_key if wanted else _complement_of(name, source_key))
+
+            if parameters_known is not None:
+                # Missing parameters score 0 via the weight-0 "all" set, so the
+                # unknown band is exactly [-1, 0]
+                tmp = tmp_prefix + "parameters_known"
+                pipe.zunionstore(tmp, {self.index_all_key: 0, self.index_key("parameters"): 1})
+                if parameters_known:
+                    pipe.zremrangebyscore(tmp, -1, 0)
+                else:
+                    pipe.zremrangebyscore(tmp, "-inf", "(-1")
+                    pipe.zremrangebyscore(tmp, "(0", "+inf")
+                temps.append(tmp)
+                keys.append(tmp)
+
+            for field, (lo, hi) in bounds.items():
+                tmp = tmp_prefix + field
+                pipe.zunionstore(tmp, [self.index_key(field)])
+                # Trim everything outside [lo, hi]; flipping exclusivity gives the complement
+                if lo != "-inf":
+                    pipe.zremrangebyscore(tmp, "-inf", lo[1:] if lo.startswith("(") else f"({lo}")
+                if hi != "+inf":
+                    pipe.zremrangebyscore(tmp, hi[1:] if hi.startswith("(") else f"({hi}", "+inf")
+                temps.append(tmp)
+                keys.append(tmp)
+
+            result_key = tmp_prefix + "result"
+            pipe.zinterstore(result_key, keys or [self.index_all_key])
+            pipe.zrange(result_key, 0, -1)
+            pipe.delete(result_key, *temps)
+            return pipe.execute()[-2]
+
     def _safe_operation(self, operation, *args, **kwargs):
         """Helper for retrying failed operations."""
         for attempt in range(self.max_retries):
@@ -105,6 +463,80 @@ class RedisModelCatalog:
         model_json = self.r.hget(self.catalog_key, model_id)
         return json.loads(model_json) if model_json else None
 
+    def get_models(self, model_ids: list) -> Dict[str, Dict[str, Any]]:
+        """Get several model entries with a single HMGET, skipping missing ones."""
+        if not model_ids:
+            return {}
+        values = self.r.hmget(self.catalog_key, model_ids)
+        return {mid: json.loads(v) for mid, v in zip(model_ids, values) if v}
+
+    def existing_models(self, model_ids: list) -> set:
+        """Ids among model_ids that have a catalog entry (one HMGET, nothing decoded)."""
+        if not model_ids:
+            return set()
+        values = self.r.hmget(self.catalog_key, model_ids)
+        return {mid for mid, v in zip(model_ids, values) if v is not None}
+
+    # One page of a sorted index plus the models' JSON in a single round trip.
+    # Models with a value for the field come first in score order, then models
+    # without one (the field's :missing set) in id order.
+    _LIST_PAGE_SCRIPT = """
+    local start = tonumber(ARGV[1])
+    local count = tonumber(ARGV[2])
+    local present = redis.call('ZCARD', KEYS[2])
+    local missing = redis.call('SCARD', KEYS[3])
+    local ids = {}
+    if count > 0 and start < present then
+        local stop = math.min(start + count, present) - 1
+        if ARGV[3] == '1' then
+            ids = redis.call('ZREVRANGE', KEYS[2], start, stop)
+        else
+            ids = redis.call('ZRANGE', KEYS[2], start, stop)
+        end
+    end
+    local remaining = count - #ids
+    if remaining > 0 and missing > 0 then
+        local offset = math.max(start - present, 0)
+        local more = redis.call('SORT', KEYS[3], 'LIMIT', offset, remaining, 'ALPHA')
+        for _, id in ipairs(more) do ids[#ids + 1] = id end
+    end
+    local out = {present + missing}
+    for _, id in ipairs(ids) do
+        out[#out + 1] = id
+        out[#out + 1] = redis.call('HGET', KEYS[1], id)
+    end
+    return out
+    """
+
+    def list_page(self, order_by: str = "id", desc: bool = False, start: int = 0, count: int = 10) -> Tuple[int, list]:
+        """
+        Fetch one page of the catalog in global sorted order with a single EVALSHA.
+
+        The indexes are not checked here; callers serving many pages should
+        run ensure_indexes() once when they connect.
+
+        Args:
+            order_by: "id" or one of the sorted indexes (parameters, attempts, added, last_attempt)
+            desc: Sort descending
+            start: Offset of the first model
+            count: Page size
+
+        Returns:
+            tuple: (total number of models, [(model_id, model_dict), ...])
+        """
+        if order_by == "id":
+            keys = [self.catalog_key, self.index_ids_key, self.index_prefix + "none"]
+        elif order_by in self.sorted_indexes:
+            keys = [self.catalog_key, self.index_key(order_by), self.missing_key(order_by)]
+        else:
+            raise ValueError(f"Cannot order by {order_by!r}; use 'id' or one of {self.sorted_indexes}")
+        if not hasattr(self, "_list_page_script"):
+            self._list_page_script = self.r.register_script(self._LIST_PAGE_SCRIPT)
+        reply = self._list_page_script(keys=keys, args=[max(start, 0), max(count, 0), "1" if desc else "0"])
+        total, flat = reply[0], reply[1:]
+        models = [(flat[i], json.loads(flat[i + 1]) if flat[i + 1] else {}) for i in range(0, len(flat), 2)]
+        return total, models
+
     def add_model(self, model_id: str, model_info: Dict[str, Any]) -> bool:
         """
         Add a new model to the catalog atomically.
@@ -126,6 +558,7 @@ class RedisModelCatalog:
                         
                         pipe.multi()
                         pipe.hset(self.catalog_key, model_id, json.dumps(model_info))
+                        self._index_model(pipe, model_id, model_info)
                         return pipe.execute()[0]
                     except WatchError:
                         continue
@@ -181,6 +614,7 @@ class RedisModelCatalog:
                         model[field] = desired_value
                         pipe.multi()
                         pipe.hset(self.catalog_key, model_id, json.dumps(model))
+                        self._index_model(pipe, model_id, model)
                         pipe.execute()  # We don't actually care about the 0/1 response
                         return True
                         
@@ -195,9 +629,26 @@ class RedisModelCatalog:
         print(f"Operation {'succeeded' if success else 'failed'}\n")
         return success
 
+    def save_model(self, model_id: str, model_info: Dict[str, Any]) -> bool:
+        """Write a whole model entry (insert or overwrite), keeping the indexes in step."""
+        def _save_operation():
+            with self.r.pipeline() as pipe:
+                pipe.hset(self.catalog_key, model_id, json.dumps(model_info))
+                self._index_model(pipe, model_id, model_info)
+                pipe.execute()
+                return True
+
+        return self._safe_operation(_save_operation) or False
+
     def delete_model(self, model_id: str) -> bool:
         """Delete a model from the catalog."""
-        return self._safe_operation(lambda: self.r.hdel(self.catalog_key, model_id)) == 1
+        def _delete_operation():
+            with self.r.pipeline() as pipe:
+                pipe.hdel(self.catalog_key, model_id)
+                self._unindex_model(pipe, model_id)
+                return pipe.execute()[0]
+
+        return self._safe_operation(_delete_operation) == 1
 
     def increment_counter(self, model_id: str, field: str) -> bool:
         """Atomically increment a counter field."""
@@ -205,11 +656,76 @@ class RedisModelCatalog:
             lambda: self.r.hincrby(self.catalog_key, f"{model_id}:{field}", 1)
         )
 
+    def iter_catalog(self, page_size: Optional[int] = None) -> Iterator[Tuple[str, str]]:
+        """
+        Iterate over the catalog with HSCAN, yielding (model_id, raw_json) pairs.
+
+        Only one page of entries is held in memory at a time.
+        """
+        return self.r.hscan_iter(self.catalog_key, count=page_size or self.scan_page_size)
+
+    def backup_to_ndjson(self, file_path: str, page_size: Optional[int] = None) -> int:
+        """
+        Stream the catalog to an NDJSON file, one {"id": ..., "data": ...} object per line.
+
+        A .gz or .zst suffix on file_path enables compression.
+
+        Returns:
+            int: Number of models written
+        """
+        count = 0
+        with open_catalog_file(file_path, "w") as f:
+            for model_id, model_json in self.iter_catalog(page_size):
+                # Values are already JSON, so splice them in rather than decode/encode
+                f.write('{"id": ' + json.dumps(model_id) + ', "data": ' + model_json + '}\n')
+                count += 1
+        return count
+
+    def restore_from_ndjson(self, file_path: str, batch_size: Optional[int] = None) -> int:
+        """
+        Stream an NDJSON dump back into the catalog, flushing the pipeline every batch_size entries.
+
+        Returns:
+            int: Number of models restored
+        """
+        batch_size = batch_size or self.restore_batch_size
+        count = 0
+        with open_catalog_file(file_path, "r") as f, self.r.pipeline(transaction=False) as pipe:
+            pending = 0
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                    model_id, data = record["id"], record["data"]
+                except (json.JSONDecodeError, KeyError, TypeError) as e:
+                    raise ValueError(f"{file_path}:{line_no}: invalid catalog record: {e}")
+                pipe.hset(self.catalog_key, model_id, json.dumps(data))
+                self._index_model(pipe, model_id, data, publish=False)
+                pending += 1
+                count += 1
+                if pending >= batch_size:
+                    pipe.execute()
+                    pending = 0
+            # One reset event instead of one event per restored model
+            self._publish_change(pipe, "*", "reset")
+            pipe.execute()
+        return count
+
     def backup_to_file(self, file_path: str) -> bool:
-        """Create a backup of the catalog to JSON file."""
+        """
+        Create a backup of the catalog.
+
+        .ndjson/.jsonl paths (optionally .gz/.zst) are streamed with HSCAN;
+        anything else is written as the legacy single JSON object.
+        """
         try:
+            if is_ndjson_path(file_path):
+                self.backup_to_ndjson(file_path)
+                return True
             catalog = self.load_catalog()
-            with open(file_path, 'w') as f:
+            with open_catalog_file(file_path, 'w') as f:
                 json.dump(catalog, f, indent=2)
             return True
         except Exception as e:
@@ -217,14 +733,27 @@ class RedisModelCatalog:
             return False
 
     def initialize_from_file(self, file_path: str) -> bool:
-        """Initialize Redis catalog from JSON file."""
+        """
+        Initialize Redis catalog from a backup file.
+
+        NDJSON dumps are streamed in fixed-size pipeline batches; legacy JSON
+        objects are loaded whole and written in the same batches.
+        """
         try:
-            with open(file_path) as f:
+            if is_ndjson_path(file_path):
+                self.restore_from_ndjson(file_path)
+                return True
+
+            with open_catalog_file(file_path) as f:
                 catalog = json.load(f)
-            
-            with self.r.pipeline() as pipe:
-                for model_id, data in catalog.items():
+
+            with self.r.pipeline(transaction=False) as pipe:
+                for idx, (model_id, data) in enumerate(catalog.items(), 1):
                     pipe.hset(self.catalog_key, model_id, json.dumps(data))
+                    self._index_model(pipe, model_id, data, publish=False)
+                    if idx % self.restore_batch_size == 0:
+                        pipe.execute()
+                self._publish_change(pipe, "*", "reset")
                 pipe.execute()
             return True
         except Exception as e:
@@ -281,10 +810,12 @@ class RedisModelCatalog:
                         
                         # Update Redis in one operation
                         pipe.multi()
-                        pipe.delete(self.catalog_key)
+                        pipe.delete(self.catalog_key, *self._index_keys())
+                        self._publish_change(pipe, "*", "reset")
                         if current_catalog:
                             for model_id, model_data in current_catalog.items():
                                 pipe.hset(self.catalog_key, model_id, json.dumps(model_data))
+                                self._index_model(pipe, model_id, model_data, publish=False)
                         pipe.execute()
                         break
                     except WatchError:
@@ -296,10 +827,15 @@ class RedisModelCatalog:
 # Singleton instance (configure in your main script)
 model_catalog = None
 
-def init_redis_catalog(host: str, port: int, password: str, user: str , ssl: bool = True):
-    """Initialize the global Redis catalog instance."""
+def init_redis_catalog(host: str, port: int, password: str, user: str , ssl: bool = True, **pool_options):
+    """
+    Initialize the global Redis catalog instance.
+
+    pool_options (max_connections, health_check_interval, pool_timeout) are passed through
+    to RedisModelCatalog for long-lived shared clients.
+    """
     global model_catalog
-    model_catalog = RedisModelCatalog(host, port, password, user,  ssl)
+    model_catalog = RedisModelCatalog(host, port, password, user,  ssl, **pool_options)
     return model_catalog
 
 if __name__ == "__main__":
@@ -351,11 +887,11 @@ if __name__ == "__main__":
     inc_parser.add_argument("--field", required=True)
 
     # Backup to file command
-    backup_parser = subparsers.add_parser("backup_to_file", help="Backup catalog to a JSON file")
+    backup_parser = subparsers.add_parser("backup_to_file", help="Backup catalog to a JSON or NDJSON(.gz/.zst) file")
     backup_parser.add_argument("--file_path", required=True)
 
     # Initialize from file command
-    init_parser = subparsers.add_parser("initialize_from_file", help="Initialize catalog from a JSON file")
+    init_parser = subparsers.add_parser("initialize_from_file", help="Initialize catalog from a JSON or NDJSON(.gz/.zst) file")
     init_parser.add_argument("--file_path", required=True)
 
     # Import models from list command
@@ -363,6 +899,12 @@ if __name__ == "__main__":
     import_parser.add_argument("--model_ids", required=True, help="Comma-separated list of model IDs")
     import_parser.add_argument("--defaults", help="JSON string of default values", default=None)
 
+    # Secondary index commands
+    subparsers.add_parser("rebuild_indexes", help="Rebuild the catalog's secondary indexes")
+    find_parser = subparsers.add_parser("find", help="Query the catalog through its secondary indexes")
+    find_parser.add_argument("--filters", required=True,
+                             help='JSON string of find() keyword arguments, e.g. \'{"converted": false, "attempts_lt": 3}\'')
+
     # Add mark_converting command
     mark_parser = subparsers.add_parser("mark_converting", help="Add a model ID to the converting set")
     mark_parser.add_argument("--model_id", required=True)
@@ -408,6 +950,12 @@ if __name__ == "__main__":
         defaults = json.loads(args.defaults) if args.defaults else None
         result = catalog.import_models_from_list(model_ids, defaults)
         print(json.dumps(result, indent=2))
+    elif args.command == "rebuild_indexes":
+        result = catalog.rebuild_indexes()
+        print(f"Indexed {result} models")
+    elif args.command == "find":
+        result = catalog.find(**json.loads(args.filters))
+        print(json.dumps(sorted(result), indent=2))
     elif args.command == "mark_converting":
         result = catalog.mark_converting(args.model_id)
         print("Added to converting set" if result else "Already in converting set")
@@ -0,0 +1,282 @@
+"""
+repo_maintenance.py
+
+Shared engine for fleet-wide Hugging Face repo maintenance (deleting files that
+match a predicate across every repo we own).
+
+- Repo trees are listed concurrently. With expand=True the listing already
+  carries each file's last commit, so age checks need no per-file request.
+- All matches in a repo are removed with a single create_commit of
+  CommitOperationDelete operations instead of one commit per file.
+- plan() only lists, so callers can print a dry-run report before delete().
+- Journal is a resumable per-repo progress log for long fleet-wide passes.
+- RateController / call_with_rate pace Hub calls and back off adaptively on 429.
+
+Used by delete_files_all_repos_with_string_in_filename.py, delete_old_files.py
+and delete-files.py; Journal also by hf_super_squash_all.py and readme_patcher.py;
+RateController by hf_super_squash_all.py and model-converter/add_models_to_collection.py.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone, timedelta
+from typing import Optional
+
+from huggingface_hub import HfApi, CommitOperationDelete
+from huggingface_hub.hf_api import RepoFolder
+
+# Keep single commits to a size the Hub handles comfortably
+MAX_OPERATIONS_PER_COMMIT = 1000
+
+
+def read_default_user():
+    username_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model-converter/username")
+    with open(username_file, "r") as f:
+        return f.read().strip()
+
+
+def last_modified(entry):
+    """Last commit date of a file from an expanded tree listing, or None."""
+    last_commit = getattr(entry, "last_commit", None)
+    date = getattr(last_commit, "date", None) if last_commit else None
+    if date is not None and date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date
+
+
+def older_than(days):
+    """Predicate: file was last committed more than `days` ago (files without a date never match)."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+
+    def predicate(entry):
+        date = last_modified(entry)
+        return date is not None and date < cutoff
+    return predicate
+
+
+def name_contains(substrings, exclude_substrings=()):
+    """Predicate: path contains any substring and none of the excluded ones (case-insensitive)."""
+    substrings = [s.lower() for s in substrings]
+    exclude_substrings = [s.lower() for s in exclude_substrings]
+
+    def predicate(entry):
+        name = entry.path.lower()
+        return any(s in name for s in substrings) and not any(s in name for s in exclude_substrings)
+    return predicate
+
+
+class RepoMaintenance:
+    def __init__(self, api=None, token=None, list_workers=16, commit_workers=4):
+        self.api = api or HfApi()
+        self.token = token
+        self.list_workers = list_workers
+        self.commit_workers = commit_workers
+
+    def list_repos(self, author):
+        return [model.id for model in self.api.list_models(author=author, token=self.token)]
+
+    def list_files(self, repo_id, expand=False):
+        """All files (not folders) in a repo."""
+        return [entry for entry in self.api.list_repo_tree(repo_id, recursive=True, expand=expand, token=self.token)
+                if not isinstance(entry, RepoFolder)]
+
+    def plan(self, repo_ids, predicate, expand=False):
+        """
+        List every repo concurrently and apply predicate to each file.
+
+        Returns:
+            tuple: (plan, errors) where plan maps repo_id -> [matching paths] (repos
+                without matches are left out) and errors maps repo_id -> exception.
+        """
+        plan, errors = {}, {}
+        with ThreadPoolExecutor(max_workers=self.list_workers) as pool:
+            futures = {pool.submit(self.list_files, repo_id, expand): repo_id for repo_id in repo_ids}
+            for future in as_completed(futures):
+                repo_id = futures[future]
+                try:
+                    matches = [entry.path for entry in future.result() if predicate(entry)]
+                except Exception as e:
+                    errors[repo_id] = e
+                    continue
+                if matches:
+                    plan[repo_id] = sorted(matches)
+        return dict(sorted(plan.items())), errors
+
+    def delete_in_repo(self, repo_id, paths, commit_message):
+        """Delete paths from one repo in as few commits as possible."""
+        for start in range(0, len(paths), MAX_OPERATIONS_PER_COMMIT):
+            operations = [CommitOperationDelete(path_in_repo=path)
+                          for path in paths[start:start + MAX_OPERATIONS_PER_COMMIT]]
+            self.api.create_commit(repo_id=repo_id, operations=operations,
+                                   commit_message=commit_message, token=self.token)
+        return len(paths)
+
+    def delete(self, plan, commit_message):
+        """
+        Apply a plan, one commit per repo, repos in parallel.
+
+        Returns:
+            tuple: (deleted file count, {repo_id: exception} for failed repos)
+        """
+        deleted, errors = 0, {}
+        with ThreadPoolExecutor(max_workers=self.commit_workers) as pool:
+            futures = {pool.submit(self.delete_in_repo, repo_id, paths, commit_message): repo_id
+                       for repo_id, paths in plan.items()}
+            for future in as_completed(futures):
+                repo_id = futures[future]
+                try:
+                    deleted += future.result()
+                    print(f"Deleted {len(plan[repo_id])} file(s) from {repo_id}")
+                except Exception as e:
+                    errors[repo_id] = e
+                    print(f"Failed to delete files from {repo_id}: {e}")
+        return deleted, errors
+
+
+def print_plan(plan, errors=None):
+    """Dry-run style report of a plan."""
+    for repo_id, paths in plan.items():
+        print(f"\nRepo: {repo_id}")
+        for path in paths:
+            print(f"  Found: {path}")
+    for repo_id, error in (errors or {}).items():
+        print(f"Error processing {repo_id}: {error}")
+    total = sum(len(paths) for paths in plan.values())
+    print(f"\n{total} file(s) in {len(plan)} repo(s) match.")
+    return total
+
+
+class Journal:
+    """
+    Append-only JSONL progress journal (last entry per repo wins).
+
+    Repos whose last status is in done_statuses are skipped when a run resumes.
+    """
+
+    def __init__(self, path, done_statuses, restart=False):
+        self.path = path
+        self.done_statuses = set(done_statuses)
+        self._lock = threading.Lock()
+        if restart and os.path.exists(path):
+            os.remove(path)
+        self.status = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from an interrupted run
+                    self.status[entry["repo_id"]] = entry["status"]
+
+    def is_done(self, repo_id):
+        return self.status.get(repo_id) in self.done_statuses
+
+    def record(self, repo_id, status, **extra):
+        entry = dict(extra, repo_id=repo_id, status=status, ts=time.time())
+        with self._lock:
+            self.status[repo_id] = status
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+
+    def discard(self):
+        """Remove the journal once a run has finished, so the next run starts over."""
+        with self._lock:
+            self.status = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+class RateController:
+    """
+    Thread-safe request pacing with adaptive 429 backoff.
+
+    Same policy as pdfs/postprocess_llm_common.RateController (sliding minute
+    window, spacing multiplier that grows on 429s and recovers after a run of
+    successes, exponential cooldown, at least as long as any Retry-After), shared
+    by all workers.
+    """
+
+    def __init__(self, rate_limit_per_minute: int = 60, cooldown_seconds: float = 15.0,
+                 cooldown_max_seconds: float = 300.0, dynamic_step: float = 0.5,
+                 dynamic_max_multiplier: float = 8.0, recovery_successes: int = 6) -> None:
+        self.rate_limit_per_minute = max(1, int(rate_limit_per_minute))
+        self.cooldown_seconds = cooldown_seconds
+        self.cooldown_max_seconds = max(cooldown_seconds, cooldown_max_seconds)
+        self.dynamic_step = dynamic_step
+        self.dynamic_max_multiplier = dynamic_max_multiplier
+        self.recovery_successes = recovery_successes
+
+        self._lock = threading.Lock()
+        self._request_timestamps: deque = deque()
+        self._next_slot = 0.0
+        self._cooldown_until = 0.0
+        self._streak_429 = 0
+        self._success_streak = 0
+        self._multiplier = 1.0
+
+    def wait_before_call(self) -> None:
+        """Reserve the next request slot and sleep until it arrives."""
+        with self._lock:
+            now = time.time()
+            slot = max(now, self._cooldown_until, self._next_slot)
+            while self._request_timestamps and slot - self._request_timestamps[0] >= 60.0:
+                self._request_timestamps.popleft()
+            if len(self._request_timestamps) >= self.rate_limit_per_minute:
+                slot = max(slot, self._request_timestamps[0] + 60.0)
+            self._next_slot = slot + (60.0 / self.rate_limit_per_minute) * self._multiplier
+            self._request_timestamps.append(slot)
+        if slot > now:
+            time.sleep(slot - now)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self._streak_429 = 0
+            self._success_streak += 1
+            if self._success_streak >= self.recovery_successes and self._multiplier > 1.0:
+                self._multiplier = max(1.0, self._multiplier - self.dynamic_step)
+                self._success_streak = 0
+
+    def on_429(self, retry_after: Optional[float] = None) -> float:
+        with self._lock:
+            self._success_streak = 0
+            self._streak_429 += 1
+            self._multiplier = min(self.dynamic_max_multiplier, self._multiplier + self.dynamic_step)
+            cooldown = min(self.cooldown_max_seconds, self.cooldown_seconds * (2 ** max(0, self._streak_429 - 1)))
+            if retry_after:
+                cooldown = max(cooldown, retry_after)
+            self._cooldown_until = max(self._cooldown_until, time.time() + cooldown)
+        print(f"[RATE] 429 detected streak={self._streak_429} cooldown={cooldown:.2f}s x{self._multiplier:.2f}")
+        return cooldown
+
+
+def is_rate_limited(error: Exception) -> bool:
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) == 429
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Retry-After header of a 429 response in seconds, or None."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    value = headers.get("Retry-After")
+    return float(value) if value and str(value).isdigit() else None
+
+
+def call_with_rate(rate: RateController, fn, *args, max_retries: int = 5, **kwargs):
+    """Run fn under the rate controller, retrying on 429."""
+    for attempt in range(1, max_retries + 1):
+        rate.wait_before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if is_rate_limited(e) and attempt < max_retries:
+                rate.on_429(retry_after_seconds(e))
+                continue
+            raise
+        rate.on_success()
+        return result
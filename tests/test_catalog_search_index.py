@@ -0,0 +1,115 @@
+import importlib.util
+import json
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+MODULE_PATH = REPO_ROOT / "gguf-catalog-editor" / "search_index.py"
+
+
+def _load_module():
+    spec = importlib.util.spec_from_file_location("catalog_search_index_under_test", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    spec.loader.exec_module(module)
+    return module
+
+
+class _FakeRedis:
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+    def hmget(self, _key, ids):
+        return [self.catalog.hash.get(mid) for mid in ids]
+
+    def xrange(self, _key, min="-", max="+", count=None):
+        events = self.catalog.events
+        if min.startswith("("):
+            floor = tuple(int(x) for x in min[1:].split("-"))
+            events = [e for e in events if tuple(int(x) for x in e[0].split("-")) > floor]
+        return events[:count] if count else list(events)
+
+    def xrevrange(self, _key, count=None):
+        return list(reversed(self.catalog.events))[:count]
+
+
+class _FakeCatalog:
+    catalog_key = "model:catalog"
+    changes_key = "model:catalog:changes"
+
+    def __init__(self):
+        self.hash = {}
+        self.events = []
+        self.r = _FakeRedis(self)
+
+    def iter_catalog(self):
+        return iter(list(self.hash.items()))
+
+    def save(self, model_id, data):
+        self.hash[model_id] = json.dumps(data)
+        self.events.append((f"{len(self.events) + 1}-0", {"id": model_id, "op": "set"}))
+
+    def delete(self, model_id):
+        self.hash.pop(model_id, None)
+        self.events.append((f"{len(self.events) + 1}-0", {"id": model_id, "op": "del"}))
+
+
+class CatalogSearchIndexTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.mod = _load_module()
+
+    def setUp(self):
+        self.catalog = _FakeCatalog()
+        for i in range(25):
+            self.catalog.save(f"org/Model-{i}B", {
+                "parameters": i * 1e9,
+                "converted": i % 2 == 0,
+                "quantizations": ["q4_k_m"] if i == 7 else [],
+            })
+        self.index = self.mod.CatalogSearchIndex()
+
+    def _ids(self, found):
+        return [model_id for model_id, _, _ in found["results"]]
+
+    def test_id_search_matches_substring_and_paginates(self):
+        found = self.index.search(self.catalog, "MODEL-1", "i", per_page=5)
+        self.assertEqual(found["total"], 11)
+        self.assertEqual(found["total_pages"], 3)
+        self.assertEqual(len(found["results"]), 5)
+
+    def test_all_fields_search_reports_matched_fields(self):
+        found = self.index.search(self.catalog, "q4_k", "a")
+        self.assertEqual(self._ids(found), ["org/Model-7B"])
+        self.assertEqual(found["results"][0][2], ["quantizations"])
+
+    def test_sort_is_global_across_pages(self):
+        found = self.index.search(self.catalog, "", "a", order_by="parameters", order_dir="desc", per_page=3, page=2)
+        self.assertEqual(self._ids(found), ["org/Model-21B", "org/Model-20B", "org/Model-19B"])
+
+    def test_specific_field_search_uses_field_number(self):
+        field_no = str(self.index.search(self.catalog, "", "i")["fields"].index("converted") + 1)
+        found = self.index.search(self.catalog, "true", field_no, per_page=100)
+        self.assertEqual(found["total"], 13)
+
+    def test_change_events_update_index_incrementally(self):
+        self.index.search(self.catalog, "", "i")
+        self.catalog.save("new/Fresh-3B", {"parameters": 3e9, "converted": False})
+        self.catalog.delete("org/Model-7B")
+        self.assertEqual(self._ids(self.index.search(self.catalog, "fresh", "i")), ["new/Fresh-3B"])
+        self.assertEqual(self.index.search(self.catalog, "q4_k", "a")["total"], 0)
+
+    def test_undecodable_and_non_object_entries_are_skipped(self):
+        self.catalog.hash["bad/null"] = "null"
+        self.catalog.hash["bad/junk"] = "{not json"
+        self.assertEqual(self.index.search(self.catalog, "bad", "i")["total"], 0)
+
+        # A corrupt edit drops the model from the index instead of failing /search
+        self.catalog.save("org/Model-3B", {"parameters": 3e9})
+        self.catalog.hash["org/Model-3B"] = "[1, 2]"
+        self.assertEqual(self.index.search(self.catalog, "model-3b", "i")["total"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import importlib.util
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+MODULE_PATH = REPO_ROOT / "model-converter" / "commit_prefilter.py"
+
+
+def _load_module():
+    spec = importlib.util.spec_from_file_location("commit_prefilter_under_test", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    spec.loader.exec_module(module)
+    return module
+
+
+def _commit(message, files):
+    return {"sha": "0" * 40, "commit": {"message": message}, "files": files}
+
+
+CONVERT_PATCH = """@@ -4100,6 +4100,20 @@ class Gemma2Model(TextModel):
+         return [(self.map_tensor_name(name), data_torch)]
+
+
++@ModelBase.register("Gemma3ForCausalLM", "Gemma3ForConditionalGeneration")
++class Gemma3Model(TextModel):
++    model_arch = gguf.MODEL_ARCH.GEMMA3
++
+"""
+
+CONSTANTS_PATCH = """@@ -300,6 +300,7 @@ class MODEL_ARCH(IntEnum):
+     GEMMA2           = auto()
++    GEMMA3           = auto()
+     STARCODER2       = auto()
+@@ -420,6 +421,7 @@ MODEL_ARCH_NAMES: dict[MODEL_ARCH, str] = {
+     MODEL_ARCH.GEMMA2:           "gemma2",
++    MODEL_ARCH.GEMMA3:           "gemma3",
+     MODEL_ARCH.STARCODER2:       "starcoder2",
+@@ -900,6 +902,7 @@ class MODEL_TENSOR(IntEnum):
++    ATTN_SINKS       = auto()
+"""
+
+
+class CommitPrefilterTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.mod = _load_module()
+
+    def test_kernel_and_ci_commits_are_rejected_without_llm(self):
+        decision, name, _ = self.mod.classify_commit(_commit(
+            "vulkan: add q8_1_x4 mul_mat_vec shader",
+            [{"filename": "ggml/src/ggml-vulkan/ggml-vulkan.cpp", "patch": "+x"},
+             {"filename": ".github/workflows/build.yml", "patch": "+y"}],
+        ))
+        self.assertEqual((decision, name), (self.mod.NOT_MODEL, None))
+
+    def test_new_arch_with_registration_is_a_new_model(self):
+        decision, name, _ = self.mod.classify_commit(_commit(
+            "model : add Gemma 3 support",
+            [{"filename": "convert_hf_to_gguf.py", "patch": CONVERT_PATCH},
+             {"filename": "gguf-py/gguf/constants.py", "patch": CONSTANTS_PATCH}],
+        ))
+        self.assertEqual((decision, name), (self.mod.NEW_MODEL, "Gemma3"))
+
+    def test_registration_alone_or_truncated_patch_is_ambiguous(self):
+        decision, _, _ = self.mod.classify_commit(_commit(
+            "convert : map Gemma3ForConditionalGeneration",
+            [{"filename": "convert_hf_to_gguf.py", "patch": CONVERT_PATCH}],
+        ))
+        self.assertEqual(decision, self.mod.AMBIGUOUS)
+        decision, _, _ = self.mod.classify_commit(_commit(
+            "sync",
+            [{"filename": "convert_hf_to_gguf.py"}],
+        ))
+        self.assertEqual(decision, self.mod.AMBIGUOUS)
+
+    def test_model_file_fix_without_new_symbols_is_rejected(self):
+        decision, _, _ = self.mod.classify_commit(_commit(
+            "convert : fix rope scaling for qwen2",
+            [{"filename": "convert_hf_to_gguf.py", "patch": "@@ -1 +1 @@\n-    a = 1\n+    a = 2\n"}],
+        ))
+        self.assertEqual(decision, self.mod.NOT_MODEL)
+
+    def test_model_message_without_diff_evidence_goes_to_llm(self):
+        decision, _, _ = self.mod.classify_commit(_commit(
+            "model : add support for Foo-7B architecture",
+            [{"filename": "src/models/foo.cpp", "patch": "+// foo"}],
+        ))
+        self.assertEqual(decision, self.mod.AMBIGUOUS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import importlib.util
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+MODULE_PATH = REPO_ROOT / "model-converter" / "github_poller.py"
+
+
+def _load_module():
+    spec = importlib.util.spec_from_file_location("github_poller_under_test", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    spec.loader.exec_module(module)
+    return module
+
+
+class _StubGitHub:
+    """Serves /repos/o/r/commits (paged, with ETag) and /repos/o/r/commits/<sha>."""
+
+    def __init__(self, commit_count):
+        self.shas = [f"{i:040x}" for i in range(commit_count, 0, -1)]  # newest first
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                stub.requests.append((url.path, self.headers.get("If-None-Match")))
+                if url.path == "/repos/o/r/commits":
+                    query = parse_qs(url.query)
+                    page, per_page = int(query["page"][0]), int(query["per_page"][0])
+                    etag = f'"{stub.shas[0]}"'
+                    if page == 1 and self.headers.get("If-None-Match") == etag:
+                        self.send_response(304)
+                        self.end_headers()
+                        return
+                    body = [{"sha": sha} for sha in stub.shas[(page - 1) * per_page:page * per_page]]
+                    self._json(body, {"ETag": etag})
+                else:
+                    sha = url.path.rsplit("/", 1)[-1]
+                    self._json({"sha": sha, "files": [{"filename": "README.md"}]})
+
+            def _json(self, body, headers=None):
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class GitHubCommitPollerTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.mod = _load_module()
+
+    def setUp(self):
+        self.stub = _StubGitHub(commit_count=25)
+        self.tmp = Path(tempfile.mkdtemp(prefix="github_poller_"))
+        self.cache_file = str(self.tmp / "commits_cache.json")
+
+    def tearDown(self):
+        self.stub.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _poller(self):
+        return self.mod.GitHubCommitPoller("o/r", cache_file=self.cache_file, api_url=self.stub.url, per_page=10)
+
+    def test_pages_back_to_last_commit_oldest_first(self):
+        last_commit = self.stub.shas[13]
+        commits = self._poller().new_commits(last_commit)
+        self.assertEqual([c["sha"] for c in commits], list(reversed(self.stub.shas[:13])))
+        pages = [p for p, _ in self.stub.requests if p == "/repos/o/r/commits"]
+        self.assertEqual(len(pages), 2)
+
+    def test_unknown_last_commit_falls_back_to_first_page(self):
+        commits = self._poller().new_commits("f" * 40)
+        self.assertEqual([c["sha"] for c in commits], list(reversed(self.stub.shas[:10])))
+
+    def test_unchanged_repository_revalidates_with_etag(self):
+        self._poller().fetch_recent()
+        self.stub.requests.clear()
+        commits = self._poller().fetch_recent()
+        self.assertEqual(len(commits), 10)
+        self.assertEqual(self.stub.requests, [("/repos/o/r/commits", f'"{self.stub.shas[0]}"')])
+
+    def test_details_are_fetched_concurrently_once_and_survive_restarts(self):
+        shas = self.stub.shas[:6]
+        details = self._poller().fetch_details(shas)
+        self.assertEqual(sorted(details), sorted(shas))
+        self.stub.requests.clear()
+        details = self._poller().fetch_details(shas)
+        self.assertEqual(details[shas[0]]["files"][0]["filename"], "README.md")
+        self.assertEqual(self.stub.requests, [])
+
+    def test_legacy_list_cache_is_accepted(self):
+        Path(self.cache_file).write_text(json.dumps([{"sha": "abc"}]))
+        poller = self._poller()
+        self.assertEqual(poller.cache["commits"], [{"sha": "abc"}])
+        self.assertEqual(poller.cache["details"], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import importlib.util
+import sys
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+try:
+    from huggingface_hub.utils import HfHubHTTPError
+    HAVE_HUB = True
+except ImportError:
+    HAVE_HUB = False
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+MODULE_PATH = REPO_ROOT / "hf_super_squash_all.py"
+# hf_super_squash_all imports repo_maintenance from the repo root
+sys.path.insert(0, str(REPO_ROOT))
+
+
+def _load_module():
+    spec = importlib.util.spec_from_file_location("hf_super_squash_all_under_test", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    spec.loader.exec_module(module)
+    return module
+
+
+class _FakeApi:
+    endpoint = "https://hub.example"
+    token = None
+
+    def __init__(self, commits, repo_info_errors=()):
+        self.commits = commits
+        self.repo_info_errors = list(repo_info_errors)
+        self.squashed = []
+
+    def get_repo_info(self, repo_id, repo_type):
+        if self.repo_info_errors:
+            raise self.repo_info_errors.pop(0)
+        return SimpleNamespace(default_branch="main")
+
+    def super_squash_history(self, repo_id, branch, commit_message, repo_type):
+        self.squashed.append((repo_id, branch))
+
+
+def _http_error(status):
+    response = SimpleNamespace(status_code=status, headers={}, request=None)
+    return HfHubHTTPError(f"HTTP {status}", response=response)
+
+
+@unittest.skipUnless(HAVE_HUB, "huggingface_hub not installed")
+class SuperSquashTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.mod = _load_module()
+
+    def setUp(self):
+        self.rate = self.mod.RateController(rate_limit_per_minute=600, cooldown_seconds=0.0)
+        self.rate.wait_before_call = lambda: None
+        self.requests = []
+
+    def _session(self, api):
+        def get(url, params=None, headers=None):
+            self.requests.append((url, params))
+            return SimpleNamespace(json=lambda: [{"id": c} for c in api.commits[:params["limit"]]])
+        return SimpleNamespace(get=get)
+
+    def _squash(self, api):
+        with mock.patch.object(self.mod, "get_session", lambda: self._session(api)), \
+                mock.patch.object(self.mod, "hf_raise_for_status", lambda response: None):
+            return self.mod.squash_repo(api, self.rate, "u/m-GGUF", "model", "squash")
+
+    def test_single_commit_repo_is_skipped(self):
+        api = _FakeApi(commits=["c1"])
+        self.assertEqual(self._squash(api), "single-commit")
+        self.assertEqual(api.squashed, [])
+        self.assertEqual(self.requests, [("https://hub.example/api/models/u/m-GGUF/commits/main", {"limit": 2})])
+
+    def test_rate_limited_branch_lookup_is_retried_not_defaulted(self):
+        api = _FakeApi(commits=["c2", "c1"], repo_info_errors=[_http_error(429)])
+        self.assertEqual(self._squash(api), "squashed")
+        self.assertEqual(api.squashed, [("u/m-GGUF", "main")])
+        self.assertEqual(api.repo_info_errors, [])
+
+        with self.assertRaises(HfHubHTTPError):
+            self.mod.detect_default_branch(_FakeApi([], repo_info_errors=[_http_error(429)]), "u/m", "model")
+        self.assertEqual(
+            self.mod.detect_default_branch(_FakeApi([], repo_info_errors=[_http_error(404)]), "u/m", "model"),
+            "main")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+import importlib.util
+import json
+import shutil
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+MODEL_CONVERTER = REPO_ROOT / "model-converter"
+# imatrix_analysis imports its sibling imatrix_tools
+sys.path.insert(0, str(MODEL_CONVERTER))
+
+try:
+    import gguf  # noqa: F401
+    HAVE_GGUF = True
+except ImportError:
+    HAVE_GGUF = False
+
+
+def _load(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    spec.loader.exec_module(module)
+    return module
+
+
+def _entries(rng, layers=4):
+    entries = {}
+    for layer in range(layers):
+        for role, n_mat in (("attn_v", 1), ("ffn_down_exps", 2)):
+            values = rng.random((n_mat, 16)).astype(np.float32) + 0.1
+            entries[f"blk.{layer}.{role}.weight"] = {"in_sum2": values * 4,
+                                                     "counts": np.full(n_mat, 4, dtype=np.float32)}
+    return entries
+
+
+class TestImatrixAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="imatrix_analysis_")
+        self.mod = _load("imatrix_analysis_under_test", MODEL_CONVERTER / "imatrix_analysis.py")
+        self.tools = _load("imatrix_tools_for_analysis", MODEL_CONVERTER / "imatrix_tools.py")
+        self.meta = {"chunk_count": 1, "chunk_size": 512, "datasets": ["t"]}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _path(self, name):
+        return str(Path(self.tmp) / name)
+
+    def test_batched_metrics_match_per_tensor_numpy(self):
+        rng = np.random.default_rng(0)
+        a = _entries(rng)
+        b = {name: {"in_sum2": e["in_sum2"] * rng.uniform(0.8, 1.2, e["in_sum2"].shape).astype(np.float32),
+                    "counts": e["counts"]} for name, e in a.items()}
+        b["blk.0.attn_v.weight"]["in_sum2"] = b["blk.0.attn_v.weight"]["in_sum2"][:, ::-1].copy()
+        pa, pb = self._path("a.imatrix"), self._path("b.imatrix")
+        self.tools.write_imatrix(pa, {n: {"in_sum2": e["in_sum2"].reshape(1, -1), "counts": e["counts"]}
+                                      for n, e in a.items()}, self.meta)
+        self.tools.write_imatrix(pb, {n: {"in_sum2": e["in_sum2"].reshape(1, -1), "counts": e["counts"]}
+                                      for n, e in b.items()}, self.meta)
+
+        ia, ib = self.mod.load_imatrix(pa), self.mod.load_imatrix(pb)
+        rows, skipped = self.mod.compare_imatrices(ia, ib)
+        self.assertEqual(skipped, [])
+        for row in rows:
+            x, y = ia[row["name"]]["values"], ib[row["name"]]["values"]
+            nx = (x - x.min()) / (x.max() - x.min())
+            ny = (y - y.min()) / (y.max() - y.min())
+            self.assertAlmostEqual(row["mad"], float(np.mean(np.abs(nx - ny))), places=5)
+            self.assertAlmostEqual(row["msd"], float(np.mean((nx - ny) ** 2)), places=5)
+            self.assertAlmostEqual(row["corr"], float(np.corrcoef(nx, ny)[0, 1]), places=5)
+
+        ranked = self.mod.rank_by_difference(rows)
+        self.assertEqual(ranked[0]["name"], "blk.0.attn_v.weight")
+        overlay = self.mod.suggest_overlay(ranked, top=1, bump=2)
+        self.assertEqual(overlay["rules"][0]["layer_name"], ["blk.0.attn_v"])
+        self.assertEqual(overlay["rules"][0]["bump"], 2)
+
+    @unittest.skipUnless(HAVE_GGUF, "gguf package not installed")
+    def test_gguf_and_legacy_load_the_same_means(self):
+        entries = _entries(np.random.default_rng(1), layers=2)
+        gguf_path, dat_path = self._path("m-imatrix.gguf"), self._path("m.imatrix")
+        self.tools.write_imatrix(gguf_path, entries, self.meta)
+        self.tools.write_imatrix(dat_path, {n: {"in_sum2": e["in_sum2"].reshape(1, -1), "counts": e["counts"][:1]}
+                                            for n, e in entries.items()}, self.meta)
+        from_gguf, from_dat = self.mod.load_imatrix(gguf_path), self.mod.load_imatrix(dat_path)
+        self.assertEqual(from_gguf.keys(), from_dat.keys())
+        for name in entries:
+            np.testing.assert_allclose(from_gguf[name]["values"], from_dat[name]["values"], rtol=1e-6)
+
+        rows, _ = self.mod.compare_imatrices(from_gguf, from_dat)
+        self.assertTrue(all(row["mad"] < 1e-6 for row in rows))
+
+    def test_importance_scores_flag_outlier_tensor(self):
+        entries = _entries(np.random.default_rng(2), layers=6)
+        entries["blk.3.attn_v.weight"]["in_sum2"][0, 5] = 500.0
+        path = self._path("imp.imatrix")
+        self.tools.write_imatrix(path, {n: {"in_sum2": e["in_sum2"].reshape(1, -1), "counts": e["counts"][:1]}
+                                        for n, e in entries.items()}, self.meta)
+        ranked = self.mod.importance_scores(self.mod.load_imatrix(path))
+        self.assertEqual(ranked[0]["name"], "blk.3.attn_v.weight")
+        self.assertEqual(self.mod.layer_sensitivity(ranked)[0][0], 3)
+
+        overlay_path = self._path("overlay.json")
+        argv = ["imatrix_analysis.py", "rank", path, "--top", "2", "--overlay", overlay_path]
+        with mock.patch.object(sys, "argv", argv), redirect_stdout(StringIO()):
+            self.mod.main()
+        with open(overlay_path) as f:
+            overlay = json.load(f)
+        self.assertEqual(overlay["rules"][0]["layer_name"][0], "blk.3.attn_v")
+
+
+if __name__ == "__main__":
+    unittest.main()
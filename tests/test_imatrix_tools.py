@@ -0,0 +1,236 @@
+import importlib.util
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import textwrap
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+MODULE_PATH = REPO_ROOT / "model-converter" / "imatrix_tools.py"
+
+try:
+    import gguf  # noqa: F401
+    HAVE_GGUF = True
+except ImportError:
+    HAVE_GGUF = False
+
+
+def _load_module():
+    spec = importlib.util.spec_from_file_location("imatrix_tools_under_test", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    spec.loader.exec_module(module)
+    return module
+
+
+def _entries(scale, n_call):
+    return {
+        "blk.0.attn_q.weight": {"in_sum2": np.full((1, 8), scale, dtype=np.float32),
+                                "counts": np.array([n_call], dtype=np.float32)},
+        "blk.0.ffn_up_exps.weight": {"in_sum2": np.arange(12, dtype=np.float32).reshape(3, 4) * scale,
+                                     "counts": np.array([n_call, 0, n_call], dtype=np.float32)},
+    }
+
+
+def _serve_files(files, requests_log):
+    """Serve `files` (path -> bytes) with HEAD and Range support; other paths are 404."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send_head(self):
+            requests_log.append((self.command, self.path, self.headers.get("Range")))
+            data = files.get(self.path)
+            if data is None:
+                self.send_response(404)
+                self.end_headers()
+                return None
+            start = 0
+            range_header = self.headers.get("Range")
+            if range_header:
+                start = int(range_header.split("=")[1].split("-")[0])
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+            else:
+                self.send_response(200)
+            self.send_header("Content-Length", str(len(data) - start))
+            self.end_headers()
+            return data[start:]
+
+        def do_HEAD(self):
+            self._send_head()
+
+        def do_GET(self):
+            body = self._send_head()
+            if body is not None:
+                self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class ImatrixToolsTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.mod = _load_module()
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="imatrix_tools_")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _path(self, name):
+        return os.path.join(self.tmp, name)
+
+    def test_legacy_merge_sums_values_and_calls(self):
+        meta = {"chunk_count": 3, "chunk_size": 512, "datasets": ["train"]}
+        a, b = self._path("a.dat"), self._path("b.dat")
+        entries = {"w": {"in_sum2": np.ones((1, 4), dtype=np.float32), "counts": np.array([3], dtype=np.float32)}}
+        self.mod.write_imatrix(a, entries, meta)
+        self.mod.write_imatrix(b, entries, meta)
+        merged = self.mod.merge_imatrix_files([a, b], self._path("m.dat"))
+        out, out_meta = self.mod.read_imatrix_entries(merged)
+        np.testing.assert_array_equal(out["w"]["in_sum2"], np.full((1, 4), 2, dtype=np.float32))
+        self.assertEqual(out["w"]["counts"].tolist(), [6])
+        self.assertEqual(out_meta["chunk_count"], 6)
+
+    def test_split_training_set_keeps_every_line(self):
+        train = self._path("train.txt")
+        with open(train, "w") as f:
+            f.writelines(f"line {i}\n" for i in range(100))
+        parts = self.mod.split_training_set(train, 4, self.tmp)
+        self.assertEqual(len(parts), 4)
+        joined = "".join(Path(p).read_text() for p in parts)
+        self.assertEqual(joined, Path(train).read_text())
+
+    @unittest.skipUnless(HAVE_GGUF, "gguf package not installed")
+    def test_copy_as_gguf_converts_legacy_files(self):
+        meta = {"chunk_count": 3, "chunk_size": 512, "datasets": ["train"]}
+        legacy = self._path("m.imatrix")
+        entries = {"w": {"in_sum2": np.arange(4, dtype=np.float32).reshape(1, 4), "counts": np.array([3], dtype=np.float32)}}
+        self.mod.write_imatrix(legacy, entries, meta)
+        dest = self._path("m-imatrix.gguf")
+        self.mod.copy_imatrix_as_gguf(legacy, dest)
+        self.assertTrue(self.mod.is_gguf_file(dest))
+        out, out_meta = self.mod.read_imatrix_entries(dest)
+        np.testing.assert_array_equal(out["w"]["in_sum2"], entries["w"]["in_sum2"])
+        self.assertEqual(out["w"]["counts"].tolist(), [3])
+        self.assertEqual(out_meta["chunk_count"], 3)
+
+    @unittest.skipUnless(HAVE_GGUF, "gguf package not installed")
+    def test_gguf_merge_is_readable_by_compare_script(self):
+        meta = {"chunk_count": 2, "chunk_size": 512, "datasets": ["train"]}
+        a, b = self._path("a-imatrix.gguf"), self._path("b-imatrix.gguf")
+        self.mod.write_imatrix(a, _entries(1.0, 2), meta)
+        self.mod.write_imatrix(b, _entries(2.0, 2), meta)
+        merged = self.mod.merge_imatrix_files([a, b], self._path("m-imatrix.gguf"))
+
+        out, out_meta = self.mod.read_imatrix_entries(merged)
+        np.testing.assert_allclose(out["blk.0.attn_q.weight"]["in_sum2"], np.full((1, 8), 3.0))
+        self.assertEqual(out["blk.0.ffn_up_exps.weight"]["counts"].tolist(), [4, 0, 4])
+        self.assertEqual(out_meta["chunk_count"], 4)
+
+        spec = importlib.util.spec_from_file_location("compare_imatrix_under_test",
+                                                      REPO_ROOT / "compare_imatrix_mad_values.py")
+        compare = importlib.util.module_from_spec(spec)
+        try:
+            spec.loader.exec_module(compare)
+        except ImportError as e:
+            self.skipTest(f"compare script dependency missing: {e}")
+        weights = compare.read_imatrix(merged)
+        self.assertEqual(weights["blk.0.attn_q.weight"]["values"].size, 8)
+        self.assertEqual(weights["blk.0.ffn_up_exps.weight"]["n_call"], 4)
+
+    @unittest.skipUnless(HAVE_GGUF, "gguf package not installed")
+    def test_generate_runs_parts_in_parallel_and_caches(self):
+        fake_bin = self._path("llama-imatrix")
+        with open(fake_bin, "w") as f:
+            f.write(textwrap.dedent(f"""\
+                #!{sys.executable}
+                import sys
+                sys.path.insert(0, {str(MODULE_PATH.parent)!r})
+                import numpy as np
+                import imatrix_tools
+                args = sys.argv[1:]
+                out = args[args.index("-o") + 1]
+                lines = len(open(args[args.index("-f") + 1]).readlines())
+                entries = {{"w": {{"in_sum2": np.full((1, 4), lines, dtype=np.float32),
+                                   "counts": np.array([lines], dtype=np.float32)}}}}
+                imatrix_tools.write_imatrix(out, entries, {{"chunk_count": 1, "chunk_size": 512, "datasets": ["t"]}})
+                """))
+        os.chmod(fake_bin, os.stat(fake_bin).st_mode | stat.S_IEXEC)
+        Path(self._path("toolchain.json")).write_text(json.dumps({"name": "abc123"}))
+        model, train = self._path("model.gguf"), self._path("train.txt")
+        Path(model).write_bytes(b"GGUF" + os.urandom(1024))
+        Path(train).write_text("".join(f"line {i}\n" for i in range(40)))
+        cache_dir = self._path("cache")
+
+        out = self.mod.generate_imatrix(model, train, self._path("out-imatrix.gguf"), fake_bin, threads=8,
+                                        processes=4, cache_dir=cache_dir)
+        entries, meta = self.mod.read_imatrix_entries(out)
+        self.assertEqual(entries["w"]["counts"].tolist(), [40])
+        self.assertEqual(meta["chunk_count"], 4)
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+        # Other llama-imatrix options or another build must not reuse that imatrix
+        self.mod.generate_imatrix(model, train, self._path("ctx-imatrix.gguf"), fake_bin, threads=8,
+                                  processes=4, cache_dir=cache_dir, extra_args=["-c", "1024"])
+        self.assertEqual(len(os.listdir(cache_dir)), 2)
+        self.assertNotEqual(self.mod.imatrix_settings_hash(fake_bin),
+                            self.mod.imatrix_settings_hash(self._path("other") + "/llama-imatrix"))
+
+        os.remove(fake_bin)  # a cache hit must not run the binary again
+        out = self.mod.generate_imatrix(model, train, self._path("again-imatrix.gguf"), fake_bin, threads=8,
+                                        processes=4, cache_dir=cache_dir)
+        self.assertTrue(os.path.exists(out))
+
+    def test_remote_resolver_probes_downloads_and_caches_misses(self):
+        payload = os.urandom(4096)
+        log = []
+        server, base = _serve_files({"/b/imatrix.dat": payload}, log)
+        self.addCleanup(server.shutdown)
+        resolver = self.mod.RemoteImatrixResolver(negative_cache_file=self._path("misses.json"))
+        dest = self._path("imatrix.dat")
+
+        Path(dest + ".part").write_bytes(payload[:1000])  # interrupted earlier download
+        url = resolver.fetch("o/m", [f"{base}/a/imatrix.dat", f"{base}/b/imatrix.dat"], dest)
+        self.assertEqual(url, f"{base}/b/imatrix.dat")
+        self.assertEqual(Path(dest).read_bytes(), payload)
+        self.assertIn(("GET", "/b/imatrix.dat", "bytes=1000-"), log)
+
+        self.assertIsNone(resolver.fetch("o/none", [f"{base}/a/imatrix.dat"], self._path("none.dat")))
+        log.clear()
+        self.assertIsNone(resolver.fetch("o/none", [f"{base}/a/imatrix.dat"], self._path("none.dat")))
+        self.assertEqual(log, [])  # cached miss, no requests
+
+    def test_index_registers_and_looks_up_by_model(self):
+        imatrix_dir = self._path("imatrix-files")
+        os.makedirs(imatrix_dir)
+        path = os.path.join(imatrix_dir, "Qwen3-4B.imatrix")
+        Path(path).write_bytes(b"x" * 10)
+        self.assertEqual(self.mod.imatrix_model_name(path), "Qwen3-4B")
+        self.assertEqual(self.mod.imatrix_model_name("a/Qwen3-4B-imatrix.gguf"), "Qwen3-4B")
+        self.assertIsNone(self.mod.imatrix_model_name("Qwen3-4B-q4_k_m.gguf"))
+
+        self.mod.register_imatrix(imatrix_dir, "Qwen3-4B", path, source="o/Qwen3-4B-GGUF")
+        self.assertEqual(self.mod.load_imatrix_index(imatrix_dir)["Qwen3-4B"]["path"], "Qwen3-4B.imatrix")
+        self.assertEqual(self.mod.lookup_imatrix(imatrix_dir, "Qwen3-4B"), path)
+        self.assertIsNone(self.mod.lookup_imatrix(imatrix_dir, "missing"))
+        Path(path).write_bytes(b"x" * 11)  # changed on disk -> stale entry
+        self.assertIsNone(self.mod.lookup_imatrix(imatrix_dir, "Qwen3-4B"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -22,13 +22,21 @@ EXPECTED_SCRIPT_NAMES = {
     "add_new_enterprise_models.py",
     "auto_build_new_models.py",
     "build_llama.py",
+    "commit_prefilter.py",
     "delete_models.py",
     "download_convert.py",
     "fix_missing_models.py",
     "get_gguf_tensor_info.py",
+    "github_poller.py",
+    "hf_model_resolver.py",
+    "imatrix_analysis.py",
+    "imatrix_tools.py",
+    "llama_toolchain.py",
     "make_files.py",
     "mark_old_models_converted.py",
+    "pipeline_trace.py",
     "model_converter.py",
+    "quant_results.py",
     "recalc_model_sizes.py",
     "reset_attempts.py",
     "run_all_from_json.py",
@@ -167,6 +175,24 @@ def _build_stub_modules(stub_dir: Path) -> None:
             def get_model(self, model_id):
                 return self._data.get(model_id)
 
+            def get_models(self, model_ids):
+                return {mid: dict(self._data[mid]) for mid in model_ids if mid in self._data}
+
+            def existing_models(self, model_ids):
+                return {mid for mid in model_ids if mid in self._data}
+
+            def find(self, converted=None, parameters_known=None, **ranges):
+                matches = []
+                for model_id, entry in self._data.items():
+                    if converted is not None and bool(entry.get("converted")) != converted:
+                        continue
+                    if parameters_known is not None:
+                        known = entry.get("parameters") not in (None, 0, -1)
+                        if known != parameters_known:
+                            continue
+                    matches.append(model_id)
+                return matches
+
             def add_model(self, model_id, info):
                 self._data[model_id] = dict(info)
                 return True
@@ -293,6 +319,9 @@ def _build_stub_modules(stub_dir: Path) -> None:
         """
         def process_quantization(*args, **kwargs):
             return {}
+
+        def precision_override_for(quant_name):
+            return None
         """,
     )
 
@@ -339,6 +368,17 @@ def _build_stub_modules(stub_dir: Path) -> None:
             def __init__(self, *args, **kwargs):
                 pass
 
+        class CommitOperationDelete:
+            def __init__(self, path_in_repo=None, **kwargs):
+                self.path_in_repo = path_in_repo
+
+        # repo_maintenance (shared with the root-level scripts) imports hf_api.RepoFolder
+        import sys as _sys
+        import types as _types
+        hf_api = _types.ModuleType("huggingface_hub.hf_api")
+        hf_api.RepoFolder = type("RepoFolder", (), {})
+        _sys.modules["huggingface_hub.hf_api"] = hf_api
+
         class HfApi:
             def __init__(self, *args, **kwargs):
                 pass
@@ -389,6 +429,8 @@ class TestModelConverterScripts(unittest.TestCase):
             import importlib
 
             sys.path.insert(0, os.environ["MODEL_BUILDER_TEST_STUBS"])
+            # Like `python script.py`: unstubbed sibling modules resolve from the script dir
+            sys.path.append(os.path.dirname(os.path.abspath(sys.argv[1])))
             preload = [
                 "dotenv",
                 "tqdm",
@@ -454,9 +496,12 @@ class TestModelConverterScripts(unittest.TestCase):
             ("download_convert.py", [], "__main__", 1, "Hugging Face API token not found"),
             ("fix_missing_models.py", [], "__main__", 1, "Hugging Face API token not found"),
             ("get_gguf_tensor_info.py", [], "__main__", 2, "usage"),
+            ("imatrix_analysis.py", [], "__main__", 2, "usage"),
             ("make_files.py", [], "__main__", 0, "Hugging Face API token not found"),
             ("mark_old_models_converted.py", [], "__main__", 0, "Done."),
             ("model_converter.py", [], "__main__", 2, "usage"),
+            ("pipeline_trace.py", [], "__main__", 2, "usage"),
+            ("quant_results.py", [], "__main__", 2, "usage"),
             ("recalc_model_sizes.py", [], "__main__", 0, "Updated parameters"),
             ("reset_attempts.py", [], "__main__", 0, "All model attempts have been reset to 0."),
             ("run_all_from_json.py", [], "__main__", 1, "Usage: python run_all_from_json.py"),
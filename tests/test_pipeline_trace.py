@@ -0,0 +1,97 @@
+import importlib.util
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+MODULE_PATH = REPO_ROOT / "model-converter" / "pipeline_trace.py"
+
+
+def _load_module():
+    spec = importlib.util.spec_from_file_location("pipeline_trace_under_test", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    spec.loader.exec_module(module)
+    return module
+
+
+class PipelineTraceTests(unittest.TestCase):
+    def setUp(self):
+        self.mod = _load_module()
+        self.tmp = Path(tempfile.mkdtemp(prefix="pipeline_trace_"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_spans_capture_child_cpu_nesting_and_errors(self):
+        path = self.tmp / "traces" / "org__model.jsonl"
+        with mock.patch.dict(os.environ, {}, clear=False):
+            tracer = self.mod.start_run("org/model", path=str(path))
+            self.assertEqual(os.environ[self.mod.RUN_ID_ENV], tracer.run_id)
+            with self.mod.span("quantize", quant="Q4_K_M") as attrs:
+                with self.mod.span("split"):
+                    subprocess.run([sys.executable, "-c", "sum(i * i for i in range(3_000_000))"], check=True)
+                attrs["success"] = True
+            with self.assertRaises(RuntimeError):
+                with self.mod.span("upload"):
+                    raise RuntimeError("boom")
+
+        spans = {s["stage"]: s for s in self.mod.load_spans([path])}
+        self.assertEqual(set(spans), {"quantize", "split", "upload"})
+        self.assertEqual(spans["split"]["parent"], "quantize")
+        self.assertEqual(spans["split"]["depth"], 1)
+        self.assertEqual(spans["quantize"]["attrs"], {"quant": "Q4_K_M", "success": True})
+        self.assertGreater(spans["split"]["child_user_s"] + spans["split"]["child_sys_s"], 0)
+        self.assertEqual(spans["upload"]["status"], "error")
+        self.assertIn("boom", spans["upload"]["error"])
+        self.assertEqual({s["run_id"] for s in spans.values()}, {tracer.run_id})
+
+        # A child script joins the same run through the environment
+        with mock.patch.dict(os.environ, {self.mod.RUN_ID_ENV: tracer.run_id}):
+            self.assertEqual(self.mod.Tracer("org/model", path=str(path)).run_id, tracer.run_id)
+
+        rows = {r["stage"]: r for r in self.mod.summarize(self.mod.load_spans([path]))}
+        self.assertEqual(rows["upload"]["failed"], 1)
+        self.assertGreaterEqual(rows["quantize"]["total_s"], rows["split"]["total_s"])
+
+        out = StringIO()
+        with mock.patch.object(sys, "argv", ["pipeline_trace.py", "--dir", str(path.parent), "show", "org/model"]), \
+                redirect_stdout(out):
+            self.mod.main()
+        self.assertIn(f"Run {tracer.run_id}", out.getvalue())
+        self.assertIn("  split", out.getvalue())
+
+    def test_peak_rss_comes_only_from_commands_reaped_in_the_span(self):
+        path = self.tmp / "org__model.jsonl"
+        self.mod.start_trace("org/model", path=str(path))
+        with self.mod.span("quantize"):
+            with self.mod.span("split"):
+                proc = subprocess.Popen([sys.executable, "-c", "b = bytearray(96 << 20)"])
+                exit_code, peak_rss_mb = self.mod.wait_child(proc)
+        with self.mod.span("upload"):
+            pass
+
+        spans = {s["stage"]: s for s in self.mod.load_spans([path])}
+        self.assertEqual(exit_code, 0)
+        self.assertGreater(peak_rss_mb, 96)
+        self.assertEqual(spans["split"]["peak_rss_mb"], peak_rss_mb)
+        self.assertEqual(spans["quantize"]["peak_rss_mb"], peak_rss_mb)
+        # The earlier command's high-water mark does not leak into a later span
+        self.assertIsNone(spans["upload"]["peak_rss_mb"])
+
+    def test_span_without_active_tracer_is_a_no_op(self):
+        with self.mod.span("imatrix") as attrs:
+            attrs["x"] = 1
+        self.assertEqual(list(self.tmp.iterdir()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+import importlib.util
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import textwrap
+import types
+import unittest
+from pathlib import Path
+from unittest import mock
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+MODULE_PATH = REPO_ROOT / "quant_bench.py"
+
+
+def _load_module():
+    spec = importlib.util.spec_from_file_location("quant_bench_under_test", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    spec.loader.exec_module(module)
+    return module
+
+
+def _write_tool(path, body):
+    path.write_text(f"#!{sys.executable}\n" + textwrap.dedent(body))
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+
+
+class QuantBenchTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.mod = _load_module()
+
+    def setUp(self):
+        self.tmp = Path(tempfile.mkdtemp(prefix="quant_bench_"))
+        self.bin_dir = self.tmp / "bin"
+        self.bin_dir.mkdir()
+        # Fake quantize: output size depends on the quant type; counts invocations
+        _write_tool(self.bin_dir / "llama-quantize", f"""\
+            import sys
+            args = sys.argv[1:]
+            open({str(self.tmp / 'quantize_calls')!r}, "a").write(" ".join(args) + "\\n")
+            if args[-2] == "BROKEN":
+                sys.exit(1)
+            open(args[-3], "wb").write(b"q" * (1 << 20) * len(args[-2]))
+            """)
+        _write_tool(self.bin_dir / "llama-perplexity", f"""\
+            import os, sys
+            args = sys.argv[1:]
+            size = os.path.getsize(args[args.index("-m") + 1])
+            if "--kl-divergence-base" in args:
+                base = args[args.index("--kl-divergence-base") + 1]
+                if "--kl-divergence" not in args:
+                    open({str(self.tmp / 'base_calls')!r}, "a").write("x\\n")
+                    open(base, "wb").write(b"logits")
+                    sys.exit(0)
+                assert open(base, "rb").read() == b"logits"
+                mb = size / (1 << 20)
+                sys.stderr.write(f"Mean PPL(Q)                   :   {{6 + 1 / mb:.6f}} ±   0.04\\n")
+                sys.stderr.write(f"Mean PPL(Q)-PPL(base)         :   {{1 / mb:.6f}} ±   0.003\\n")
+                sys.stderr.write(f"Mean    KLD:   {{0.1 / mb:.6f}} ±   0.000123\\n")
+                sys.stderr.write(f"Same top p: {{100 - 10 / mb:.3f}} ±  0.123 %\\n")
+                sys.exit(0)
+            sys.stderr.write("[1]9.5,[2]8.25,\\n")
+            sys.stderr.write(f"Final estimate: PPL = {{size / (1 << 20):.4f}} +/- 0.0500\\n")
+            sys.stderr.write("llama_perf_context_print: prompt eval time = 10.0 ms / 512 tokens "
+                             "( 0.02 ms per token, 51200.00 tokens per second)\\n")
+            """)
+        self.model = self.tmp / "model-bf16.gguf"
+        self.model.write_bytes(b"GGUF" + os.urandom(4096))
+        self.text = self.tmp / "text.txt"
+        self.text.write_text("hello world\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _bench(self, **kwargs):
+        return self.mod.QuantBench(self.model, out_dir=self.tmp / "out", bin_dir=self.bin_dir,
+                                   test_text=self.text, threads=8, jobs=4, **kwargs)
+
+    def test_extract_perplexity_formats(self):
+        self.assertEqual(self.mod.extract_perplexity("Final estimate: PPL = 6.1234 +/- 0.0321"), ("6.1234", "0.0321"))
+        self.assertEqual(self.mod.extract_perplexity("[1]9.5000,[2]7.2500,"), ("7.2500", None))
+        self.assertEqual(self.mod.extract_perplexity("nothing"), (None, None))
+
+    def test_run_builds_table_and_reuses_quantized_files(self):
+        configs = [
+            {"name": "q2", "type": "Q2_K", "embed_type": "Q4_K", "output_type": "Q4_K", "use_imatrix": False, "use_pure": False},
+            {"name": "q4", "type": "Q4_K_M", "embed_type": "Q6_K", "output_type": "Q6_K", "use_imatrix": False, "use_pure": False},
+            {"name": "bad", "type": "BROKEN", "use_imatrix": False, "use_pure": False},
+        ]
+        rows = {r["name"]: r for r in self._bench().run(configs)}
+        self.assertEqual(rows["q2"]["perplexity"], "4.0000")
+        self.assertEqual(rows["q4"]["size_mb"], "6.0")
+        self.assertEqual(rows["q4"]["tokens_per_s"], "51200.00")
+        self.assertEqual(rows["bad"]["status"], "quantize failed")
+        calls = (self.tmp / "quantize_calls").read_text().splitlines()
+        self.assertEqual(len(calls), 3)
+        self.assertTrue(all(line.endswith(" 2") for line in calls))  # 8 threads / 4 jobs
+
+        rows = {r["name"]: r for r in self._bench().run(configs[:2])}
+        self.assertTrue(rows["q2"]["cached"] and rows["q4"]["cached"])
+        self.assertEqual(len((self.tmp / "quantize_calls").read_text().splitlines()), 3)
+
+        out = self.tmp / "results.csv"
+        self.mod.write_results(list(rows.values()), out)
+        self.assertTrue(out.read_text().startswith("name,type,"))
+
+    def test_quant_key_covers_llama_build(self):
+        config = {"name": "q4", "type": "Q4_K_M", "use_imatrix": False, "use_pure": False}
+        paths = []
+        for commit in ("1111111aaaa", "2222222bbbb"):
+            bin_dir = self.tmp / commit
+            shutil.copytree(self.bin_dir, bin_dir)
+            (bin_dir / "toolchain.json").write_text(f'{{"commit": "{commit}"}}')
+            bench = self.mod.QuantBench(self.model, out_dir=self.tmp / "out", bin_dir=bin_dir, test_text=self.text)
+            paths.append(bench.quant_path(config))
+        self.assertNotEqual(paths[0], paths[1])
+
+    def test_kld_mode_saves_base_logits_once(self):
+        configs = [
+            {"name": "q2", "type": "Q2_K", "use_imatrix": False, "use_pure": False},
+            {"name": "q8", "type": "Q8_0_XXXX", "use_imatrix": False, "use_pure": False},
+        ]
+        rows = {r["name"]: r for r in self._bench(kld=True).run(configs)}
+        self.assertEqual(rows["q2"]["mean_kld"], "0.025000")
+        self.assertEqual(rows["q8"]["top1_agreement"], "98.889")
+        self.assertEqual(rows["q8"]["delta_ppl"], "0.111111")
+        self.assertEqual(rows["q2"]["status"], "ok")
+        self.assertEqual(len((self.tmp / "base_calls").read_text().splitlines()), 1)
+
+        self._bench(kld=True).run(configs)  # logits and quants are both reused
+        self.assertEqual(len((self.tmp / "base_calls").read_text().splitlines()), 1)
+
+    def test_rows_are_recorded_in_results_db(self):
+        db = self.tmp / "results.db"
+        configs = [{"name": "q4", "type": "Q4_K_M", "use_imatrix": False, "use_pure": False}]
+        self._bench(results_db=str(db)).run(configs)
+        self._bench(results_db=str(db)).run(configs)
+
+        sys.path.insert(0, str(REPO_ROOT / "model-converter"))
+        try:
+            import quant_results
+        finally:
+            sys.path.pop(0)
+        rows = quant_results.ResultsDB(str(db)).query(model="model-bf16", quant="q4")
+        self.assertEqual(len(rows), 2)
+        fresh, cached = rows[1], rows[0]
+        self.assertEqual(fresh["source"], "quant_bench")
+        self.assertEqual(fresh["ppl"], 6.0)
+        self.assertEqual(fresh["size_bytes"], 6 << 20)
+        self.assertGreater(fresh["wall_time"], 0)
+        self.assertGreater(fresh["peak_rss_mb"], 0)
+        self.assertIsNone(cached["wall_time"])  # reused quant: no timing to compare
+        self.assertEqual(fresh["tensor_plan_hash"], cached["tensor_plan_hash"])
+
+    def test_reused_quant_records_its_tensor_plan(self):
+        rules = self.tmp / "rules.json"
+        rules.write_text('{"rules": []}')
+        fake = types.SimpleNamespace(process_quantization=lambda **kw: f"--tensor-type a={kw['target_type']}",
+                                     precision_override_for=lambda name: None)
+        configs = [{"name": "q4", "type": "Q4_K_M", "use_imatrix": False, "use_pure": False}]
+        with mock.patch.dict(sys.modules, {"tensor_list_builder": fake}):
+            fresh = self._bench(rules=str(rules)).run(configs)[0]
+            cached = self._bench(rules=str(rules)).run(configs)[0]
+        self.assertTrue(cached["cached"])
+        self.assertEqual(cached["tensor_plan_hash"], fresh["tensor_plan_hash"])
+        self.assertEqual(fresh["tensor_plan_hash"], self.mod.tensor_plan_hash("--tensor-type a=Q4_K_M"))
+
+
+if __name__ == "__main__":
+    unittest.main()
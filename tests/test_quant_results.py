@@ -0,0 +1,85 @@
+import importlib.util
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+MODULE_PATH = REPO_ROOT / "model-converter" / "quant_results.py"
+# quant_results imports its sibling pipeline_trace
+sys.path.insert(0, str(MODULE_PATH.parent))
+
+
+def _load_module():
+    spec = importlib.util.spec_from_file_location("quant_results_under_test", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    spec.loader.exec_module(module)
+    return module
+
+
+class QuantResultsTests(unittest.TestCase):
+    def setUp(self):
+        self.mod = _load_module()
+        self.tmp = Path(tempfile.mkdtemp(prefix="quant_results_"))
+        self.db = self.mod.ResultsDB(str(self.tmp / "sub" / "results.db"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _add(self, commit, ts, wall_time, ppl, quant="Q4_K_M", status="ok"):
+        self.db.record(source="make_files", model="m", quant=quant, llama_commit=commit, ts=ts,
+                       wall_time=wall_time, ppl=ppl, config={"tensor_type": None}, status=status)
+
+    def test_regressions_compare_latest_build_with_previous(self):
+        self._add("aaa", 1, 100.0, 6.0)
+        self._add("aaa", 2, 110.0, 6.0)
+        self._add("bbb", 3, 150.0, 6.01)
+        self._add("bbb", 4, 0.1, 1.0, status="failed")  # failures stay out of the averages
+        self._add("aaa", 1, 50.0, 7.0, quant="Q2_K")
+
+        trend = self.db.trend(model="m", quant="Q4_K_M")
+        self.assertEqual([(t["llama_commit"], t["runs"]) for t in trend], [("aaa", 2), ("bbb", 1)])
+
+        found = self.db.regressions(threshold=0.05)
+        self.assertEqual([(r["quant"], r["metric"], r["old_commit"], r["new_commit"]) for r in found],
+                         [("Q4_K_M", "wall_time", "aaa", "bbb")])
+        self.assertAlmostEqual(found[0]["change"], 150 / 105 - 1)
+
+    def test_trend_keeps_sources_and_tensor_plans_apart(self):
+        for ts, (source, plan, commit, wall_time) in enumerate([
+                ("make_files", "p1", "aaa", 100.0), ("quant_bench", "p1", "bbb", 150.0),
+                ("make_files", "p2", "bbb", 150.0), ("make_files", "p1", "bbb", 101.0)]):
+            self.db.record(source=source, model="m", quant="Q4_K_M", tensor_plan_hash=plan,
+                           llama_commit=commit, ts=ts, wall_time=wall_time, status="ok")
+
+        trend = self.db.trend(model="m")
+        self.assertEqual(len(trend), 4)
+        # Only the make_files/p1 series spans two builds, and it did not regress
+        self.assertEqual(self.db.regressions(threshold=0.05), [])
+
+    def test_record_rejects_unknown_fields_and_record_run_never_raises(self):
+        with self.assertRaises(ValueError):
+            self.db.record(model="m", bogus=1)
+        self.assertIsNone(self.mod.record_run(db_path=str(self.tmp / "sub" / "results.db"), bogus=1))
+        self.assertEqual(self.db.query(), [])
+
+    def test_run_measured_reports_exit_code_output_and_rss(self):
+        result, duration, peak_rss_mb = self.mod.run_measured(
+            [sys.executable, "-c", "import sys; b = bytearray(64 << 20); print('out'); sys.exit(3)"])
+        self.assertEqual(result.returncode, 3)
+        self.assertEqual(result.stdout.strip(), b"out")
+        self.assertGreater(duration, 0)
+        self.assertGreater(peak_rss_mb, 64)
+
+    def test_llama_commit_prefers_toolchain_metadata(self):
+        toolchain = self.tmp / "tc"
+        toolchain.mkdir()
+        (toolchain / "toolchain.json").write_text('{"commit": "0123456789abcdef"}')
+        self.assertEqual(self.mod.llama_commit(str(toolchain)), "0123456")
+
+
+if __name__ == "__main__":
+    unittest.main()
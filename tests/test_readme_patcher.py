@@ -0,0 +1,85 @@
+import importlib.util
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+MODULE_PATH = REPO_ROOT / "readme_patcher.py"
+# the patcher is driven with a Journal from repo_maintenance at the repo root
+sys.path.insert(0, str(REPO_ROOT))
+
+try:
+    from repo_maintenance import Journal
+    HAVE_HUB = True
+except ImportError:
+    HAVE_HUB = False
+
+
+def _load_module():
+    spec = importlib.util.spec_from_file_location("readme_patcher_under_test", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    spec.loader.exec_module(module)
+    return module
+
+
+class _FakeApi:
+    def __init__(self):
+        self.uploads = []
+        self._lock = threading.Lock()
+
+    def upload_file(self, path_or_fileobj, path_in_repo, repo_id, token, commit_message, parent_commit):
+        with self._lock:
+            self.uploads.append((repo_id, path_or_fileobj.decode("utf-8"), parent_commit))
+
+
+@unittest.skipUnless(HAVE_HUB, "huggingface_hub not installed")
+class ReadmePatcherTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.mod = _load_module()
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="readme_patcher_")
+        self.readmes = {
+            "u/a": "Install the Agent at C:\\agent\nsee https://old.example/x\n",
+            "u/b": "Nothing to change here\n",
+            "u/c": "Agent, but excluded: DO-NOT-TOUCH\n",
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _patcher(self, api, journal):
+        rules = [("Agent", "[Agent](https://example/agent)"), (r"https://old\.example/(\w+)", r"https://new.example/\1", True)]
+        patcher = self.mod.ReadmePatcher(rules, api=api, exclude_text="DO-NOT-TOUCH", journal=journal)
+        patcher.fetch_readme = lambda repo_id: (self.readmes[repo_id], f"sha-{repo_id}")
+        return patcher
+
+    def test_apply_rules_literal_and_regex(self):
+        rules = self.mod.compile_rules([("a\\b", "c\\d"), (r"(\d+)", r"<\1>", True)])
+        self.assertEqual(self.mod.apply_rules("a\\b 12 a\\b", rules), ("c\\d <12> c\\d", 3))
+
+    def test_plan_push_and_resume(self):
+        journal_path = os.path.join(self.tmp, "journal.jsonl")
+        api = _FakeApi()
+        patcher = self._patcher(api, Journal(journal_path, {"patched", "unchanged"}))
+        entries, errors = patcher.plan(sorted(self.readmes))
+        self.assertEqual(errors, {})
+        self.assertEqual([e["repo_id"] for e in entries], ["u/a"])
+        self.assertEqual(patcher.push(entries), (1, {}))
+        self.assertEqual(api.uploads, [("u/a", "Install the [Agent](https://example/agent) at C:\\agent\n"
+                                               "see https://new.example/x\n", "sha-u/a")])
+
+        # A rerun finds every repo done in the journal and fetches nothing
+        resumed = self._patcher(_FakeApi(), Journal(journal_path, {"patched", "unchanged"}))
+        resumed.fetch_readme = lambda repo_id: self.fail(f"fetched {repo_id}")
+        self.assertEqual(resumed.plan(sorted(self.readmes)), ([], {}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import importlib.util
+import json
+import unittest
+from pathlib import Path
+from unittest import mock
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+MODULE_PATH = REPO_ROOT / "redis_utils.py"
+
+
+def _load_module():
+    spec = importlib.util.spec_from_file_location("redis_utils_under_test", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    spec.loader.exec_module(module)
+    return module
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis not installed")
+class RedisCatalogIndexTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.mod = _load_module()
+
+    def setUp(self):
+        self.catalog = self.mod.RedisModelCatalog("localhost", 6379, "", "default", ssl=False)
+        self.catalog.r = fakeredis.FakeRedis(decode_responses=True)
+
+    def _raw(self, model_id, value):
+        """Write straight to the hash, bypassing the indexes."""
+        self.catalog.r.hset(self.catalog.catalog_key, model_id, value)
+
+    def _resets(self):
+        events = self.catalog.r.xrange(self.catalog.changes_key)
+        return sum(1 for _, event in events if event.get("op") == "reset")
+
+    def test_find_matches_converter_filters(self):
+        models = {
+            "a/small": {"converted": False, "has_config": True, "attempts": 0, "parameters": 7e9},
+            "a/noatt": {"converted": False, "has_config": True, "parameters": 3e9},
+            "a/tried": {"converted": False, "has_config": True, "attempts": 3, "parameters": 7e9},
+            "a/huge": {"converted": False, "has_config": True, "attempts": 0, "parameters": 400e9},
+            "a/unknown": {"converted": False, "has_config": True, "attempts": 0, "parameters": -1},
+            "a/done": {"converted": True, "has_config": True, "attempts": 0, "parameters": 7e9},
+            "a/noconf": {"converted": False, "has_config": False, "attempts": 0, "parameters": 7e9},
+        }
+        for model_id, info in models.items():
+            self.assertTrue(self.catalog.add_model(model_id, info))
+
+        found = self.catalog.find(converted=False, has_config=True, attempts_lt=3,
+                                  parameters_gt=-1, parameters_lte=200e9)
+        self.assertEqual(sorted(found), ["a/noatt", "a/small"])
+        self.assertEqual(sorted(self.catalog.find(parameters_known=False)), ["a/unknown"])
+
+        self.catalog.update_model_field("a/small", "converted", True)
+        self.assertNotIn("a/small", self.catalog.find(converted=False))
+        self.catalog.delete_model("a/done")
+        self.assertEqual(sorted(self.catalog.find(converted=True)), ["a/small"])
+
+    def test_rebuild_covers_unreadable_entries_and_runs_once(self):
+        self._raw("a/good", json.dumps({"converted": False, "attempts": 1}))
+        self._raw("a/bad", "{not json")
+        self._raw("a/null", "null")
+
+        self.assertEqual(self.catalog.find(converted=False), ["a/good"])
+        self.assertEqual(self._resets(), 1)
+        for _ in range(3):
+            self.catalog.find(converted=False)
+        self.assertEqual(self._resets(), 1)
+        self.assertEqual(self.catalog.r.scard(self.catalog.index_all_key), 3)
+        self.assertEqual(self.catalog.r.keys(self.catalog.index_prefix + "build:*"), [])
+
+    def test_rebuild_swaps_indexes_in_place(self):
+        self.catalog.add_model("a/one", {"converted": False, "attempts": 0, "added": "2025-01-01T00:00:00"})
+        # Edited behind the catalog's back: the live index is stale until the rebuild
+        self._raw("a/one", json.dumps({"converted": True, "attempts": 0}))
+        self.assertEqual(self.catalog.find(converted=True), [])
+
+        self.assertEqual(self.catalog.rebuild_indexes(), 1)
+        self.assertEqual(self.catalog.find(converted=True), ["a/one"])
+        self.assertEqual(self.catalog.find(converted=False), [])
+        # The "added" index was emptied by the rebuild, so its stale key is gone
+        self.assertFalse(self.catalog.r.exists(self.catalog.index_key("added")))
+        self.assertEqual(self.catalog.r.smembers(self.catalog.missing_key("added")), {"a/one"})
+
+    def test_list_page_does_not_recheck_indexes(self):
+        self.catalog.add_model("a/one", {"parameters": 7e9})
+        self.catalog.add_model("a/two", {"parameters": 1e9})
+        self.catalog.add_model("a/three", {})
+        self.catalog.ensure_indexes = mock.Mock(side_effect=AssertionError("checked per page"))
+
+        total, models = self.catalog.list_page(order_by="parameters", start=0, count=10)
+        self.assertEqual(total, 3)
+        self.assertEqual([model_id for model_id, _ in models], ["a/two", "a/one", "a/three"])
+
+    def test_existing_models_ignores_corrupt_values(self):
+        self.catalog.add_model("a/one", {"converted": False})
+        self._raw("a/bad", "{not json")
+        self.assertEqual(self.catalog.existing_models(["a/one", "a/bad", "a/none"]), {"a/one", "a/bad"})
+
+    def test_capped_pool_waits_for_a_free_connection(self):
+        import redis
+        catalog = self.mod.RedisModelCatalog("localhost", 6379, "", "default", ssl=True,
+                                             max_connections=4, pool_timeout=1)
+        pool = catalog.r.connection_pool
+        self.assertIsInstance(pool, redis.BlockingConnectionPool)
+        self.assertIs(pool.connection_class, redis.SSLConnection)
+        self.assertEqual(pool.max_connections, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
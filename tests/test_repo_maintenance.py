@@ -0,0 +1,125 @@
+import importlib.util
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+try:
+    import huggingface_hub  # noqa: F401
+    HAVE_HUB = True
+except ImportError:
+    HAVE_HUB = False
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+MODULE_PATH = REPO_ROOT / "repo_maintenance.py"
+
+
+def _load_module():
+    spec = importlib.util.spec_from_file_location("repo_maintenance_under_test", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    spec.loader.exec_module(module)
+    return module
+
+
+def _file(path, days_old=None):
+    last_commit = None
+    if days_old is not None:
+        last_commit = SimpleNamespace(date=datetime.now(timezone.utc) - timedelta(days=days_old))
+    return SimpleNamespace(path=path, last_commit=last_commit)
+
+
+class _FakeApi:
+    def __init__(self, trees):
+        self.trees = trees
+        self.commits = []
+        self.expand_flags = set()
+        self._lock = threading.Lock()
+
+    def list_models(self, author, token=None):
+        return [SimpleNamespace(id=repo_id) for repo_id in self.trees]
+
+    def list_repo_tree(self, repo_id, recursive=False, expand=False, token=None):
+        self.expand_flags.add(expand)
+        if isinstance(self.trees[repo_id], Exception):
+            raise self.trees[repo_id]
+        return iter(self.trees[repo_id])
+
+    def create_commit(self, repo_id, operations, commit_message, token=None):
+        with self._lock:
+            self.commits.append((repo_id, sorted(op.path_in_repo for op in operations)))
+
+
+@unittest.skipUnless(HAVE_HUB, "huggingface_hub not installed")
+class RepoMaintenanceTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.mod = _load_module()
+
+    def setUp(self):
+        self.api = _FakeApi({
+            "u/a-GGUF": [_file("a-iq1_s.gguf", 30), _file("a-iq1_m.gguf", 1), _file("README.md", 30)],
+            "u/b-GGUF": [_file("b-iq1_s.gguf", 30), _file("b-iq1_s-imat.gguf", 30), _file("b-iq1_m.gguf")],
+            "u/c-GGUF": [_file("c-q4_k.gguf", 30)],
+            "u/broken": RuntimeError("boom"),
+        })
+        self.engine = self.mod.RepoMaintenance(api=self.api)
+
+    def test_plan_uses_listing_dates_and_reports_errors(self):
+        is_old = self.mod.older_than(7)
+        plan, errors = self.engine.plan(self.engine.list_repos("u"),
+                                        lambda e: "iq1" in e.path and is_old(e), expand=True)
+        self.assertEqual(plan, {"u/a-GGUF": ["a-iq1_s.gguf"],
+                                "u/b-GGUF": ["b-iq1_s-imat.gguf", "b-iq1_s.gguf"]})
+        self.assertEqual(list(errors), ["u/broken"])
+        self.assertEqual(self.api.expand_flags, {True})
+        self.assertEqual(self.api.commits, [])
+
+    def test_delete_makes_one_commit_per_repo(self):
+        plan, _ = self.engine.plan(["u/a-GGUF", "u/b-GGUF", "u/c-GGUF"],
+                                   self.mod.name_contains(["iq1"], exclude_substrings=["imat"]))
+        deleted, errors = self.engine.delete(plan, commit_message="cleanup")
+        self.assertEqual((deleted, errors), (4, {}))
+        self.assertEqual(sorted(self.api.commits), [
+            ("u/a-GGUF", ["a-iq1_m.gguf", "a-iq1_s.gguf"]),
+            ("u/b-GGUF", ["b-iq1_m.gguf", "b-iq1_s.gguf"]),
+        ])
+
+    def test_journal_resumes_until_discarded(self):
+        path = os.path.join(tempfile.mkdtemp(prefix="journal_"), "journal.jsonl")
+        journal = self.mod.Journal(path, done_statuses={"squashed"})
+        journal.record("u/a", "squashed")
+        journal.record("u/b", "failed", error="boom")
+        resumed = self.mod.Journal(path, done_statuses={"squashed"})
+        self.assertTrue(resumed.is_done("u/a"))
+        self.assertFalse(resumed.is_done("u/b"))
+
+        resumed.discard()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(self.mod.Journal(path, done_statuses={"squashed"}).is_done("u/a"))
+        os.rmdir(os.path.dirname(path))
+
+    def test_call_with_rate_retries_429_and_honours_retry_after(self):
+        rate = self.mod.RateController(rate_limit_per_minute=600, cooldown_seconds=0.0)
+        rate.wait_before_call = lambda: None
+        limited = RuntimeError("slow down")
+        limited.response = SimpleNamespace(status_code=429, headers={"Retry-After": "30"})
+        calls = []
+
+        def flaky(value):
+            calls.append(value)
+            if len(calls) == 1:
+                raise limited
+            return value * 2
+
+        self.assertEqual(self.mod.call_with_rate(rate, flaky, 21), 42)
+        self.assertEqual(calls, [21, 21])
+        self.assertGreaterEqual(rate._cooldown_until - datetime.now().timestamp(), 25)
+
+
+if __name__ == "__main__":
+    unittest.main()
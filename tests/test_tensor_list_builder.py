@@ -0,0 +1,98 @@
+import importlib.util
+import json
+import shutil
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+import numpy as np
+
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+MODEL_CONVERTER = REPO_ROOT / "model-converter"
+
+try:
+    import gguf  # noqa: F401
+    HAVE_GGUF = True
+except ImportError:
+    HAVE_GGUF = False
+
+
+def _load(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    spec.loader.exec_module(module)
+    return module
+
+
+class TestImatrixBumpPlanner(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix="tensor_list_builder_")
+        sys.path.insert(0, str(MODEL_CONVERTER))
+        self.mod = _load("tensor_list_builder_under_test", MODEL_CONVERTER / "tensor_list_builder.py")
+
+    def tearDown(self):
+        sys.path.remove(str(MODEL_CONVERTER))
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_greedy_bumps_most_important_within_budget(self):
+        plan = [[f"blk.{i}.attn_v", "Q3_K", "No specific rule applied, using target type", False] for i in range(4)]
+        plan.append(["blk.0.ffn_down", "Q8_0", "Override: Q8_0 for blk.0.ffn_down by rule", True])
+        counts = {name: 1000 for name, _, _, _ in plan}
+        importance = {"blk.0.attn_v": 1.0, "blk.1.attn_v": 5.0, "blk.2.attn_v": 0.5, "blk.3.attn_v": 2.0,
+                      "blk.0.ffn_down": 100.0}
+        step = 1000 * (self.mod.type_bits("Q4_K") - self.mod.type_bits("Q3_K"))
+        budget = self.mod.plan_bits(plan, counts) + 2 * step
+
+        bumped = self.mod.plan_imatrix_bumps(plan, counts, importance, "Q3_K", budget)
+
+        self.assertEqual(sorted(bumped), ["blk.1.attn_v", "blk.3.attn_v"])
+        types = {name: quant for name, quant, _, _ in plan}
+        self.assertEqual(types["blk.1.attn_v"], "Q4_K")
+        self.assertEqual(types["blk.0.attn_v"], "Q3_K")
+        self.assertEqual(types["blk.0.ffn_down"], "Q8_0")
+        self.assertLessEqual(self.mod.plan_bits(plan, counts), budget)
+
+    def test_no_bumps_when_plan_already_over_budget(self):
+        plan = [["blk.0.attn_v", "IQ2_XS", "No specific rule applied, using target type", False]]
+        bumped = self.mod.plan_imatrix_bumps(plan, {"blk.0.attn_v": 1000}, {"blk.0.attn_v": 1.0}, "IQ2_XS", 1000.0)
+        self.assertEqual(bumped, [])
+        self.assertFalse(plan[0][3])
+
+    @unittest.skipUnless(HAVE_GGUF, "gguf package not installed")
+    def test_process_quantization_emits_tensor_type_args(self):
+        from gguf import GGUFWriter
+
+        tools = _load("imatrix_tools_for_planner", MODEL_CONVERTER / "imatrix_tools.py")
+        model = str(Path(self.tmp) / "model.gguf")
+        writer = GGUFWriter(model, arch="llama")
+        entries = {}
+        for layer in range(4):
+            writer.add_tensor(f"blk.{layer}.attn_v.weight", np.zeros((32, 64), dtype=np.float16))
+            values = np.ones((1, 64), dtype=np.float32)
+            if layer == 2:
+                values[0, :4] = 50.0
+            entries[f"blk.{layer}.attn_v.weight"] = {"in_sum2": values, "counts": np.ones(1, dtype=np.float32)}
+        writer.write_header_to_file()
+        writer.write_kv_data_to_file()
+        writer.write_tensors_to_file()
+        writer.close()
+        imatrix = str(Path(self.tmp) / "model-imatrix.gguf")
+        tools.write_imatrix(imatrix, entries, {"chunk_count": 1, "chunk_size": 512, "datasets": ["t"]})
+        rules = str(Path(self.tmp) / "rules.json")
+        Path(rules).write_text(json.dumps({"rules": []}))
+
+        with redirect_stdout(StringIO()):
+            without = self.mod.process_quantization(model, rules, "Q3_K_M")
+            with_planner = self.mod.process_quantization(model, rules, "Q3_K_M", imatrix_file=imatrix,
+                                                         extra_bpw=0.3)
+        self.assertEqual(without, "")
+        self.assertEqual(with_planner, "--tensor-type blk.2.attn_v=Q4_K")
+
+
+if __name__ == "__main__":
+    unittest.main()
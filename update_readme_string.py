@@ -1,6 +1,10 @@
 from huggingface_hub import HfApi, login
 from dotenv import load_dotenv
 import os
+import argparse
+import difflib
+from readme_patcher import ReadmePatcher, load_rules_file, rules_fingerprint
+from repo_maintenance import Journal
 
 # Load the .env file
 load_dotenv()
@@ -28,82 +32,64 @@ old_text = """Note you need to install a Quantum Network Monitor Agent"""
 new_text = """Note you need to install a [Quantum Network Monitor Agent](https://readyforquantum.com/Download/?utm_source=huggingface&utm_medium=referral&utm_campaign=huggingface_repo_readme)"""
 exclude_text = ""
 
-def update_readme(repo_id, require_confirmation=True, exclude_text=None):
-    try:
-        # Get the README content
-        readme_path = api.hf_hub_download(
-            repo_id=repo_id,
-            filename="README.md",
-            token=api_token,
-            repo_type="model"
-        )
+# Rules applied in order in a single pass: (pattern, replacement) or (regex, replacement, True)
+RULES = [
+    (old_text, new_text),
+]
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Patch README.md in all repos with a set of replacement rules.")
+    parser.add_argument("--rules", help="JSON rules file (list of {pattern, replacement, regex}); defaults to RULES above")
+    parser.add_argument("--exclude-text", default=exclude_text, help="Skip READMEs containing this text")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent README uploads")
+    parser.add_argument("--journal", default=None, help="Progress journal (default: one per rule set)")
+    parser.add_argument("--restart", action="store_true", help="Ignore the journal and check every repo again")
+    parser.add_argument("--message", default="Update README.md", help="Commit message")
+    parser.add_argument("--dry-run", action="store_true", help="Show what would change without pushing")
+    parser.add_argument("--yes", action="store_true", help="Do not ask for confirmation")
+    return parser.parse_args()
+
+def show_example(entry):
+    """Print the changed lines of one README so the rules can be checked before pushing."""
+    print(f"\nFirst model found: {entry['repo_id']} ({entry['replacements']} replacement(s))")
+    diff = difflib.unified_diff(entry["old"].splitlines(), entry["new"].splitlines(), "current", "updated", lineterm="", n=0)
+    for line in diff:
+        print(line)
 
-        # Read the content
-        with open(readme_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-
-        # Skip update if exclude_text is present
-        if exclude_text and exclude_text in content:
-            print(f"⏩ Exclude text found in {repo_id} - skipping")
-            return False, 0
-
-        if old_text in content:
-            if require_confirmation:
-                print(f"\nFirst model found: {repo_id}")
-                print("\nCurrent text:")
-                print(old_text)
-                print("\nWill replace with:")
-                print(new_text)
-
-                confirm = input("\nProceed with this change and update ALL similar models? (y/n): ").lower()
-                if confirm != 'y':
-                    print("Update cancelled by user")
-                    return False, 0
-
-            # Replace the text
-            new_content = content.replace(old_text, new_text)
-
-            # Upload the updated README
-            api.upload_file(
-                path_or_fileobj=new_content.encode('utf-8'),
-                path_in_repo="README.md",
-                repo_id=repo_id,
-                token=api_token,
-            )
-            return True, 1
-        return False, 0
-
-    except Exception as e:
-        print(f"❌ Error processing {repo_id}: {str(e)}")
-        return False, 0
-    
 def main():
+    args = parse_arguments()
+    rules = load_rules_file(args.rules) if args.rules else RULES
+    journal_path = args.journal or f"readme_patch_journal-{rules_fingerprint(rules)}.jsonl"
+    journal = Journal(journal_path, done_statuses={"patched", "unchanged"}, restart=args.restart)
+
     # Load username from file
     with open(os.path.join(os.path.dirname(__file__), "model-converter/username"), "r") as f:
         HF_USERNAME = f.read().strip()
-    # List all model repositories (converting generator to list)
-    repos = list(api.list_models(author=HF_USERNAME))
+    repos = [repo.id for repo in api.list_models(author=HF_USERNAME)]
     print(f"Found {len(repos)} repositories to check")
 
-    # Set the text you want to exclude here
-
-    # First pass - find first matching model and get confirmation
-    confirmed = False
-    total_updated = 0
-
-    for repo in repos:
-        success, count = update_readme(repo.id, require_confirmation=not confirmed, exclude_text=exclude_text)
-        total_updated += count
-
-        if success and not confirmed:
-            confirmed = True
-            print("\nConfirmation received. Updating remaining models automatically...")
-            continue
-
-        if confirmed and not success:
-            print(f"⏩ No match in {repo.id} - skipping")
-
+    patcher = ReadmePatcher(rules, api=api, token=api_token, exclude_text=args.exclude_text or None,
+                            push_workers=args.workers, journal=None if args.dry_run else journal)
+    entries, errors = patcher.plan(repos)
+    for repo_id, error in errors.items():
+        print(f"❌ Error processing {repo_id}: {str(error)}")
+    print(f"{len(entries)} README(s) need changes")
+    if not entries:
+        return
+
+    show_example(entries[0])
+    if args.dry_run:
+        for entry in entries:
+            print(f"[DRY RUN] Would update {entry['repo_id']} ({entry['replacements']} replacement(s))")
+        return
+    if not args.yes:
+        confirm = input(f"\nProceed with this change and update ALL {len(entries)} models? (y/n): ").lower()
+        if confirm != 'y':
+            print("Update cancelled by user")
+            return
+
+    total_updated, _ = patcher.push(entries, commit_message=args.message)
     print(f"\nUpdate complete! Successfully updated {total_updated} repositories.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()